@@ -0,0 +1,20 @@
+"""
+Configuración de Django para el proyecto LIMS.
+
+El perfil se elige con la variable de entorno LIMS_ENTORNO:
+- dev  (por defecto) DEBUG, interfaz navegable de DRF y logging detallado.
+- prod sin DEBUG, solo JSON, plantillas cacheadas y logging a archivo.
+
+También se puede apuntar DJANGO_SETTINGS_MODULE directamente a
+lims_project.settings.dev o lims_project.settings.prod.
+"""
+import os
+
+LIMS_ENTORNO = os.environ.get('LIMS_ENTORNO', 'dev')
+
+if LIMS_ENTORNO == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif LIMS_ENTORNO == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ValueError(f"LIMS_ENTORNO debe ser 'dev' o 'prod', no {LIMS_ENTORNO!r}")
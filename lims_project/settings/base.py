@@ -1,22 +1,29 @@
 """
-Configuración de Django para el proyecto LIMS.
+Configuración común a todos los entornos del proyecto LIMS.
+
+Los perfiles dev.py y prod.py importan este módulo y ajustan lo que cambia
+entre desarrollo y producción (ver __init__.py).
 """
 
 import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 # =============================================================================
 # CONFIGURACIÓN DE SEGURIDAD
 # =============================================================================
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-lims-2024-change-this-in-production-xyz123'
+# (prod.py exige LIMS_SECRET_KEY)
+SECRET_KEY = os.environ.get(
+    'LIMS_SECRET_KEY', 'django-insecure-lims-2024-change-this-in-production-xyz123'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Con DEBUG=True Django guarda cada consulta SQL ejecutada (dev.py lo activa)
+DEBUG = False
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '[::1]']
 
@@ -46,6 +53,8 @@ INSTALLED_APPS = [
 # =============================================================================
 
 MIDDLEWARE = [
+    # Primero, para que el tiempo medido incluya el resto de middlewares
+    'reception.instrumentacion.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS debe ir antes de CommonMiddleware
@@ -84,13 +93,62 @@ WSGI_APPLICATION = 'lims_project.wsgi.application'
 # CONFIGURACIÓN DE BASE DE DATOS
 # =============================================================================
 
-# Por defecto usa SQLite (base de datos en archivo)
-# Para producción, cambiar a PostgreSQL o MySQL
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Por defecto usa SQLite (base de datos en archivo) con el perfil de
+# LIMS_SQLITE. Con LIMS_DB_MOTOR=postgresql se usa PostgreSQL con los
+# parámetros LIMS_DB_*.
+LIMS_DB_MOTOR = os.environ.get('LIMS_DB_MOTOR', 'sqlite')
+
+# Conexiones persistentes: cada proceso reutiliza su conexión entre peticiones
+# en lugar de abrir una (y repetir los PRAGMA) por petición.
+CONN_MAX_AGE = int(os.environ.get('LIMS_DB_CONN_MAX_AGE', 600))
+
+if LIMS_DB_MOTOR == 'postgresql':
+    # Para agrupar conexiones de muchos procesos, apuntar LIMS_DB_HOST/PORT a
+    # PgBouncer en modo transaction y desactivar los cursores del lado del
+    # servidor (LIMS_DB_PGBOUNCER=true).
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('LIMS_DB_NOMBRE', 'lims'),
+            'USER': os.environ.get('LIMS_DB_USUARIO', 'lims'),
+            'PASSWORD': os.environ.get('LIMS_DB_CLAVE', ''),
+            'HOST': os.environ.get('LIMS_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('LIMS_DB_PUERTO', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS':
+                os.environ.get('LIMS_DB_PGBOUNCER', 'false').lower() == 'true',
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('LIMS_DB_NOMBRE', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Base de pruebas en archivo y no en memoria: con WAL y busy_timeout
+            # las pruebas de concurrencia esperan el bloqueo como el servidor
+            'TEST': {'NAME': os.environ.get('LIMS_DB_PRUEBAS', BASE_DIR / 'test_db.sqlite3')},
+        }
+    }
+
+# PRAGMA que se ejecutan al abrir cada conexión SQLite (ver reception/basedatos.py)
+LIMS_SQLITE = {
+    'PRAGMAS': {
+        # Los lectores leen una instantánea mientras otro proceso escribe
+        'journal_mode': 'WAL',
+        # Con WAL, NORMAL solo sincroniza en los checkpoints y sigue siendo seguro
+        'synchronous': 'NORMAL',
+        # Milisegundos que espera un escritor por el bloqueo antes de "database is locked"
+        'busy_timeout': int(os.environ.get('LIMS_SQLITE_BUSY_TIMEOUT', 20000)),
+        'mmap_size': 256 * 1024 * 1024,  # bytes
+        'cache_size': -64000,  # negativo = KiB (64 MB por conexión)
+        'temp_store': 'MEMORY',
+    },
 }
 
 # =============================================================================
@@ -145,14 +203,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # =============================================================================
 
 REST_FRAMEWORK = {
-    # Paginación por defecto
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Paginación por defecto (numerada; ?paginacion=cursor para keyset y
+    # ?conteo=exacto|aproximado|no para controlar el COUNT(*))
+    'DEFAULT_PAGINATION_CLASS': 'reception.pagination.PaginacionLIMS',
     'PAGE_SIZE': 50,  # 50 resultados por página
     
-    # Formatos de respuesta
+    # Formatos de respuesta (dev.py agrega la interfaz web navegable)
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',  # Interfaz web para probar API
     ],
     
     # Parsers (qué formatos acepta la API)
@@ -190,6 +248,67 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
 }
 
+# =============================================================================
+# CACHE DE RESPUESTAS DE LA API (reception/cache.py)
+# =============================================================================
+
+# La cache de respuestas debe ser común a todos los procesos del servidor:
+# la invalidación (versión por modelo) que hace el proceso que atendió una
+# escritura tiene que verla cualquier otro proceso antes de servir una lista.
+# Por defecto es una cache en disco (LIMS_CACHE_DIR, o cache/ en el proyecto),
+# compartida por los procesos del mismo equipo. Con servidores en varios
+# equipos, LIMS_CACHE_REDIS apunta a un Redis común (requiere el paquete redis).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lims-default',
+    },
+    'respuestas': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('LIMS_CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+if os.environ.get('LIMS_CACHE_REDIS'):
+    CACHES['respuestas'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['LIMS_CACHE_REDIS'],
+    }
+
+LIMS_CACHE_RESPUESTAS = {
+    'ALIAS': 'respuestas',
+    'HABILITADA': os.environ.get('LIMS_CACHE_HABILITADA', 'true').lower() == 'true',
+    'TIMEOUT': 60,  # segundos; acota la vigencia aunque no haya escrituras
+    'TIMEOUT_ESTADISTICAS': 30,  # /api/estadisticas/ (incluye ensayos vencidos hoy)
+}
+
+# Generación de codigo_muestra (ver reception/codigos.py)
+LIMS_CODIGOS = {
+    # aleatorio | temporal | secuencial | ruta a una clase propia
+    'GENERADOR': os.environ.get('LIMS_CODIGOS_GENERADOR', 'aleatorio'),
+    'BLOQUE': 50,  # números que reserva cada proceso por consulta (secuencial)
+}
+
+# Medición por petición (reception/instrumentacion.py, GET /api/rendimiento/)
+LIMS_INSTRUMENTACION = {
+    'HABILITADA': os.environ.get('LIMS_INSTRUMENTACION', 'true').lower() == 'true',
+    'VENTANA_MINUTOS': 15,  # ventana del histograma por vista
+    'UMBRAL_LENTO_MS': 1000,  # None = sin registro de peticiones lentas
+    'EXPLAIN_LENTAS': True,  # EXPLAIN de las consultas más lentas de una petición lenta
+    'CONSULTAS_EXPLAIN': 3,
+    'REGISTRAR_PETICIONES': True,  # una línea INFO por petición (muestreada)
+}
+
+# Métricas de Prometheus en /metrics (reception/metricas.py). Con varios
+# procesos de servidor, LIMS_METRICAS_DIR debe apuntar a un directorio
+# compartido por todos (los indicadores usan la cache de respuestas);
+# prod.py usa BASE_DIR/metricas si no se define.
+LIMS_METRICAS = {
+    'DIR': os.environ.get('LIMS_METRICAS_DIR'),
+    'INTERVALO_ESCRITURA': 5,  # segundos entre escrituras de cada proceso
+    'INTERVALO_INDICADORES': 15,  # segundos que se reutilizan los conteos de la BD
+}
+
 # =============================================================================
 # CONFIGURACIÓN DE CORS (Cross-Origin Resource Sharing)
 # =============================================================================
@@ -213,6 +332,17 @@ CORS_ALLOW_CREDENTIALS = True
 # LOGGING (Registro de eventos y errores)
 # =============================================================================
 
+# Fracción de los registros informativos de GET que se conservan por prefijo
+# de ruta (gana el más largo); WARNING y superiores se conservan siempre.
+LIMS_REGISTRO_MUESTREO = {
+    '/api/muestras/': 0.1,
+    '/api/ensayos/': 0.1,
+    '/api/historial/': 0.1,
+    '/api/buscar/': 0.1,
+}
+
+# lims.log se escribe desde un hilo de fondo, en lotes y como líneas JSON
+# (ver reception/bitacora.py); la petición solo encola el registro.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -222,17 +352,28 @@ LOGGING = {
             'style': '{',
         },
     },
+    'filters': {
+        'muestreo': {
+            '()': 'reception.bitacora.FiltroMuestreo',
+            'tasas': LIMS_REGISTRO_MUESTREO,
+        },
+    },
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'lims.log',
-            'formatter': 'verbose',
+            '()': 'reception.bitacora.ManejadorEnCola',
+            'archivo': BASE_DIR / 'lims.log',
+            'max_bytes': 10 * 1024 * 1024,
+            'copias': 10,
+            'horas': 24,  # rota también una vez al día
+            'lote': 200,
+            'filters': ['muestreo'],
         },
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
+            'filters': ['muestreo'],
         },
     },
     'loggers': {
@@ -0,0 +1,18 @@
+"""
+Perfil de desarrollo: DEBUG, interfaz web navegable de DRF y logging de
+reception en nivel DEBUG a archivo y consola.
+"""
+from .base import *  # noqa: F401,F403
+from .base import REST_FRAMEWORK
+
+DEBUG = True
+
+ALLOWED_HOSTS = ['localhost', '127.0.0.1', '[::1]']
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',  # Interfaz web para probar API
+    ],
+}
@@ -0,0 +1,81 @@
+"""
+Perfil de producción.
+
+Frente a dev.py quita lo que solo sirve para depurar y cuesta en cada
+petición: DEBUG (que guarda cada consulta SQL en memoria), la interfaz
+navegable de DRF y el logging DEBUG síncrono a consola. Las plantillas
+(admin) se compilan una vez por proceso con el cargador cacheado, y los
+archivos estáticos no se sirven desde Django (urls.py solo los monta con
+DEBUG): usar collectstatic y el servidor web.
+
+Variables de entorno:
+- LIMS_SECRET_KEY (obligatoria)
+- LIMS_ALLOWED_HOSTS: dominios separados por comas
+- LIMS_METRICAS_DIR: directorio de métricas compartido por los workers
+  (por defecto BASE_DIR/metricas)
+"""
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import BASE_DIR, LIMS_METRICAS, LOGGING, REST_FRAMEWORK, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ['LIMS_SECRET_KEY']
+
+ALLOWED_HOSTS = [
+    host.strip() for host in os.environ.get('LIMS_ALLOWED_HOSTS', 'localhost').split(',')
+    if host.strip()
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ],
+}
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,  # incompatible con 'loaders'
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+# Solo archivo y a partir de INFO. Los workers de gunicorn comparten
+# lims.log: ninguno lo rota, lo hace logrotate (ver README).
+LOGGING = {
+    **LOGGING,
+    'handlers': {
+        **LOGGING['handlers'],
+        'file': {**LOGGING['handlers']['file'], 'rotacion_externa': True},
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['file'],
+            'level': 'WARNING',
+            'propagate': True,
+        },
+        'reception': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Los workers de gunicorn son procesos separados: sin directorio compartido
+# cada scrape de /metrics vería solo los contadores del worker que responde.
+LIMS_METRICAS = {
+    **LIMS_METRICAS,
+    'DIR': os.environ.get('LIMS_METRICAS_DIR', str(BASE_DIR / 'metricas')),
+}
@@ -6,6 +6,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from reception.metricas import vista_metricas
+
 urlpatterns = [
     # Panel de administración de Django
     path('admin/', admin.site.urls),
@@ -15,6 +17,9 @@ urlpatterns = [
     
     # Autenticación de Django REST Framework (para login/logout en el navegador)
     path('api-auth/', include('rest_framework.urls')),
+    
+    # Métricas en formato Prometheus
+    path('metrics', vista_metricas, name='metricas'),
 ]
 
 # Servir archivos estáticos y media en desarrollo
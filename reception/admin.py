@@ -1,11 +1,211 @@
-from django.contrib import admin
-from .models import Cliente, Muestra, Ensayo, HistorialEstado
+"""
+Panel de administración.
+
+Las listas de Muestra, Ensayo e Historial tienen millones de filas, así que
+cada página de la lista debe costar un número fijo de consultas:
+- list_select_related para las relaciones que muestran list_display y __str__.
+- PaginadorEstimado: conteo estimado (ver pagination.estimar_conteo) y sin
+  el conteo total sin filtros (show_full_result_count = False).
+- Sin date_hierarchy (recorre las fechas distintas de la tabla); los filtros
+  de fecha de list_filter son enlaces fijos sin consultas.
+- Relaciones con autocompletado en lugar de listas desplegables con todas las
+  filas, también en list_editable (AutocompletarConocidos).
+
+Los cambios de estado de Muestra y Ensayo (formulario, list_editable y
+acciones "Marcar como ...") pasan por sus máquinas de estado, con historial
+y guardias (ver transiciones.py).
+
+ListasAdminTests (reception/tests.py) fija el número de consultas de cada
+lista con pocas y con muchas filas; `python manage.py verificar_consultas`
+lo muestra contra una base de datos real.
+"""
+from collections import Counter
+
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from .models import Cliente, Muestra, Ensayo, HistorialEstado, ResumenDiario
+from .pagination import LIMITE_CONTEO_APROXIMADO, estimar_conteo
+from .transiciones import MUESTRA, ENSAYO
+from . import busqueda
+
+
+# =============================================================================
+# UTILIDADES PARA LISTAS GRANDES
+# =============================================================================
+class PaginadorEstimado(Paginator):
+    """
+    Paginator con el conteo estimado de estimar_conteo(): en SQLite cuenta
+    hasta LIMITE_CONTEO_APROXIMADO filas (más allá se llega filtrando) y en
+    PostgreSQL usa el estimado del planificador, salvo en resultados pequeños,
+    donde el estimado puede estar desactualizado y contar es barato.
+    """
+    @cached_property
+    def count(self):
+        conteo, aproximado = estimar_conteo(self.object_list)
+        if aproximado and conteo < LIMITE_CONTEO_APROXIMADO:
+            return self.object_list.count()
+        return conteo
+
+
+class AutocompletarConocidos(AutocompleteSelect):
+    """
+    AutocompleteSelect que toma la etiqueta de la opción seleccionada de
+    `conocidos` ({pk: etiqueta}) en lugar de consultarla. En list_editable
+    evita una consulta por fila: la lista ya cargó la relación con
+    list_select_related.
+    """
+    conocidos = None
+
+    def optgroups(self, name, value, attr=None):
+        seleccion = [str(v) for v in value if str(v) not in self.choices.field.empty_values]
+        if self.conocidos is None or not set(seleccion) <= set(self.conocidos):
+            return super().optgroups(name, value, attr)
+        opciones = []
+        if not self.is_required:
+            opciones.append(self.create_option(name, '', '', False, 0))
+        for pk in seleccion[:1]:
+            opciones.append(self.create_option(name, pk, self.conocidos[pk], True, len(opciones)))
+        return [(None, opciones, 0)]
+
+
+class FiltroAnalista(admin.SimpleListFilter):
+    """
+    Filtro por analista sin listar todos los usuarios: ofrece "sin asignar" y
+    "asignados a mí"; cualquier otro analista se filtra con ?analista=<id>
+    (y entonces aparece como opción).
+    """
+    title = 'analista asignado'
+    parameter_name = 'analista'
+
+    def lookups(self, request, model_admin):
+        opciones = [('ninguno', 'Sin asignar'), (str(request.user.pk), 'Asignados a mí')]
+        valor = self.value()
+        if valor and valor.isdigit() and valor != str(request.user.pk):
+            analista = User.objects.filter(pk=valor).first()
+            if analista is not None:
+                opciones.append((valor, analista.get_username()))
+        return opciones
+
+    def queryset(self, request, queryset):
+        valor = self.value()
+        if valor == 'ninguno':
+            return queryset.filter(analista_asignado__isnull=True)
+        if valor and valor.isdigit():
+            return queryset.filter(analista_asignado_id=valor)
+        return queryset
+
+
+class FiltroEstado(admin.SimpleListFilter):
+    """
+    Filtro con los estados de Muestra. Para campos sin `choices`, donde el
+    filtro por defecto listaría los valores con SELECT DISTINCT sobre la tabla.
+    """
+    def lookups(self, request, model_admin):
+        return Muestra.ESTADO_CHOICES
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class FiltroEstadoAnterior(FiltroEstado):
+    title = 'estado anterior'
+    parameter_name = 'estado_anterior'
+
+
+class FiltroEstadoNuevo(FiltroEstado):
+    title = 'estado nuevo'
+    parameter_name = 'estado_nuevo'
+
+
+class AdminListaGrande(admin.ModelAdmin):
+    """
+    Base de los ModelAdmin de tablas grandes.
+    """
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+
+def acciones_transicion(maquina):
+    """
+    Una acción "Marcar como <estado>" por cada estado al que se puede llegar.
+    """
+    etiquetas = dict(maquina.modelo._meta.get_field(maquina.campo).choices)
+    acciones = []
+    for estado in maquina.estados:
+        if not maquina.origenes[estado]:
+            continue
+        
+        def accion(modeladmin, request, queryset, estado=estado):
+            modeladmin.aplicar_transicion(request, queryset, estado)
+        accion.__name__ = f'marcar_como_{estado.lower()}'
+        accion.short_description = f'Marcar como {etiquetas[estado].lower()}'
+        acciones.append(accion)
+    return acciones
+
+
+class AdminConTransiciones(AdminListaGrande):
+    """
+    Base de los ModelAdmin con máquina de estados (`maquina`): los cambios de
+    estado no se guardan directamente sino con maquina.aplicar() o, en las
+    acciones, con maquina.transicion_masiva().
+    """
+    maquina = None
+    
+    def save_model(self, request, obj, form, change):
+        """
+        Un cambio de estado se valida contra la fila bloqueada (el estado
+        actual, no el que tenía al abrir el formulario) y se escribe en el
+        mismo UPDATE que los demás campos cambiados: una sola escritura y un
+        solo aumento de `revision`. Si se rechaza, se guardan solo los demás
+        campos, con el estado actual.
+        """
+        campo = self.maquina.campo
+        if not change or campo not in form.changed_data:
+            return super().save_model(request, obj, form, change)
+        destino = getattr(obj, campo)
+        otros = {nombre: getattr(obj, nombre) for nombre in form.changed_data if nombre != campo}
+        with transaction.atomic():
+            resultado = self.maquina.transicion_masiva(
+                self.model._default_manager.filter(pk=obj.pk), destino, request.user,
+                'Cambio desde el admin', **otros
+            )
+            if resultado.aplicadas:
+                obj.refresh_from_db()
+            elif resultado.rechazadas:
+                obj.refresh_from_db(fields=[campo, 'revision'])
+                if otros:
+                    super().save_model(request, obj, form, change)
+        if resultado.rechazadas:
+            self.message_user(request, f'{obj}: {resultado.rechazadas[obj.pk]}', level=messages.WARNING)
+    
+    def aplicar_transicion(self, request, queryset, estado):
+        """
+        Cambio de estado por lote con historial y usuario; informa cuántos
+        registros se omitieron y por qué.
+        """
+        resultado = self.maquina.transicion_masiva(queryset, estado, request.user, 'Cambio masivo desde el admin')
+        nombre = self.model._meta.verbose_name.lower()
+        self.message_user(request, f'{len(resultado.aplicadas)} {nombre}(s) pasaron a {estado}.')
+        if resultado.rechazadas:
+            motivos = Counter(resultado.rechazadas.values())
+            self.message_user(
+                request,
+                '; '.join(f'{cantidad} {nombre}(s) sin cambiar: {motivo}' for motivo, cantidad in motivos.items()),
+                level=messages.WARNING
+            )
 
 # =============================================================================
 # CONFIGURACIÓN DEL PANEL DE ADMINISTRACIÓN PARA CLIENTE
 # =============================================================================
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
+class ClienteAdmin(AdminListaGrande):
     """
     Configuración del panel de administración para el modelo Cliente.
     """
@@ -27,6 +227,15 @@ class ClienteAdmin(admin.ModelAdmin):
     # Campos de búsqueda
     search_fields = ['nombre_empresa', 'nit', 'persona_contacto', 'email']
     
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Resuelve la búsqueda con el índice de texto completo (sin acentos)
+        en lugar de LIKE '%...%' sobre cada campo.
+        """
+        if not busqueda.terminos(search_term):
+            return queryset, False
+        return queryset.filter(busqueda.condicion('cliente', search_term)), False
+    
     # Campos de solo lectura
     readonly_fields = ['fecha_registro', 'fecha_actualizacion']
     
@@ -54,7 +263,7 @@ class ClienteAdmin(admin.ModelAdmin):
 # CONFIGURACIÓN DEL PANEL DE ADMINISTRACIÓN PARA MUESTRA
 # =============================================================================
 @admin.register(Muestra)
-class MuestraAdmin(admin.ModelAdmin):
+class MuestraAdmin(AdminConTransiciones):
     """
     Configuración del panel de administración para el modelo Muestra.
     """
@@ -68,6 +277,7 @@ class MuestraAdmin(admin.ModelAdmin):
         'muestra_aceptada',
         'usuario_recepcion'
     ]
+    list_select_related = ['cliente', 'usuario_recepcion']
     
     # Filtros
     list_filter = [
@@ -87,6 +297,18 @@ class MuestraAdmin(admin.ModelAdmin):
         'lote'
     ]
     
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Resuelve la búsqueda con los índices de texto completo: por los datos de
+        la muestra o por el nombre de su cliente.
+        """
+        if not busqueda.terminos(search_term):
+            return queryset, False
+        return queryset.filter(
+            busqueda.condicion('muestra', search_term) |
+            busqueda.condicion('cliente', search_term, campo='cliente_id')
+        ), False
+    
     # Campos de solo lectura
     readonly_fields = [
         'codigo_muestra',
@@ -96,15 +318,15 @@ class MuestraAdmin(admin.ModelAdmin):
         'version_plataforma'
     ]
     
-    # Orden
-    ordering = ['-fecha_registro']
-    
-    # Fecha de jerarquía (permite navegar por fechas)
-    date_hierarchy = 'fecha_registro'
+    # Orden (índice muestra_fecha_reg_idx)
+    ordering = ['-fecha_registro', '-id']
     
     # Campos que se pueden editar directamente en la lista
     list_editable = ['estado']
     
+    # Relaciones con autocompletado (búsqueda en el admin relacionado)
+    autocomplete_fields = ['cliente', 'usuario_recepcion', 'usuario_aceptacion']
+    
     # Organización de campos en el formulario
     fieldsets = (
         ('Identificación', {
@@ -153,31 +375,15 @@ class MuestraAdmin(admin.ModelAdmin):
         }),
     )
     
-    # Acciones personalizadas
-    actions = ['marcar_como_aceptada', 'marcar_como_rechazada']
-    
-    def marcar_como_aceptada(self, request, queryset):
-        """Acción para marcar muestras como aceptadas"""
-        from django.utils import timezone
-        updated = queryset.update(
-            muestra_aceptada=True,
-            fecha_aceptacion=timezone.now(),
-            estado='ACEPTADA'
-        )
-        self.message_user(request, f'{updated} muestra(s) marcada(s) como aceptada(s).')
-    marcar_como_aceptada.short_description = "Marcar como aceptada(s)"
-    
-    def marcar_como_rechazada(self, request, queryset):
-        """Acción para marcar muestras como rechazadas"""
-        updated = queryset.update(estado='RECHAZADA')
-        self.message_user(request, f'{updated} muestra(s) marcada(s) como rechazada(s).')
-    marcar_como_rechazada.short_description = "Marcar como rechazada(s)"
+    # Acciones personalizadas: "Marcar como aceptada", "Marcar como rechazada", ...
+    maquina = MUESTRA
+    actions = acciones_transicion(MUESTRA)
 
 # =============================================================================
 # CONFIGURACIÓN DEL PANEL DE ADMINISTRACIÓN PARA ENSAYO
 # =============================================================================
 @admin.register(Ensayo)
-class EnsayoAdmin(admin.ModelAdmin):
+class EnsayoAdmin(AdminConTransiciones):
     """
     Configuración del panel de administración para el modelo Ensayo.
     """
@@ -191,13 +397,15 @@ class EnsayoAdmin(admin.ModelAdmin):
         'analista_asignado',
         'fecha_resultados_requerida'
     ]
+    # __str__ de la muestra incluye el nombre del cliente
+    list_select_related = ['muestra__cliente', 'analista_asignado']
     
     # Filtros
     list_filter = [
         'estado_ensayo',
         'prioridad',
         'fecha_resultados_requerida',
-        'analista_asignado'
+        FiltroAnalista
     ]
     
     # Búsqueda
@@ -210,15 +418,41 @@ class EnsayoAdmin(admin.ModelAdmin):
     # Campos de solo lectura
     readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
     
-    # Orden
-    ordering = ['prioridad', 'fecha_resultados_requerida']
-    
-    # Jerarquía de fecha
-    date_hierarchy = 'fecha_resultados_requerida'
+    # Orden (prioridad_rango: URGENTE primero; índice ensayo_prioridad_fecha_idx)
+    ordering = ['prioridad_rango', 'fecha_resultados_requerida', 'id']
     
     # Campos editables en lista
     list_editable = ['prioridad', 'estado_ensayo', 'analista_asignado']
     
+    autocomplete_fields = ['muestra', 'analista_asignado']
+    
+    # Acciones personalizadas: "Marcar como en proceso", "Marcar como completado", ...
+    maquina = ENSAYO
+    actions = acciones_transicion(ENSAYO)
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'analista_asignado':
+            kwargs['widget'] = AutocompletarConocidos(db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def get_changelist_form(self, request, **kwargs):
+        """
+        El analista de cada fila se muestra con el objeto ya cargado por
+        list_select_related (sin una consulta por fila).
+        """
+        base = super().get_changelist_form(request, **kwargs)
+        
+        class FormularioLista(base):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                campo = self.fields['analista_asignado']
+                # RelatedFieldWidgetWrapper envuelve al widget de autocompletado
+                widget = getattr(campo.widget, 'widget', campo.widget)
+                analista = self.instance.analista_asignado if self.instance.analista_asignado_id else None
+                widget.conocidos = {str(analista.pk): campo.label_from_instance(analista)} if analista else {}
+        
+        return FormularioLista
+    
     # Organización de campos
     fieldsets = (
         ('Información General', {
@@ -254,7 +488,7 @@ class EnsayoAdmin(admin.ModelAdmin):
 # CONFIGURACIÓN DEL PANEL DE ADMINISTRACIÓN PARA HISTORIAL
 # =============================================================================
 @admin.register(HistorialEstado)
-class HistorialEstadoAdmin(admin.ModelAdmin):
+class HistorialEstadoAdmin(AdminListaGrande):
     """
     Configuración del panel de administración para el modelo HistorialEstado.
     Solo lectura.
@@ -268,9 +502,10 @@ class HistorialEstadoAdmin(admin.ModelAdmin):
         'usuario',
         'fecha_cambio'
     ]
+    list_select_related = ['muestra__cliente', 'usuario']
     
     # Filtros
-    list_filter = ['estado_anterior', 'estado_nuevo', 'fecha_cambio']
+    list_filter = [FiltroEstadoAnterior, FiltroEstadoNuevo, 'fecha_cambio']
     
     # Búsqueda
     search_fields = ['muestra__codigo_muestra', 'observaciones']
@@ -285,11 +520,8 @@ class HistorialEstadoAdmin(admin.ModelAdmin):
         'observaciones'
     ]
     
-    # Orden
-    ordering = ['-fecha_cambio']
-    
-    # Jerarquía de fecha
-    date_hierarchy = 'fecha_cambio'
+    # Orden (índice historial_fecha_idx)
+    ordering = ['-fecha_cambio', '-id']
     
     # No permitir agregar, editar o eliminar
     def has_add_permission(self, request):
@@ -301,6 +533,38 @@ class HistorialEstadoAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return False
 
+# =============================================================================
+# CONFIGURACIÓN DEL PANEL DE ADMINISTRACIÓN PARA RESUMEN DIARIO
+# =============================================================================
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(AdminListaGrande):
+    """
+    Resumen diario de volúmenes y tiempos. Solo lectura: se mantiene desde la API
+    y se reconstruye con `python manage.py reconstruir_resumen_diario`.
+    """
+    list_display = [
+        'fecha',
+        'tipo_muestra',
+        'cliente',
+        'estado',
+        'muestras',
+        'ensayos_finalizados',
+        'ensayos_fuera_de_plazo'
+    ]
+    list_filter = ['estado', 'tipo_muestra', 'fecha']
+    list_select_related = ['cliente']
+    search_fields = ['cliente__nombre_empresa']
+    ordering = ['-fecha', 'id']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # Configuración del sitio admin
 admin.site.site_header = "Administración LIMS - Laboratorio de Control de Calidad"
 admin.site.site_title = "LIMS Admin"
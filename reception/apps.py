@@ -5,3 +5,13 @@ class ReceptionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reception'
     verbose_name = 'Recepción de Muestras'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401  (registra los receptores)
+        from .basedatos import configurar_conexion
+        from .instrumentacion import instalar_medicion_serializacion
+
+        connection_created.connect(configurar_conexion, dispatch_uid='lims_configurar_conexion')
+        instalar_medicion_serializacion()
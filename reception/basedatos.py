@@ -0,0 +1,31 @@
+"""
+Configuración de las conexiones a la base de datos.
+
+Al abrir cada conexión SQLite se ejecutan los PRAGMA de
+settings.LIMS_SQLITE['PRAGMAS'] (WAL, synchronous, busy_timeout, mmap y
+cache). Con CONN_MAX_AGE la conexión se reutiliza entre peticiones, así que
+esto ocurre una vez por proceso y no una vez por petición.
+"""
+from django.conf import settings
+
+
+def pragmas():
+    return getattr(settings, 'LIMS_SQLITE', {}).get('PRAGMAS', {})
+
+
+def aplicar_pragmas(cursor, valores=None):
+    """
+    Ejecuta PRAGMA nombre = valor para cada entrada de `valores` (por
+    defecto los de la configuración). Acepta cursores de Django y de sqlite3.
+    """
+    for nombre, valor in (pragmas() if valores is None else valores).items():
+        cursor.execute(f'PRAGMA {nombre} = {valor}')
+
+
+def configurar_conexion(sender, connection, **kwargs):
+    """
+    Receptor de connection_created (registrado en apps.py).
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            aplicar_pragmas(cursor)
@@ -0,0 +1,458 @@
+"""
+Escenarios de carga de la API (comando benchmark_api).
+
+Cada escenario es una petición a un endpoint documentado en urls.py (más
+/metrics) que se repite N veces y se mide con uno de dos ejecutores:
+
+- EjecutorCliente: cliente de pruebas de DRF en el mismo proceso. Mide la
+  pila de Django sin red y cuenta las consultas SQL exactas de cada petición.
+- EjecutorWSGI: servidor WSGI en 127.0.0.1 con un grupo fijo de hilos (como
+  un worker con hilos) y peticiones HTTP reales, opcionalmente concurrentes.
+  Las consultas se leen del encabezado Server-Timing de
+  InstrumentacionMiddleware (None si la instrumentación está deshabilitada)
+  e incluyen las dos de la autenticación por sesión.
+
+Las lecturas usan ids tomados al azar (con semilla) de los datos existentes,
+p. ej. los de generar_datos_sinteticos. Las escrituras solo tocan datos
+propios del benchmark (NIT 'BENCH-...', usuarios 'benchmark_...'), que se
+confirman en la base para que los vean los hilos del servidor y se eliminan
+al final con limpiar(). Las acciones que consumen su objetivo (eliminar,
+aceptar) crean uno nuevo antes de cada petición, fuera de la medición.
+"""
+import http.client
+import itertools
+import json
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from rest_framework.test import APIClient
+
+from .cache import invalidar_modelos
+from .models import Cliente, Muestra, Ensayo, HistorialEstado
+
+PREFIJO_NIT = 'BENCH-'
+PREFIJO_USUARIO = 'benchmark_'
+
+# Ids de lectura que se toman al azar por iteración
+TAMANO_MUESTREO = 200
+
+# Sufijo de los NIT creados durante la ejecución (únicos entre escenarios y modos)
+SECUENCIA = itertools.count(1)
+
+CLIENTE_NUEVO = {
+    'nombre_empresa': 'Cliente benchmark', 'nit': '{nit_nuevo}', 'direccion': 'N/A',
+    'ciudad': 'Bogotá', 'persona_contacto': 'N/A', 'email': 'benchmark@lab.com', 'telefono': '0',
+}
+MUESTRA_NUEVA = {
+    'cliente': '{b_cliente}', 'usuario_recepcion': '{b_usuario}', 'tipo_muestra': 'AGUA',
+    'matriz': 'Líquido', 'descripcion_muestra': 'Benchmark', 'cantidad_enviada': '10.00',
+    'fecha_envio': '2024-01-02T00:00:00Z', 'fecha_muestreo': '2024-01-01T00:00:00Z',
+    'responsable_muestreo': 'N/A', 'medio_entrega': 'PERSONAL',
+    'condiciones_almacenamiento': 'AMBIENTE',
+}
+ENSAYO_NUEVO = {
+    'muestra': '{b_muestra}', 'nombre_analisis': 'pH', 'fecha_resultados_requerida': '2099-01-01',
+}
+
+Escenario = namedtuple('Escenario', 'nombre metodo ruta payload preparar', defaults=(None, None))
+
+
+# =============================================================================
+# PREPARACIÓN POR ITERACIÓN (fuera de la medición)
+# =============================================================================
+def cliente_desechable(datos):
+    cliente = Cliente.objects.create(**dict(CLIENTE_NUEVO, nit=f'{PREFIJO_NIT}{datos["ejecucion"]}-{next(SECUENCIA)}'))
+    return {'desechable': cliente.pk}
+
+
+def muestra_desechable(datos):
+    ahora = timezone.now()
+    muestra = Muestra.objects.create(
+        cliente_id=datos['b_cliente'],
+        usuario_recepcion_id=datos['b_usuario'],
+        tipo_muestra='AGUA',
+        matriz='Líquido',
+        descripcion_muestra='Benchmark',
+        cantidad_enviada=Decimal('10.00'),
+        fecha_envio=ahora - timedelta(days=1),
+        fecha_muestreo=ahora - timedelta(days=2),
+        responsable_muestreo='N/A',
+        medio_entrega='PERSONAL',
+        condiciones_almacenamiento='AMBIENTE',
+    )
+    return {'desechable': muestra.pk}
+
+
+def ensayo_desechable(datos):
+    ensayo = Ensayo.objects.create(
+        muestra_id=datos['b_muestra'],
+        nombre_analisis='Benchmark',
+        fecha_resultados_requerida=timezone.localdate() + timedelta(days=7),
+    )
+    return {'desechable': ensayo.pk}
+
+
+def nit_nuevo(datos):
+    return {'nit_nuevo': f'{PREFIJO_NIT}{datos["ejecucion"]}-{next(SECUENCIA)}'}
+
+
+# =============================================================================
+# ESCENARIOS
+# =============================================================================
+# Marcadores de lectura (al azar entre los datos existentes): {cliente},
+# {muestra}, {codigo}, {sufijo}, {ensayo}, {historial}, {analista}.
+# Marcadores de escritura (datos del benchmark): {b_cliente}, {b_nit},
+# {b_muestra}, {b_ensayo}, {b_usuario}; {desechable} y {nit_nuevo} los crea
+# la función `preparar` del escenario.
+ESCENARIOS = [
+    Escenario('clientes.listar', 'get', '/api/clientes/'),
+    Escenario('clientes.crear', 'post', '/api/clientes/', CLIENTE_NUEVO, nit_nuevo),
+    Escenario('clientes.detalle', 'get', '/api/clientes/{cliente}/'),
+    Escenario('clientes.reemplazar', 'put', '/api/clientes/{b_cliente}/', dict(CLIENTE_NUEVO, nit='{b_nit}')),
+    Escenario('clientes.modificar', 'patch', '/api/clientes/{b_cliente}/', {'ciudad': 'Medellín'}),
+    Escenario('clientes.eliminar', 'delete', '/api/clientes/{desechable}/', None, cliente_desechable),
+    Escenario('clientes.muestras', 'get', '/api/clientes/{cliente}/muestras/'),
+
+    Escenario('muestras.listar', 'get', '/api/muestras/'),
+    Escenario('muestras.listar_estado', 'get', '/api/muestras/?estado=EN_ANALISIS'),
+    Escenario('muestras.listar_cursor', 'get', '/api/muestras/?paginacion=cursor'),
+    Escenario('muestras.crear', 'post', '/api/muestras/', MUESTRA_NUEVA),
+    Escenario('muestras.registro_masivo', 'post', '/api/muestras/registro_masivo/',
+              {'muestras': [MUESTRA_NUEVA] * 20}),
+    Escenario('muestras.exportar_csv', 'get', '/api/muestras/exportar/?formato=csv&cliente={cliente}'),
+    Escenario('muestras.exportar_ndjson', 'get', '/api/muestras/exportar/?formato=ndjson&cliente={cliente}'),
+    Escenario('muestras.escanear_codigo', 'get', '/api/muestras/escanear/?codigo={codigo}'),
+    Escenario('muestras.escanear_sufijo', 'get', '/api/muestras/escanear/?codigo={sufijo}'),
+    Escenario('muestras.detalle', 'get', '/api/muestras/{muestra}/'),
+    Escenario('muestras.reemplazar', 'put', '/api/muestras/{b_muestra}/', MUESTRA_NUEVA),
+    Escenario('muestras.modificar', 'patch', '/api/muestras/{b_muestra}/', {'lote': 'LOTE-BENCHMARK'}),
+    Escenario('muestras.eliminar', 'delete', '/api/muestras/{desechable}/', None, muestra_desechable),
+    Escenario('muestras.aceptar', 'post', '/api/muestras/{desechable}/aceptar/', {'aceptada': True},
+              muestra_desechable),
+    # Las transiciones solo se aplican una vez por objeto: cada iteración usa uno nuevo
+    Escenario('muestras.actualizar_estado', 'post', '/api/muestras/{desechable}/actualizar_estado/',
+              {'estado': 'RECHAZADA'}, muestra_desechable),
+    Escenario('muestras.ensayos', 'get', '/api/muestras/{muestra}/ensayos/'),
+    Escenario('muestras.agregar_ensayos', 'post', '/api/muestras/{b_muestra}/agregar_ensayos/', {'ensayos': [
+        {'nombre_analisis': 'pH', 'fecha_resultados_requerida': '2099-01-01'},
+        {'nombre_analisis': 'Densidad', 'fecha_resultados_requerida': '2099-01-01',
+         'analista_asignado': '{b_usuario}'},
+    ]}),
+    Escenario('muestras.validar_suficiencia', 'post', '/api/muestras/{muestra}/validar_suficiencia/',
+              {'cantidad_requerida': '1.00'}),
+    Escenario('muestras.historial', 'get', '/api/muestras/{muestra}/historial/'),
+
+    Escenario('ensayos.listar', 'get', '/api/ensayos/'),
+    Escenario('ensayos.listar_cursor', 'get', '/api/ensayos/?paginacion=cursor'),
+    Escenario('ensayos.crear', 'post', '/api/ensayos/', ENSAYO_NUEVO),
+    Escenario('ensayos.worklist', 'get', '/api/ensayos/worklist/?analista={analista}'),
+    Escenario('ensayos.detalle', 'get', '/api/ensayos/{ensayo}/'),
+    Escenario('ensayos.reemplazar', 'put', '/api/ensayos/{b_ensayo}/', dict(ENSAYO_NUEVO, prioridad='ALTA')),
+    Escenario('ensayos.modificar', 'patch', '/api/ensayos/{b_ensayo}/', {'norma_metodo': 'USP <791>'}),
+    Escenario('ensayos.eliminar', 'delete', '/api/ensayos/{desechable}/', None, ensayo_desechable),
+    Escenario('ensayos.asignar_analista', 'post', '/api/ensayos/{b_ensayo}/asignar_analista/',
+              {'analista_id': '{b_usuario}'}),
+    Escenario('ensayos.registrar_resultados', 'post', '/api/ensayos/{desechable}/registrar_resultados/',
+              {'resultados': 'pH 7.0'}, ensayo_desechable),
+
+    Escenario('historial.listar', 'get', '/api/historial/'),
+    Escenario('historial.listar_cursor', 'get', '/api/historial/?paginacion=cursor'),
+    Escenario('historial.detalle', 'get', '/api/historial/{historial}/'),
+
+    Escenario('estadisticas.resumen', 'get', '/api/estadisticas/'),
+    Escenario('estadisticas.tendencias', 'get', '/api/estadisticas/tendencias/?agrupar=mes'),
+
+    Escenario('buscar.todos', 'get', '/api/buscar/?q=empresa'),
+    Escenario('buscar.muestra', 'get', '/api/buscar/?q={sufijo}&tipo=muestra'),
+
+    Escenario('cache.estadisticas', 'get', '/api/cache/'),
+    Escenario('cache.reiniciar', 'post', '/api/cache/reiniciar/'),
+    Escenario('rendimiento.resumen', 'get', '/api/rendimiento/'),
+    Escenario('rendimiento.reiniciar', 'post', '/api/rendimiento/reiniciar/'),
+    Escenario('metricas', 'get', '/metrics'),
+]
+
+
+def formatear(valor, datos):
+    """
+    Sustituye los marcadores en rutas y payloads.
+    """
+    if isinstance(valor, str):
+        return valor.format(**datos)
+    if isinstance(valor, dict):
+        return {clave: formatear(v, datos) for clave, v in valor.items()}
+    if isinstance(valor, list):
+        return [formatear(v, datos) for v in valor]
+    return valor
+
+
+# =============================================================================
+# DATOS DEL BENCHMARK
+# =============================================================================
+def crear_datos(ejecucion):
+    """
+    Usuario, cliente, muestra y ensayo propios del benchmark (confirmados).
+    """
+    with transaction.atomic():
+        usuario = User.objects.create_user(
+            username=f'{PREFIJO_USUARIO}{ejecucion}', is_staff=True, is_superuser=True
+        )
+        nit = f'{PREFIJO_NIT}{ejecucion}'
+        cliente = Cliente.objects.create(**dict(CLIENTE_NUEVO, nit=nit))
+        datos = {'ejecucion': ejecucion, 'b_usuario': usuario.pk, 'b_cliente': cliente.pk, 'b_nit': nit}
+        datos['b_muestra'] = muestra_desechable(datos)['desechable']
+        datos['b_ensayo'] = ensayo_desechable(datos)['desechable']
+    return usuario, datos
+
+
+def limpiar():
+    """
+    Elimina todo lo creado por benchmarks (también de ejecuciones interrumpidas).
+    """
+    with transaction.atomic():
+        # Ensayos, historial y resumen diario se eliminan en cascada
+        Muestra.objects.filter(cliente__nit__startswith=PREFIJO_NIT).delete()
+        Cliente.objects.filter(nit__startswith=PREFIJO_NIT).delete()
+        User.objects.filter(username__startswith=PREFIJO_USUARIO).delete()
+    invalidar_modelos(Cliente, Muestra, Ensayo, HistorialEstado, User)
+
+
+def muestrear(queryset, campos, cantidad, rng):
+    """
+    Hasta `cantidad` filas al azar sin ORDER BY RANDOM() (que recorre toda la
+    tabla): la primera fila con pk >= un valor aleatorio del rango de pks.
+    """
+    limites = queryset.aggregate(minimo=Min('pk'), maximo=Max('pk'))
+    if limites['minimo'] is None:
+        return []
+    filas = set()
+    for _ in range(cantidad):
+        pk = rng.randint(limites['minimo'], limites['maximo'])
+        filas.update(queryset.filter(pk__gte=pk).order_by('pk').values_list(*campos)[:1])
+    return sorted(filas)
+
+
+def muestreo_lectura(rng):
+    """
+    Ids para los marcadores de lectura (después de crear_datos, así nunca
+    están vacíos).
+    """
+    muestras = muestrear(Muestra.objects.all(), ['pk', 'codigo_muestra', 'sufijo_codigo'], TAMANO_MUESTREO, rng)
+    analistas = muestrear(
+        Ensayo.objects.filter(analista_asignado__isnull=False), ['analista_asignado'], TAMANO_MUESTREO, rng
+    )
+    return {
+        'cliente': [fila[0] for fila in muestrear(Cliente.objects.all(), ['pk'], TAMANO_MUESTREO, rng)],
+        'muestra': muestras,
+        'ensayo': [fila[0] for fila in muestrear(Ensayo.objects.all(), ['pk'], TAMANO_MUESTREO, rng)],
+        'historial': [fila[0] for fila in muestrear(HistorialEstado.objects.all(), ['pk'], TAMANO_MUESTREO, rng)],
+        'analista': [fila[0] for fila in analistas] or [None],
+    }
+
+
+def datos_iteracion(base, muestreo, rng):
+    pk, codigo, sufijo = rng.choice(muestreo['muestra'])
+    return dict(
+        base,
+        cliente=rng.choice(muestreo['cliente']),
+        muestra=pk, codigo=codigo, sufijo=sufijo,
+        ensayo=rng.choice(muestreo['ensayo']),
+        historial=rng.choice(muestreo['historial']),
+        analista=rng.choice(muestreo['analista']) or 'ninguno',
+    )
+
+
+# =============================================================================
+# EJECUTORES
+# =============================================================================
+def consultas_server_timing(valor):
+    """
+    Número de consultas del encabezado Server-Timing (db;...;desc="N consultas").
+    """
+    for parte in (valor or '').split(','):
+        if parte.strip().startswith('db;') and 'desc="' in parte:
+            return int(parte.split('desc="', 1)[1].split()[0])
+    return None
+
+
+class EjecutorCliente:
+    nombre = 'cliente'
+
+    def __init__(self, usuario):
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.force_authenticate(user=usuario)
+
+    def ejecutar(self, metodo, solicitudes, concurrencia=1):
+        """
+        [(estado, segundos, consultas)] de cada (url, payload), en orden.
+        """
+        resultados = []
+        for url, payload in solicitudes:
+            with CaptureQueriesContext(connection) as contexto:
+                inicio = time.perf_counter()
+                response = getattr(self.client, metodo)(url, payload, format='json')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                segundos = time.perf_counter() - inicio
+            resultados.append((response.status_code, segundos, len(contexto.captured_queries)))
+        return resultados
+
+    def cerrar(self):
+        pass
+
+
+class ServidorWSGI(WSGIServer):
+    """
+    WSGIServer que atiende cada conexión en un grupo fijo de hilos: las
+    conexiones a la base se reutilizan entre peticiones como en un worker.
+    """
+    def __init__(self, direccion, manejador, hilos):
+        super().__init__(direccion, manejador)
+        self.grupo = ThreadPoolExecutor(hilos, thread_name_prefix='lims-benchmark')
+
+    def process_request(self, request, client_address):
+        self.grupo.submit(self.atender, request, client_address)
+
+    def atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class ManejadorSilencioso(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class EjecutorWSGI:
+    nombre = 'wsgi'
+
+    def __init__(self, usuario, hilos):
+        self.servidor = ServidorWSGI(('127.0.0.1', 0), ManejadorSilencioso, hilos)
+        self.servidor.set_app(get_wsgi_application())
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self.hilo.start()
+
+        sesion = Client()
+        sesion.force_login(usuario)
+        csrf = get_random_string(32)
+        self.encabezados = {
+            'Host': 'localhost',
+            'Content-Type': 'application/json',
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={sesion.cookies[settings.SESSION_COOKIE_NAME].value}; '
+                      f'{settings.CSRF_COOKIE_NAME}={csrf}',
+            'X-CSRFToken': csrf,
+        }
+
+    def peticion(self, metodo, url, payload):
+        conexion = http.client.HTTPConnection(*self.servidor.server_address)
+        try:
+            cuerpo = json.dumps(payload) if payload is not None else None
+            inicio = time.perf_counter()
+            conexion.request(metodo.upper(), url, body=cuerpo, headers=self.encabezados)
+            response = conexion.getresponse()
+            response.read()
+            segundos = time.perf_counter() - inicio
+        finally:
+            conexion.close()
+        return response.status, segundos, consultas_server_timing(response.getheader('Server-Timing'))
+
+    def ejecutar(self, metodo, solicitudes, concurrencia=1):
+        with ThreadPoolExecutor(concurrencia) as grupo:
+            return list(grupo.map(lambda solicitud: self.peticion(metodo, *solicitud), solicitudes))
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        self.servidor.grupo.shutdown(wait=True)
+
+
+# =============================================================================
+# ESTADÍSTICAS
+# =============================================================================
+def percentil(ordenados, p):
+    """
+    Percentil por rango más cercano de una lista ordenada.
+    """
+    indice = max(0, -(-len(ordenados) * p // 100) - 1)
+    return ordenados[int(indice)]
+
+
+def estadisticas(resultados, segundos_totales):
+    tiempos = sorted(segundos * 1000 for _, segundos, _ in resultados)
+    consultas = [cantidad for _, _, cantidad in resultados if cantidad is not None]
+    estados = Counter(str(estado) for estado, _, _ in resultados)
+    return {
+        'peticiones': len(resultados),
+        'errores': sum(1 for estado, _, _ in resultados if estado >= 400),
+        'estados': dict(sorted(estados.items())),
+        'ms': {
+            'p50': round(percentil(tiempos, 50), 3),
+            'p90': round(percentil(tiempos, 90), 3),
+            'p95': round(percentil(tiempos, 95), 3),
+            'p99': round(percentil(tiempos, 99), 3),
+            'max': round(tiempos[-1], 3),
+            'promedio': round(sum(tiempos) / len(tiempos), 3),
+        },
+        'peticiones_por_segundo': round(len(resultados) / segundos_totales, 1),
+        'consultas': {
+            'promedio': round(sum(consultas) / len(consultas), 2),
+            'max': max(consultas),
+        } if consultas else None,
+    }
+
+
+def ejecutar_escenario(ejecutor, escenario, base, muestreo, rng, repeticiones, calentamiento, concurrencia):
+    """
+    Prepara las solicitudes (ids al azar y objetos desechables) y las mide.
+    Las de calentamiento se ejecutan pero no se reportan.
+    """
+    solicitudes = []
+    for n in range(calentamiento + repeticiones):
+        datos = datos_iteracion(base, muestreo, rng)
+        if escenario.preparar:
+            datos.update(escenario.preparar(datos))
+        solicitudes.append((formatear(escenario.ruta, datos), formatear(escenario.payload, datos)))
+
+    if calentamiento:
+        ejecutor.ejecutar(escenario.metodo, solicitudes[:calentamiento], concurrencia)
+    inicio = time.perf_counter()
+    resultados = ejecutor.ejecutar(escenario.metodo, solicitudes[calentamiento:], concurrencia)
+    return estadisticas(resultados, time.perf_counter() - inicio)
+
+
+def comparar(anterior, actual):
+    """
+    [(modo, escenario, p50 antes, p50 ahora, p95 antes, p95 ahora, consultas antes, consultas ahora)]
+    de los escenarios presentes en ambos reportes.
+    """
+    filas = []
+    for modo, escenarios in actual['resultados'].items():
+        for nombre, datos in escenarios.items():
+            previo = anterior.get('resultados', {}).get(modo, {}).get(nombre)
+            if previo is None:
+                continue
+            filas.append((
+                modo, nombre,
+                previo['ms']['p50'], datos['ms']['p50'],
+                previo['ms']['p95'], datos['ms']['p95'],
+                (previo['consultas'] or {}).get('promedio'), (datos['consultas'] or {}).get('promedio'),
+            ))
+    return filas
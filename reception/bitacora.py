@@ -0,0 +1,285 @@
+"""
+Registro (logging) sin bloquear las peticiones.
+
+settings.LOGGING usa ManejadorEnCola para lims.log: el hilo de la petición
+solo pone el registro en una cola en memoria y un hilo de fondo lo escribe
+como una línea JSON. El hilo escribe por lotes (un flush por lote, no por
+registro) y rota el archivo por tamaño o por tiempo, lo que ocurra primero.
+Si la cola se llena, los registros nuevos se descartan y se cuentan, en
+lugar de hacer esperar a la petición.
+
+Con varios procesos escribiendo el mismo archivo (workers de gunicorn) la
+rotación dentro de cada proceso no es segura: cada uno renombraría el
+archivo por su cuenta. Con rotacion_externa=True (perfil prod) ningún
+proceso rota; lo hace logrotate y cada proceso reabre el archivo cuando
+cambia. Cada lote se escribe con una sola llamada a os.write en modo
+append, así que las líneas de distintos procesos no se mezclan.
+
+FiltroMuestreo deja pasar solo una fracción de los registros informativos de
+GET en las rutas de mucho volumen (tasas en settings.LIMS_REGISTRO_MUESTREO).
+Los registros de nivel WARNING o superior nunca se descartan.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler, WatchedFileHandler
+
+# Atributos propios de LogRecord: el resto son campos de extra={...}
+ATRIBUTOS_LOGRECORD = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class FormateadorJSON(logging.Formatter):
+    """
+    Una línea JSON por registro con fecha, nivel, logger, módulo, mensaje y
+    los campos pasados en extra={...}.
+    """
+    def format(self, record):
+        datos = {
+            'fecha': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'modulo': record.module,
+            'mensaje': record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave in ATRIBUTOS_LOGRECORD or clave.startswith('_'):
+                continue
+            if clave == 'request':
+                # HttpRequest de django.request: solo lo que sirve para filtrar
+                if hasattr(valor, 'method'):
+                    datos.setdefault('metodo', valor.method)
+                    datos.setdefault('ruta', valor.path)
+                continue
+            datos[clave] = valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class ArchivoRotativo(RotatingFileHandler):
+    """
+    RotatingFileHandler que además rota cada `intervalo` segundos y que
+    puede escribir varios registros con un solo flush (escribir_lote).
+    """
+    def __init__(self, archivo, max_bytes=0, copias=0, intervalo=0):
+        super().__init__(archivo, maxBytes=max_bytes, backupCount=copias, encoding='utf-8')
+        self.intervalo = intervalo
+        self.proxima_rotacion = time.time() + intervalo
+
+    def emit(self, record):
+        self.escribir_lote([record])
+
+    def escribir_lote(self, registros):
+        self.acquire()
+        try:
+            for record in registros:
+                if record.levelno < self.level:
+                    continue
+                try:
+                    linea = self.format(record) + self.terminator
+                    if self.stream is None:
+                        self.stream = self._open()
+                    if self.debe_rotar(len(linea.encode('utf-8'))):
+                        self.doRollover()
+                    self.stream.write(linea)
+                except Exception:
+                    self.handleError(record)
+            if self.stream is not None:
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def debe_rotar(self, tamano):
+        if self.intervalo and time.time() >= self.proxima_rotacion:
+            return True
+        return bool(self.maxBytes) and self.stream.tell() + tamano > self.maxBytes
+
+    def doRollover(self):
+        super().doRollover()
+        self.proxima_rotacion = time.time() + self.intervalo
+
+
+class ArchivoVigilado(WatchedFileHandler):
+    """
+    WatchedFileHandler con escritura por lotes para cuando varios procesos
+    comparten el archivo: no rota (lo hace una herramienta externa) y lo
+    reabre si fue movido o eliminado. Cada lote va en un solo os.write sobre
+    el descriptor abierto en modo append, sin el búfer del stream.
+    """
+    def __init__(self, archivo):
+        super().__init__(archivo, encoding='utf-8')
+
+    def emit(self, record):
+        self.escribir_lote([record])
+
+    def escribir_lote(self, registros):
+        lineas = []
+        for record in registros:
+            if record.levelno < self.level:
+                continue
+            try:
+                lineas.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        if not lineas:
+            return
+        self.acquire()
+        try:
+            self.reopenIfNeeded()
+            if self.stream is None:
+                self.stream = self._open()
+            os.write(self.stream.fileno(), ''.join(lineas).encode('utf-8'))
+        except Exception:
+            self.handleError(registros[-1])
+        finally:
+            self.release()
+
+
+class ManejadorEnCola(QueueHandler):
+    """
+    Pone los registros en una cola acotada; un hilo los escribe en un
+    ArchivoRotativo (o ArchivoVigilado) con formato JSON en lotes de hasta
+    `lote` registros.
+
+    Parámetros (desde settings.LOGGING):
+    - archivo, max_bytes, copias: como RotatingFileHandler.
+    - horas: rota también cada tantas horas (0 = solo por tamaño).
+    - lote: máximo de registros por escritura.
+    - capacidad: tamaño de la cola; si se llena se descartan registros.
+    - rotacion_externa: no rotar desde el proceso (max_bytes, copias y horas
+      se ignoran) y reabrir el archivo cuando lo rote logrotate. Necesario
+      si varios procesos escriben el mismo archivo.
+    """
+    def __init__(self, archivo, max_bytes=10 * 1024 * 1024, copias=10, horas=24, lote=200, capacidad=10000,
+                 rotacion_externa=False):
+        self.capacidad = capacidad
+        self.lote = lote
+        self.descartados = 0
+        if rotacion_externa:
+            self.destino = ArchivoVigilado(archivo)
+        else:
+            self.destino = ArchivoRotativo(archivo, max_bytes, copias, int(horas * 3600))
+        self.destino.setFormatter(FormateadorJSON())
+        super().__init__(queue.Queue(capacidad))
+        self.iniciar()
+        atexit.register(self.detener)
+        # Con gunicorn --preload la configuración se carga antes del fork y
+        # el hilo no existe en los workers: cada hijo arranca el suyo.
+        os.register_at_fork(after_in_child=self.reiniciar)
+
+    def prepare(self, record):
+        """
+        Copia del registro para la cola. QueueHandler.prepare lo formatea
+        con el formateador del manejador y deja el traceback solo dentro de
+        msg; aquí msg y args se conservan (FormateadorJSON los combina al
+        escribir) y el traceback pasa a exc_text, que se escribe en el campo
+        'excepcion'. exc_info no se encola para no retener los frames.
+        """
+        record = copy.copy(record)
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.destino.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def iniciar(self):
+        self.hilo = threading.Thread(target=self.escribir, name='lims-bitacora', daemon=True)
+        self.hilo.start()
+
+    def reiniciar(self):
+        self.queue = queue.Queue(self.capacidad)
+        self.iniciar()
+
+    def detener(self):
+        """
+        Escribe lo pendiente y termina el hilo.
+        """
+        if self.hilo.is_alive():
+            self.queue.put(None)
+            self.hilo.join()
+
+    def escribir(self):
+        while True:
+            registros = [self.queue.get()]
+            while registros[-1] is not None and len(registros) < self.lote:
+                try:
+                    registros.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            fin = registros[-1] is None
+            if fin:
+                registros.pop()
+            if self.descartados:
+                descartados, self.descartados = self.descartados, 0
+                registros.append(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': 'Cola de registro llena: %s registro(s) descartado(s)', 'args': (descartados,),
+                }))
+            self.destino.escribir_lote(registros)
+            if fin:
+                return
+
+    def close(self):
+        self.detener()
+        self.destino.close()
+        super().close()
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Deja pasar con probabilidad `tasa` los registros de nivel menor a WARNING
+    de peticiones GET/HEAD cuya ruta empieza por alguno de los prefijos de
+    `tasas` ({prefijo: tasa}; gana el prefijo más largo). Los registros que
+    pasan llevan el campo `muestreo` con la tasa aplicada, para poder
+    reescalar conteos al analizar el archivo.
+    """
+    def __init__(self, tasas=None):
+        super().__init__()
+        self.tasas = sorted((tasas or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.tasas:
+            return True
+        metodo, ruta = datos_peticion(record)
+        if metodo not in ('GET', 'HEAD') or ruta is None:
+            return True
+        for prefijo, tasa in self.tasas:
+            if ruta.startswith(prefijo):
+                if tasa >= 1:
+                    return True
+                record.muestreo = tasa
+                return random.random() < tasa
+        return True
+
+
+def datos_peticion(record):
+    """
+    (método, ruta) de la petición a la que se refiere un registro: campos
+    extra 'metodo' y 'ruta', el HttpRequest de django.request o la línea de
+    petición de django.server ("GET /api/muestras/ HTTP/1.1").
+    """
+    if hasattr(record, 'metodo') and hasattr(record, 'ruta'):
+        return record.metodo, record.ruta
+    request = getattr(record, 'request', None)
+    if hasattr(request, 'method'):
+        return request.method, request.path
+    if record.name == 'django.server' and record.args and isinstance(record.args[0], str):
+        partes = record.args[0].split()
+        if len(partes) >= 2:
+            return partes[0], partes[1]
+    return None, None
@@ -0,0 +1,226 @@
+"""
+Búsqueda de texto completo para muestras y clientes.
+
+Reemplaza los LIKE '%texto%' (que recorren toda la tabla) por un índice:
+- SQLite: tablas virtuales FTS5 (una por modelo, rowid = id del objeto) con
+  tokenizador unicode61 remove_diacritics, de modo que "farmaceutica" encuentra
+  "Farmacéutica". Se mantienen sincronizadas con señales (ver signals.py) y,
+  en las inserciones masivas, con indexar_lote().
+- PostgreSQL: índices GIN sobre to_tsvector('simple', lims_unaccent(...)) y de
+  trigramas sobre el nombre del cliente; no requieren sincronización.
+- Otros motores: icontains sobre los mismos campos, sin ranking.
+
+Cada término de la consulta se busca como prefijo ("farmac" → "farmacéutica")
+y todos los términos deben aparecer (AND). Los índices se crean en la
+migración 0006 y se regeneran con `python manage.py reconstruir_indice_busqueda`.
+"""
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Cliente, Muestra
+
+# Campos indexados por tipo, con su peso en el ranking (mayor = más relevante)
+INDICES = {
+    'muestra': {
+        'modelo': Muestra,
+        'tabla': 'reception_busqueda_muestra',
+        'campos': {'codigo_muestra': 10.0, 'lote': 5.0, 'descripcion_muestra': 1.0, 'matriz': 1.0},
+    },
+    'cliente': {
+        'modelo': Cliente,
+        'tabla': 'reception_busqueda_cliente',
+        'campos': {'nombre_empresa': 10.0, 'nit': 10.0, 'persona_contacto': 2.0, 'ciudad': 1.0},
+    },
+}
+
+TIPOS = tuple(INDICES)
+
+
+def motor():
+    """'sqlite', 'postgresql' o None (búsqueda con icontains)."""
+    return connection.vendor if connection.vendor in ('sqlite', 'postgresql') else None
+
+
+def terminos(texto):
+    return re.findall(r'\w+', texto or '')
+
+
+# =============================================================================
+# SQL DE LOS ÍNDICES (la migración 0006 tiene su propia copia)
+# =============================================================================
+def sql_crear_fts(tipo):
+    indice = INDICES[tipo]
+    columnas = ', '.join(indice['campos'])
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {indice['tabla']} USING fts5("
+        f"{columnas}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+    )
+
+
+def sql_documento_pg(tipo):
+    """
+    Expresión tsvector del documento. Debe coincidir exactamente con la del
+    índice GIN para que PostgreSQL lo use.
+    """
+    partes = " || ' ' || ".join(f"coalesce({campo}, '')" for campo in INDICES[tipo]['campos'])
+    return f"to_tsvector('simple', lims_unaccent({partes}))"
+
+
+def sql_crear_pg():
+    sentencias = [
+        'CREATE EXTENSION IF NOT EXISTS unaccent',
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        # unaccent() no es IMMUTABLE; el envoltorio permite usarlo en índices
+        "CREATE OR REPLACE FUNCTION lims_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT public.unaccent('public.unaccent', $1) $$",
+        "CREATE INDEX IF NOT EXISTS cliente_nombre_trgm_idx ON reception_cliente "
+        "USING gin (lims_unaccent(nombre_empresa) gin_trgm_ops)",
+    ]
+    for tipo, indice in INDICES.items():
+        tabla_modelo = indice['modelo']._meta.db_table
+        sentencias.append(
+            f"CREATE INDEX IF NOT EXISTS {tipo}_busqueda_idx ON {tabla_modelo} "
+            f"USING gin ({sql_documento_pg(tipo)})"
+        )
+    return sentencias
+
+
+# =============================================================================
+# SINCRONIZACIÓN DEL ÍNDICE FTS5 (solo SQLite)
+# =============================================================================
+def tipo_de(modelo):
+    for tipo, indice in INDICES.items():
+        if indice['modelo'] is modelo:
+            return tipo
+    return None
+
+
+def indexar_lote(objetos, tipo):
+    """
+    Inserta o reemplaza los documentos de `objetos` en el índice FTS5.
+    """
+    if motor() != 'sqlite' or not objetos:
+        return
+    indice = INDICES[tipo]
+    campos = list(indice['campos'])
+    filas = [[objeto.pk] + [getattr(objeto, campo) or '' for campo in campos] for objeto in objetos]
+    marcadores = ', '.join(['%s'] * (len(campos) + 1))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {indice['tabla']} WHERE rowid = %s", [[fila[0]] for fila in filas])
+        cursor.executemany(
+            f"INSERT INTO {indice['tabla']} (rowid, {', '.join(campos)}) VALUES ({marcadores})",
+            filas
+        )
+
+
+def desindexar(objeto, tipo):
+    if motor() != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDICES[tipo]['tabla']} WHERE rowid = %s", [objeto.pk])
+
+
+def reconstruir_indice(tipo, tamano_bloque=2000):
+    """
+    Vacía y vuelve a llenar el índice FTS5 de un tipo. Retorna los documentos indexados.
+    """
+    if motor() != 'sqlite':
+        return 0
+    indice = INDICES[tipo]
+    with connection.cursor() as cursor:
+        cursor.execute(sql_crear_fts(tipo))
+        cursor.execute(f"DELETE FROM {indice['tabla']}")
+    total = 0
+    lote = []
+    objetos = indice['modelo'].objects.only(*indice['campos']).order_by('pk')
+    for objeto in objetos.iterator(chunk_size=tamano_bloque):
+        lote.append(objeto)
+        if len(lote) == tamano_bloque:
+            indexar_lote(lote, tipo)
+            total += len(lote)
+            lote = []
+    indexar_lote(lote, tipo)
+    return total + len(lote)
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+def buscar_ids(tipo, texto, limite):
+    """
+    Retorna [(id, puntaje)] ordenados por relevancia (puntaje mayor primero).
+    Sin índice disponible el puntaje es None.
+    """
+    palabras = terminos(texto)
+    if not palabras:
+        return []
+    indice = INDICES[tipo]
+
+    if motor() == 'sqlite':
+        consulta = ' '.join(f'"{palabra}"*' for palabra in palabras)
+        pesos = ', '.join(str(peso) for peso in indice['campos'].values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, -bm25({indice['tabla']}, {pesos}) AS puntaje "
+                f"FROM {indice['tabla']} WHERE {indice['tabla']} MATCH %s "
+                f"ORDER BY puntaje DESC LIMIT %s",
+                [consulta, limite]
+            )
+            return [(fila[0], round(fila[1], 6)) for fila in cursor.fetchall()]
+
+    if motor() == 'postgresql':
+        consulta = ' & '.join(f'{palabra}:*' for palabra in palabras)
+        documento = sql_documento_pg(tipo)
+        tabla_modelo = indice['modelo']._meta.db_table
+        puntaje = f"ts_rank({documento}, to_tsquery('simple', lims_unaccent(%s)))"
+        condicion = f"{documento} @@ to_tsquery('simple', lims_unaccent(%s))"
+        parametros_puntaje, parametros_condicion = [consulta], [consulta]
+        if tipo == 'cliente':
+            # Trigramas: tolera errores de escritura en el nombre del cliente
+            puntaje = f"{puntaje} + similarity(lims_unaccent(nombre_empresa), lims_unaccent(%s))"
+            condicion = f"({condicion} OR lims_unaccent(nombre_empresa) %% lims_unaccent(%s))"
+            parametros_puntaje.append(texto)
+            parametros_condicion.append(texto)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, {puntaje} AS puntaje FROM {tabla_modelo} WHERE {condicion} "
+                f"ORDER BY puntaje DESC LIMIT %s",
+                parametros_puntaje + parametros_condicion + [limite]
+            )
+            return [(fila[0], round(float(fila[1]), 6)) for fila in cursor.fetchall()]
+
+    filtro = reduce(and_, [
+        reduce(or_, [Q(**{f'{campo}__icontains': palabra}) for campo in indice['campos']])
+        for palabra in palabras
+    ])
+    ids = indice['modelo'].objects.filter(filtro).values_list('pk', flat=True)[:limite]
+    return [(pk, None) for pk in ids]
+
+
+def condicion(tipo, texto, campo='pk'):
+    """
+    Q que restringe `campo` (pk o una FK hacia el modelo indexado) a los objetos
+    que coinciden con `texto`. La coincidencia se resuelve en el índice como
+    subconsulta, sin límite de resultados. La usa el admin.
+    """
+    palabras = terminos(texto)
+    indice = INDICES[tipo]
+
+    if motor() == 'sqlite':
+        consulta = ' '.join(f'"{palabra}"*' for palabra in palabras)
+        return Q(**{f'{campo}__in': RawSQL(
+            f"SELECT rowid FROM {indice['tabla']} WHERE {indice['tabla']} MATCH %s", [consulta]
+        )})
+    if motor() == 'postgresql':
+        consulta = ' & '.join(f'{palabra}:*' for palabra in palabras)
+        tabla_modelo = indice['modelo']._meta.db_table
+        return Q(**{f'{campo}__in': RawSQL(
+            f"SELECT id FROM {tabla_modelo} WHERE {sql_documento_pg(tipo)} "
+            f"@@ to_tsquery('simple', lims_unaccent(%s))", [consulta]
+        )})
+    return Q(**{f'{campo}__in': [pk for pk, _ in buscar_ids(tipo, texto, None)]})
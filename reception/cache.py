@@ -0,0 +1,225 @@
+"""
+Cache de respuestas para las acciones `list` de la API.
+
+Los tableros de recepción consultan las mismas listas cada pocos segundos.
+RespuestaCacheadaMixin guarda el JSON ya renderizado de cada lista, con una
+clave formada por:
+- el basename del ViewSet,
+- la versión actual de cada modelo del que depende la lista (`modelos_cache`),
+- los parámetros de URL normalizados (ordenados).
+
+Cada post_save/post_delete de un modelo incrementa su versión (ver signals.py),
+con lo que todas las entradas que dependen de él dejan de usarse de inmediato
+sin tener que recorrerlas. Las operaciones masivas que no emiten señales
+(bulk_create, queryset.update) llaman a invalidar_modelos() explícitamente.
+
+El backend es el alias LIMS_CACHE_RESPUESTAS['ALIAS'] de settings.CACHES y
+debe ser común a todos los procesos del servidor (en disco por defecto, o
+Redis): una versión incrementada solo en la memoria del proceso que atendió
+la escritura dejaría a los demás sirviendo la lista anterior hasta que venza
+el TIMEOUT.
+"""
+import hashlib
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_http_date_safe
+from rest_framework.renderers import JSONRenderer
+
+from . import metricas
+from .condicional import aplicar_validadores, respuesta_no_modificada
+
+PREFIJO = 'lims'
+
+
+def configuracion():
+    return getattr(settings, 'LIMS_CACHE_RESPUESTAS', {})
+
+
+def backend():
+    return caches[configuracion().get('ALIAS', 'default')]
+
+
+def cache_habilitada():
+    return configuracion().get('HABILITADA', True)
+
+
+# =============================================================================
+# VERSIONES POR MODELO
+# =============================================================================
+def clave_version(modelo):
+    return f'{PREFIJO}:version:{modelo._meta.label_lower}'
+
+
+def versiones(modelos):
+    """
+    Retorna la versión actual de cada modelo, creándola si no existe.
+    Una versión perdida (por ejemplo, descartada al depurar la cache) se
+    reemplaza por una nueva, que nunca repite un valor anterior.
+    """
+    cache = backend()
+    claves = [clave_version(modelo) for modelo in modelos]
+    actuales = cache.get_many(claves)
+    for clave in claves:
+        if clave not in actuales:
+            cache.add(clave, nueva_version(), timeout=None)
+            actuales[clave] = cache.get(clave)
+    return [actuales[clave] for clave in claves]
+
+
+def nueva_version():
+    return f'{time.time_ns():x}{secrets.token_hex(4)}'
+
+
+def incrementar_version(modelo):
+    """
+    Reemplaza la versión por un valor nuevo en lugar de usar incr(): en la
+    cache en disco incr() lee y reescribe el valor, y dos procesos que
+    invalidan a la vez podrían dejar la misma versión.
+    """
+    backend().set(clave_version(modelo), nueva_version(), timeout=None)
+
+
+def invalidar_modelos(*modelos):
+    """
+    Invalida todas las respuestas que dependen de los modelos indicados.
+    Dentro de una transacción la invalidación se aplica al confirmar, para
+    que ninguna petición concurrente cachee datos previos al commit con la
+    versión nueva.
+    """
+    def aplicar():
+        for modelo in modelos:
+            incrementar_version(modelo)
+    transaction.on_commit(aplicar)
+
+
+# =============================================================================
+# CONTADORES DE ACIERTOS Y FALLOS
+# =============================================================================
+# Contador de metricas.py en la memoria del proceso: la petición no escribe
+# en la cache (incr() en disco lee y reescribe el archivo, y dos procesos a
+# la vez perderían incrementos). /api/cache/ y /metrics suman los de todos
+# los procesos (LIMS_METRICAS_DIR).
+METRICA = 'lims_cache_respuestas_total'
+CLAVE_REINICIO = f'{PREFIJO}:estadisticas:reinicio'
+
+
+def registrar(basename, resultado):
+    metricas.incrementar(METRICA, basename=basename, resultado=resultado)
+
+
+def conteos(basenames):
+    """
+    {(basename, resultado): total} de todos los procesos.
+    """
+    contadores, histogramas = metricas.valores_combinados()
+    totales = {(basename, resultado): 0 for basename in basenames for resultado in ('acierto', 'fallo')}
+    for (nombre, etiquetas), valor in contadores.items():
+        etiquetas = dict(etiquetas)
+        clave = (etiquetas.get('basename'), etiquetas.get('resultado'))
+        if nombre == METRICA and clave in totales:
+            totales[clave] = valor
+    return totales
+
+
+def estadisticas(basenames):
+    """
+    Retorna {basename: {'aciertos', 'fallos', 'tasa_aciertos'}} desde el
+    último reinicio.
+    """
+    base = backend().get(CLAVE_REINICIO, {})
+    desde_reinicio = {}
+    for clave, total in conteos(basenames).items():
+        anterior = base.get(clave, 0)
+        # Un total menor que el del reinicio: los contadores volvieron a cero
+        desde_reinicio[clave] = total - anterior if total >= anterior else total
+    resultado = {}
+    for basename in basenames:
+        aciertos = desde_reinicio[(basename, 'acierto')]
+        fallos = desde_reinicio[(basename, 'fallo')]
+        total = aciertos + fallos
+        resultado[basename] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / total, 4) if total else None,
+        }
+    return resultado
+
+
+def reiniciar_estadisticas(basenames):
+    """
+    Guarda los totales actuales como punto de partida de estadisticas(); los
+    contadores de /metrics siguen creciendo.
+    """
+    cache = backend()
+    cache.set(CLAVE_REINICIO, {**cache.get(CLAVE_REINICIO, {}), **conteos(basenames)}, timeout=None)
+
+
+# =============================================================================
+# MIXIN PARA VIEWSETS
+# =============================================================================
+def clave_respuesta(basename, request, modelos):
+    parametros = sorted(
+        (clave, sorted(valores)) for clave, valores in request.query_params.lists()
+    )
+    # Se incluye el host porque los enlaces next/previous son URLs absolutas
+    ruta = request.build_absolute_uri(request.path)
+    huella = hashlib.md5(f'{ruta}?{parametros}'.encode()).hexdigest()
+    version = '.'.join(str(v) for v in versiones(modelos))
+    return f'{PREFIJO}:respuesta:{basename}:{version}:{huella}'
+
+
+class RespuestaCacheadaMixin:
+    """
+    Cachea el JSON renderizado de la acción `list`.
+    Los ViewSets declaran en `modelos_cache` los modelos que aparecen en la
+    respuesta; una escritura en cualquiera de ellos invalida la lista.
+    Solo se cachean respuestas JSON (la interfaz navegable no se cachea).
+    Si la lista emite ETag (RespuestaCondicionalMixin), el validador se guarda
+    junto al contenido y un acierto puede responder 304 sin consultar la BD.
+    """
+    modelos_cache = ()
+    # Vigencia máxima en segundos; None usa LIMS_CACHE_RESPUESTAS['TIMEOUT']
+    timeout_cache = None
+
+    def list(self, request, *args, **kwargs):
+        if not cache_habilitada() or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        cache = backend()
+        clave = clave_respuesta(self.basename, request, self.modelos_cache)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            registrar(self.basename, 'acierto')
+            return self.respuesta_cacheada(request, *entrada)
+
+        registrar(self.basename, 'fallo')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        entrada = (
+            JSONRenderer().render(response.data),
+            response.get('ETag'),
+            response.get('Last-Modified'),
+        )
+        timeout = self.timeout_cache
+        if timeout is None:
+            timeout = configuracion().get('TIMEOUT', 60)
+        cache.set(clave, entrada, timeout)
+        return self.respuesta_cacheada(request, *entrada)
+
+    def respuesta_cacheada(self, request, contenido, etag, last_modified):
+        if etag is None:
+            return HttpResponse(contenido, content_type='application/json')
+        last_modified = parse_http_date_safe(last_modified) if last_modified else None
+        no_modificada = respuesta_no_modificada(request, etag, last_modified)
+        if no_modificada is not None:
+            return no_modificada
+        return aplicar_validadores(
+            HttpResponse(contenido, content_type='application/json'), etag, last_modified
+        )
@@ -0,0 +1,201 @@
+"""
+Generación de códigos de muestra (codigo_muestra).
+
+El generador se elige con settings.LIMS_CODIGOS['GENERADOR']: un nombre de
+GENERADORES o la ruta a una clase propia con el método reservar(cantidad).
+- 'aleatorio'  LIMS-YYYYMMDD-8D40E079: 8 hex de uuid4 (formato histórico).
+- 'temporal'   LIMS-YYYYMMDD-0A1B2C3D4E5F: milisegundos del día seguidos de
+  bits aleatorios. Los códigos crecen con el tiempo, así que cada inserción
+  cae al final del índice único en lugar de en una página al azar.
+- 'secuencial' LIMS-YYYYMMDD-000123: consecutivo por día (SecuenciaCodigo).
+  Cada proceso reserva un bloque de números en una sola consulta y los
+  reparte desde memoria; un registro masivo de N muestras reserva los N
+  de una vez.
+
+Las muestras se guardan con asignar_y_guardar(): si el INSERT choca con un
+código existente se generan códigos nuevos y se repite dentro de un savepoint.
+"""
+import logging
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PREFIJO = 'LIMS'
+INTENTOS = 5
+
+
+def configuracion():
+    return getattr(settings, 'LIMS_CODIGOS', {})
+
+
+# =============================================================================
+# GENERADORES
+# =============================================================================
+class GeneradorAleatorio:
+    """
+    LIMS-YYYYMMDD-XXXXXXXX con 8 caracteres hexadecimales aleatorios.
+    Las colisiones son improbables pero posibles; las resuelve el reintento.
+    """
+    def __init__(self, configuracion):
+        pass
+
+    def reservar(self, cantidad):
+        fecha = timezone.now().strftime('%Y%m%d')
+        codigos = set()
+        while len(codigos) < cantidad:
+            codigos.add(f"{PREFIJO}-{fecha}-{str(uuid.uuid4())[:8].upper()}")
+        return list(codigos)
+
+
+class GeneradorTemporal:
+    """
+    LIMS-YYYYMMDD-TTTTTTTRRRRR: 7 hex con los milisegundos del día (UTC) y
+    5 hex aleatorios. Dentro de un proceso los códigos son estrictamente
+    crecientes aunque se pidan varios en el mismo milisegundo.
+    """
+    BITS_ALEATORIOS = 20
+
+    def __init__(self, configuracion):
+        self.lock = threading.Lock()
+        self.ultimo = (None, -1)  # (fecha, valor)
+
+    def reservar(self, cantidad):
+        milisegundos = time.time_ns() // 1_000_000
+        fecha = datetime.fromtimestamp(milisegundos / 1000, tz=dt_timezone.utc).strftime('%Y%m%d')
+        inicial = (milisegundos % 86_400_000) << self.BITS_ALEATORIOS | secrets.randbits(self.BITS_ALEATORIOS)
+
+        with self.lock:
+            fecha_anterior, anterior = self.ultimo
+            if fecha == fecha_anterior and inicial <= anterior:
+                inicial = anterior + 1
+            self.ultimo = (fecha, inicial + cantidad - 1)
+        return [f"{PREFIJO}-{fecha}-{valor:012X}" for valor in range(inicial, inicial + cantidad)]
+
+
+class GeneradorSecuencial:
+    """
+    LIMS-YYYYMMDD-NNNNNN con un consecutivo por día.
+
+    Los números se reservan en la BD por bloques de BLOQUE (o de la cantidad
+    pedida, si es mayor). Los sobrantes de un bloque quedan disponibles para
+    el proceso solo cuando la transacción que los reservó se confirma: si se
+    revierte, la reserva en la BD también se revierte y los sobrantes se
+    descartan, de modo que ningún número se entrega dos veces.
+    """
+    def __init__(self, configuracion):
+        self.bloque = configuracion.get('BLOQUE', 50)
+        self.lock = threading.Lock()
+        self.disponibles = {}  # {fecha: range}
+
+    def reservar(self, cantidad):
+        hoy = timezone.now().date()
+        with self.lock:
+            disponibles = self.disponibles.get(hoy, range(0))
+            numeros = list(disponibles[:cantidad])
+            self.disponibles = {hoy: disponibles[len(numeros):]}
+
+        faltan = cantidad - len(numeros)
+        if faltan:
+            pedido = max(faltan, self.bloque)
+            ultimo = reservar_numeros(hoy, pedido)
+            primero = ultimo - pedido + 1
+            numeros.extend(range(primero, primero + faltan))
+            sobrantes = range(primero + faltan, ultimo + 1)
+            if sobrantes:
+                transaction.on_commit(lambda: self.devolver(hoy, sobrantes))
+
+        fecha = hoy.strftime('%Y%m%d')
+        return [f"{PREFIJO}-{fecha}-{numero:06d}" for numero in numeros]
+
+    def devolver(self, fecha, sobrantes):
+        with self.lock:
+            # Si otro hilo ya dejó un bloque disponible, estos números se pierden (hueco)
+            if not self.disponibles.get(fecha):
+                self.disponibles = {fecha: sobrantes}
+
+
+def reservar_numeros(fecha, cantidad):
+    """
+    Suma `cantidad` al consecutivo del día y retorna el último número reservado.
+    En SQLite y PostgreSQL es un solo INSERT ... ON CONFLICT ... RETURNING; la
+    fila queda bloqueada hasta el fin de la transacción, así que dos procesos
+    nunca reciben el mismo rango.
+    """
+    SecuenciaCodigo = apps.get_model('reception', 'SecuenciaCodigo')
+    if connection.vendor in ('sqlite', 'postgresql') and connection.features.can_return_rows_from_bulk_insert:
+        tabla = SecuenciaCodigo._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {tabla} (fecha, ultimo) VALUES (%s, %s) "
+                f"ON CONFLICT (fecha) DO UPDATE SET ultimo = {tabla}.ultimo + excluded.ultimo "
+                f"RETURNING ultimo",
+                [connection.ops.adapt_datefield_value(fecha), cantidad]
+            )
+            return cursor.fetchone()[0]
+
+    with transaction.atomic():
+        secuencia, _ = SecuenciaCodigo.objects.select_for_update().get_or_create(fecha=fecha)
+        SecuenciaCodigo.objects.filter(pk=secuencia.pk).update(ultimo=F('ultimo') + cantidad)
+        return secuencia.ultimo + cantidad
+
+
+GENERADORES = {
+    'aleatorio': GeneradorAleatorio,
+    'temporal': GeneradorTemporal,
+    'secuencial': GeneradorSecuencial,
+}
+
+_generador = (None, None)  # (configuración con la que se creó, instancia)
+
+
+def generador():
+    """
+    Instancia del generador configurado (una por proceso: el temporal y el
+    secuencial guardan estado entre llamadas).
+    """
+    global _generador
+    actual = configuracion()
+    if _generador[0] != actual:
+        nombre = actual.get('GENERADOR', 'aleatorio')
+        clase = GENERADORES[nombre] if nombre in GENERADORES else import_string(nombre)
+        _generador = (dict(actual), clase(actual))
+    return _generador[1]
+
+
+# =============================================================================
+# GUARDADO CON REINTENTO
+# =============================================================================
+def asignar_y_guardar(muestras, guardar):
+    """
+    Asigna códigos nuevos a `muestras` y ejecuta guardar() (save o bulk_create)
+    en un savepoint. Si falla porque alguno de los códigos ya existe, genera
+    otros y reintenta hasta INTENTOS veces; cualquier otro IntegrityError se
+    propaga sin cambios.
+    """
+    Muestra = apps.get_model('reception', 'Muestra')
+    for intento in range(1, INTENTOS + 1):
+        codigos = generador().reservar(len(muestras))
+        for muestra, codigo in zip(muestras, codigos):
+            muestra.codigo_muestra = codigo
+            muestra.sufijo_codigo = Muestra.sufijo_de(codigo)
+        try:
+            with transaction.atomic():
+                return guardar()
+        except IntegrityError:
+            if intento == INTENTOS or not Muestra.objects.filter(codigo_muestra__in=codigos).exists():
+                raise
+            logger.warning(
+                'Colisión de codigo_muestra (intento %s de %s); se generan códigos nuevos',
+                intento, INTENTOS
+            )
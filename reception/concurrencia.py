@@ -0,0 +1,120 @@
+"""
+Control de concurrencia de las escrituras sobre muestras y ensayos.
+
+Dos mecanismos complementarios:
+- Bloqueo de fila: las acciones que modifican un objeto (acciones_bloqueo)
+  lo leen con select_for_update() dentro de su transacción, así que dos
+  peticiones sobre el mismo objeto se ejecutan una después de la otra y la
+  segunda ve el resultado de la primera (p. ej. una muestra no se acepta dos
+  veces ni deja dos registros de historial). SQLite ignora FOR UPDATE: allí
+  se toma el bloqueo de escritura de la base antes de leer, con un UPDATE
+  que no afecta ninguna fila. Las transiciones masivas usan el mismo bloqueo
+  (ver transiciones.py).
+- Revisión optimista: Muestra y Ensayo tienen `revision`, que aumenta en cada
+  escritura. Si la petición envía la revisión que leyó ("revision" en el
+  cuerpo) y ya no es la actual, responde 409 en lugar de sobrescribir los
+  cambios de otro usuario. Estas acciones solo aceptan un objeto JSON como
+  cuerpo: una lista o un escalar responden 400.
+
+`python manage.py probar_concurrencia` lanza peticiones simultáneas sobre el
+mismo objeto y verifica que cada transición deje un solo registro.
+"""
+from collections.abc import Mapping
+
+from django.db import connection, transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+
+class ConflictoConcurrencia(APIException):
+    """
+    409 con la revisión actual, para que el cliente vuelva a consultar.
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'El registro fue modificado por otro usuario; vuelva a consultarlo.'
+    default_code = 'conflicto'
+
+    def __init__(self, revision):
+        super().__init__()
+        # APIException convierte los valores del detalle en texto
+        self.detail = {'error': self.detail, 'revision': revision}
+
+
+def bloquear_escritura(modelo):
+    """
+    En SQLite, toma el bloqueo de escritura de la base (lo que SELECT ...
+    FOR UPDATE haría con las filas). Debe ser la primera consulta de la
+    transacción: si antes se leyó, SQLite no permite escribir sobre una
+    instantánea que otra conexión ya modificó.
+    """
+    if connection.vendor == 'sqlite':
+        modelo._default_manager.filter(pk__isnull=True).update(revision=F('revision'))
+
+
+def verificar_revision(objeto, esperada):
+    """
+    Responde 409 si `esperada` (la revisión que envió el cliente) no es la
+    revisión actual del objeto. Sin revisión no se verifica nada.
+    """
+    if esperada in (None, ''):
+        return
+    try:
+        esperada = int(esperada)
+    except (TypeError, ValueError):
+        raise ValidationError({'revision': 'Debe ser un número entero.'})
+    if objeto.revision != esperada:
+        raise ConflictoConcurrencia(objeto.revision)
+
+
+def revision_enviada(request):
+    """
+    "revision" del cuerpo de la petición. Responde 400 si el cuerpo no es un
+    objeto (p. ej. una lista JSON), en lugar de fallar con AttributeError.
+    """
+    if not isinstance(request.data, Mapping):
+        raise ValidationError({
+            'non_field_errors': [f'Se esperaba un objeto JSON, no {type(request.data).__name__}.'],
+        })
+    return request.data.get('revision')
+
+
+class BloqueoFilaMixin:
+    """
+    Para las acciones de `acciones_bloqueo`, get_object() bloquea la fila y
+    verifica la revisión enviada. Las acciones personalizadas llaman a
+    get_object() como primera consulta dentro de transaction.atomic();
+    update (PUT/PATCH) y destroy quedan envueltas aquí.
+    """
+    acciones_bloqueo = ('update', 'partial_update', 'destroy')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.acciones_bloqueo:
+            # Antes de la acción, que puede leer request.data.get(...)
+            revision_enviada(request)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.acciones_bloqueo:
+            # Solo la fila del objeto, no las de sus select_related
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
+
+    def get_object(self):
+        if self.action not in self.acciones_bloqueo:
+            return super().get_object()
+        if not connection.in_atomic_block:
+            raise RuntimeError(f'{self.__class__.__name__}.{self.action} debe ejecutarse en una transacción')
+        bloquear_escritura(self.queryset.model)
+        objeto = super().get_object()
+        verificar_revision(objeto, revision_enviada(self.request))
+        return objeto
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().destroy(request, *args, **kwargs)
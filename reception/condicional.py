@@ -0,0 +1,119 @@
+"""
+Peticiones condicionales (ETag / Last-Modified) para la API.
+
+Los clientes que consultan periódicamente una muestra o una lista reenvían el
+ETag recibido en If-None-Match (o la fecha en If-Modified-Since). Si nada cambió
+se responde 304 sin cargar el objeto completo ni serializarlo.
+
+Los validadores se calculan así:
+- Detalle: con una consulta barata, fecha_actualizacion del objeto y de sus
+  relaciones anidadas (la más reciente y el número de filas, para detectar
+  eliminaciones), antes de cargar y serializar el objeto.
+- Lista: huella de la página ya serializada (filas, conteo y enlaces). No
+  agrega consultas: un agregado sobre todo el queryset filtrado recorrería la
+  tabla en cada sondeo, también con ?conteo=no o ?paginacion=cursor. Solo
+  ETag: la fecha más reciente de una página no refleja las filas eliminadas,
+  así que un Last-Modified de lista podría responder 304 con datos viejos.
+
+Los datos de usuarios (UserSerializer) no tienen fecha de modificación y no
+forman parte de los validadores.
+"""
+import calendar
+import hashlib
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def calcular_validadores(valores, variante=''):
+    """
+    Retorna (etag, last_modified) a partir de los valores de la consulta.
+    El ETag es débil porque identifica los datos, no los bytes: la misma
+    versión puede renderizarse como JSON o como interfaz navegable (variante).
+    """
+    huella = hashlib.md5(f'{variante}:{valores!r}'.encode()).hexdigest()
+    fechas = [valor for valor in valores if isinstance(valor, datetime)]
+    last_modified = calendar.timegm(max(fechas).utctimetuple()) if fechas else None
+    return f'W/"{huella}"', last_modified
+
+
+def aplicar_validadores(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def respuesta_no_modificada(request, etag, last_modified):
+    """
+    Retorna una respuesta 304 (con sus validadores) si la petición condicional
+    coincide, o None si hay que construir la respuesta completa.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        aplicar_validadores(response, etag, last_modified)
+    return response
+
+
+class RespuestaCondicionalMixin:
+    """
+    Agrega ETag/Last-Modified a `retrieve` y `list` y responde 304 cuando el
+    cliente ya tiene la versión actual.
+
+    Los ViewSets pueden ampliar anotaciones_detalle(): fechas y conteos de
+    las relaciones anidadas.
+    """
+    campo_fecha_validador = 'fecha_actualizacion'
+
+    def anotaciones_detalle(self):
+        return {}
+
+    def variante_validador(self):
+        return f'{self.basename}:{self.action}:{self.request.accepted_renderer.format}'
+
+    def validadores_detalle(self):
+        """
+        Retorna (etag, last_modified), o None si el objeto no existe
+        (retrieve responderá 404 como siempre).
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        anotaciones = self.anotaciones_detalle()
+        valores = (
+            self.queryset.model._default_manager
+            .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            .annotate(**anotaciones)
+            .values_list(self.campo_fecha_validador, *anotaciones)
+            .first()
+        )
+        if valores is None:
+            return None
+        return calcular_validadores(valores, self.variante_validador())
+
+    def validadores_lista(self, response):
+        """
+        (etag, None) a partir de los datos de la página ya serializada.
+        """
+        etag, _ = calcular_validadores((response.data,), self.variante_validador())
+        return etag, None
+
+    def retrieve(self, request, *args, **kwargs):
+        validadores = self.validadores_detalle()
+        if validadores is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        no_modificada = respuesta_no_modificada(request, *validadores)
+        if no_modificada is not None:
+            return no_modificada
+        return aplicar_validadores(super().retrieve(request, *args, **kwargs), *validadores)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        # 304 sin cuerpo: se evita transferir y renderizar la página
+        validadores = self.validadores_lista(response)
+        no_modificada = respuesta_no_modificada(request, *validadores)
+        if no_modificada is not None:
+            return no_modificada
+        return aplicar_validadores(response, *validadores)
@@ -0,0 +1,123 @@
+"""
+Exportación de muestras con sus ensayos (CSV y NDJSON).
+
+Las exportaciones de auditoría pueden cubrir un año completo. Las filas se
+generan de forma perezosa para StreamingHttpResponse:
+- las muestras se leen con values_list().iterator() por bloques de
+  TAMANO_BLOQUE, sin cargar todo el resultado en memoria;
+- los ensayos de cada bloque se precargan con una sola consulta
+  (muestra_id IN ...), igual que prefetch_related pero sin construir
+  instancias de modelo, que era el costo dominante;
+- el primer byte (la cabecera CSV) sale antes de ejecutar cualquier consulta.
+"""
+import csv
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+from .models import Ensayo
+
+TAMANO_BLOQUE = 2000
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+CAMPOS_MUESTRA = [
+    'id', 'codigo_muestra', 'estado', 'tipo_muestra', 'matriz', 'lote',
+    'cantidad_enviada', 'unidad_cantidad', 'fecha_muestreo', 'fecha_envio',
+    'fecha_registro', 'fecha_recepcion', 'medio_entrega', 'condiciones_recepcion',
+    'riesgo_asociado', 'muestra_aceptada', 'fecha_aceptacion',
+]
+CAMPOS_CLIENTE = ['nombre_empresa', 'nit']
+CAMPOS_ENSAYO = [
+    'id', 'nombre_analisis', 'norma_metodo', 'prioridad', 'estado_ensayo',
+    'fecha_resultados_requerida', 'fecha_inicio', 'fecha_finalizacion',
+]
+
+COLUMNAS_MUESTRA = CAMPOS_MUESTRA + [f'cliente_{campo}' for campo in CAMPOS_CLIENTE]
+
+
+def valor_plano(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def plano(fila):
+    return [valor_plano(valor) for valor in fila]
+
+
+def recorrer(queryset):
+    """
+    Genera (fila_muestra, filas_ensayos) en el orden del queryset.
+    Cada bloque de muestras cuesta dos consultas: la lectura del bloque
+    y la de sus ensayos.
+    """
+    filas = queryset.values_list(
+        *CAMPOS_MUESTRA, *[f'cliente__{campo}' for campo in CAMPOS_CLIENTE]
+    ).iterator(chunk_size=TAMANO_BLOQUE)
+
+    while bloque := list(islice(filas, TAMANO_BLOQUE)):
+        ensayos = defaultdict(list)
+        consulta = (
+            Ensayo.objects
+            .filter(muestra_id__in=[fila[0] for fila in bloque])
+            .order_by('prioridad_rango', 'fecha_resultados_requerida', 'id')
+            .values_list('muestra_id', *CAMPOS_ENSAYO)
+        )
+        for muestra_id, *ensayo in consulta:
+            ensayos[muestra_id].append(plano(ensayo))
+        for fila in bloque:
+            yield plano(fila), ensayos.get(fila[0], [])
+
+
+# =============================================================================
+# GENERADORES POR FORMATO
+# =============================================================================
+class _Eco:
+    """
+    Pseudo-archivo para csv.writer: retorna la línea escrita en lugar de
+    guardarla, para enviarla directamente al cliente.
+    """
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(queryset):
+    """
+    Una fila por ensayo, con los datos de la muestra repetidos.
+    Las muestras sin ensayos generan una fila con las columnas de ensayo vacías.
+    """
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(
+        ['muestra_id'] + COLUMNAS_MUESTRA[1:] + [f'ensayo_{campo}' for campo in CAMPOS_ENSAYO]
+    )
+
+    vacias = [''] * len(CAMPOS_ENSAYO)
+    for muestra, ensayos in recorrer(queryset):
+        if not ensayos:
+            yield escritor.writerow(muestra + vacias)
+        for ensayo in ensayos:
+            yield escritor.writerow(muestra + ensayo)
+
+
+def lineas_ndjson(queryset):
+    """
+    Un objeto JSON por línea: la muestra con sus ensayos anidados.
+    """
+    for muestra, ensayos in recorrer(queryset):
+        datos = dict(zip(COLUMNAS_MUESTRA, muestra))
+        datos['ensayos'] = [dict(zip(CAMPOS_ENSAYO, ensayo)) for ensayo in ensayos]
+        yield json.dumps(datos, ensure_ascii=False) + '\n'
+
+
+GENERADORES = {
+    'csv': lineas_csv,
+    'ndjson': lineas_ndjson,
+}
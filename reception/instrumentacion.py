@@ -0,0 +1,342 @@
+"""
+Instrumentación por petición: tiempo total, tiempo de serialización y
+consultas SQL de cada vista.
+
+InstrumentacionMiddleware mide cada petición y:
+- agrega el encabezado Server-Timing (total, db, ser), visible en las
+  herramientas de desarrollo del navegador;
+- acumula un histograma por vista (p. ej. MuestraViewSet.aceptar) con los
+  últimos VENTANA_MINUTOS minutos, expuesto en GET /api/rendimiento/;
+- alimenta la latencia y el conteo de peticiones por vista de /metrics
+  (ver metricas.py);
+- registra cada petición en el logger 'reception.instrumentacion' (los GET
+  de mucho volumen se muestrean, ver bitacora.py) y, si supera
+  UMBRAL_LENTO_MS, un WARNING con las consultas repetidas y el EXPLAIN de
+  las más lentas.
+
+Las consultas se cuentan con connection.execute_wrapper (un incremento en
+un diccionario por consulta) y la serialización con un envoltorio sobre
+Serializer.data y ListSerializer.data instalado en apps.py, así que el costo
+por petición es de microsegundos. Las consultas de una respuesta en
+streaming ocurren después y no se cuentan.
+"""
+import contextvars
+import heapq
+import logging
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from . import metricas
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de las cubetas del histograma; la última es abierta
+CUBETAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_medicion = contextvars.ContextVar('lims_medicion', default=None)
+
+
+def configuracion():
+    return getattr(settings, 'LIMS_INSTRUMENTACION', {})
+
+
+# =============================================================================
+# MEDICIÓN DE UNA PETICIÓN
+# =============================================================================
+class Medicion:
+    __slots__ = ('vista', 'inicio', 'consultas', 'segundos_sql', 'serializacion',
+                 'serializando', 'sentencias', 'lentas', 'cantidad_lentas')
+
+    def __init__(self, cantidad_lentas):
+        self.vista = None
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.serializacion = 0.0
+        self.serializando = False
+        self.sentencias = {}  # {sql: veces}
+        self.lentas = []  # heap de (segundos, orden, alias, sql, params)
+        self.cantidad_lentas = cantidad_lentas
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        execute_wrapper: cuenta y cronometra cada consulta.
+        """
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            segundos = time.perf_counter() - inicio
+            self.consultas += 1
+            self.segundos_sql += segundos
+            self.sentencias[sql] = self.sentencias.get(sql, 0) + 1
+            if self.cantidad_lentas and not many:
+                entrada = (segundos, self.consultas, context['connection'].alias, sql, params)
+                if len(self.lentas) < self.cantidad_lentas:
+                    heapq.heappush(self.lentas, entrada)
+                elif segundos > self.lentas[0][0]:
+                    heapq.heapreplace(self.lentas, entrada)
+
+    def duplicadas(self):
+        """
+        [(huella, veces)] de las sentencias ejecutadas más de una vez. La huella
+        agrupa las listas IN (%s, %s, ...) de cualquier longitud.
+        """
+        huellas = {}
+        for sql, veces in self.sentencias.items():
+            huella = huella_sql(sql)
+            huellas[huella] = huellas.get(huella, 0) + veces
+        return sorted(
+            ((huella, veces) for huella, veces in huellas.items() if veces > 1),
+            key=lambda item: -item[1]
+        )
+
+
+PATRON_LISTA_IN = re.compile(r'\((?:%s, )+%s\)')
+
+
+def huella_sql(sql):
+    return PATRON_LISTA_IN.sub('(%s, ...)', sql)
+
+
+def nombre_vista(view_func, request):
+    """
+    ViewSet.acción para DRF (MuestraViewSet.aceptar); para otras vistas, el
+    nombre de la URL (admin:reception_muestra_changelist).
+    """
+    clase = getattr(view_func, 'cls', None)
+    if clase is not None:
+        acciones = getattr(view_func, 'actions', None) or {}
+        accion = acciones.get(request.method.lower())
+        return f'{clase.__name__}.{accion}' if accion else clase.__name__
+    if request.resolver_match is not None and request.resolver_match.view_name:
+        return request.resolver_match.view_name
+    return f'{view_func.__module__}.{getattr(view_func, "__name__", "vista")}'
+
+
+# =============================================================================
+# SERIALIZACIÓN
+# =============================================================================
+def instalar_medicion_serializacion():
+    """
+    Envuelve Serializer.data y ListSerializer.data para sumar su tiempo a la
+    medición activa. Los serializers anidados usan to_representation, así que
+    solo se mide el serializer raíz.
+    """
+    from rest_framework import serializers
+
+    for clase in (serializers.Serializer, serializers.ListSerializer):
+        original = clase.__dict__['data']
+        if getattr(original.fget, 'medido', False):
+            continue
+
+        def data(self, _fget=original.fget):
+            medicion = _medicion.get()
+            if medicion is None or medicion.serializando:
+                return _fget(self)
+            medicion.serializando = True
+            inicio = time.perf_counter()
+            try:
+                return _fget(self)
+            finally:
+                medicion.serializacion += time.perf_counter() - inicio
+                medicion.serializando = False
+
+        data.medido = True
+        clase.data = property(data, doc=original.__doc__)
+
+
+# =============================================================================
+# HISTOGRAMA POR VISTA (ventana deslizante por minutos)
+# =============================================================================
+class Histograma:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.minutos = {}  # {minuto: {vista: acumulado}}
+
+    @staticmethod
+    def ventana():
+        return configuracion().get('VENTANA_MINUTOS', 15)
+
+    def agregar(self, vista, estado, total, medicion, duplicadas):
+        minuto = int(time.time() // 60)
+        total_ms = total * 1000
+        cubeta = next((i for i, limite in enumerate(CUBETAS_MS) if total_ms <= limite), len(CUBETAS_MS))
+        with self.lock:
+            vistas = self.minutos.get(minuto)
+            if vistas is None:
+                vistas = self.minutos[minuto] = {}
+                for anterior in [m for m in self.minutos if m <= minuto - self.ventana()]:
+                    del self.minutos[anterior]
+            acumulado = vistas.get(vista)
+            if acumulado is None:
+                acumulado = vistas[vista] = {
+                    'peticiones': 0, 'errores': 0, 'ms': 0.0, 'max_ms': 0.0,
+                    'consultas': 0, 'sql_ms': 0.0, 'serializacion_ms': 0.0,
+                    'con_duplicadas': 0, 'cubetas': [0] * (len(CUBETAS_MS) + 1),
+                }
+            acumulado['peticiones'] += 1
+            acumulado['errores'] += estado >= 500
+            acumulado['ms'] += total_ms
+            acumulado['max_ms'] = max(acumulado['max_ms'], total_ms)
+            acumulado['consultas'] += medicion.consultas
+            acumulado['sql_ms'] += medicion.segundos_sql * 1000
+            acumulado['serializacion_ms'] += medicion.serializacion * 1000
+            acumulado['con_duplicadas'] += bool(duplicadas)
+            acumulado['cubetas'][cubeta] += 1
+
+    def resumen(self):
+        """
+        {vista: estadísticas} de la ventana, de la vista con más tiempo
+        acumulado a la de menos.
+        """
+        desde = int(time.time() // 60) - self.ventana()
+        totales = {}
+        with self.lock:
+            for minuto, vistas in self.minutos.items():
+                if minuto <= desde:
+                    continue
+                for vista, acumulado in vistas.items():
+                    total = totales.setdefault(vista, {
+                        clave: ([0] * len(valor) if clave == 'cubetas' else 0)
+                        for clave, valor in acumulado.items()
+                    })
+                    for clave, valor in acumulado.items():
+                        if clave == 'cubetas':
+                            total[clave] = [a + b for a, b in zip(total[clave], valor)]
+                        elif clave == 'max_ms':
+                            total[clave] = max(total[clave], valor)
+                        else:
+                            total[clave] += valor
+
+        resultado = {}
+        for vista, total in sorted(totales.items(), key=lambda item: -item[1]['ms']):
+            n = total['peticiones']
+            resultado[vista] = {
+                'peticiones': n,
+                'errores': total['errores'],
+                'ms_total': round(total['ms'], 1),
+                'ms_promedio': round(total['ms'] / n, 2),
+                'ms_p50': percentil(total['cubetas'], 0.50, total['max_ms']),
+                'ms_p95': percentil(total['cubetas'], 0.95, total['max_ms']),
+                'ms_p99': percentil(total['cubetas'], 0.99, total['max_ms']),
+                'ms_max': round(total['max_ms'], 2),
+                'consultas_promedio': round(total['consultas'] / n, 2),
+                'sql_ms_promedio': round(total['sql_ms'] / n, 2),
+                'serializacion_ms_promedio': round(total['serializacion_ms'] / n, 2),
+                'peticiones_con_duplicadas': total['con_duplicadas'],
+                'histograma': dict(zip(
+                    [f'<={limite}' for limite in CUBETAS_MS] + [f'>{CUBETAS_MS[-1]}'],
+                    total['cubetas']
+                )),
+            }
+        return resultado
+
+    def reiniciar(self):
+        with self.lock:
+            self.minutos.clear()
+
+
+def percentil(cubetas, p, maximo):
+    """
+    Límite superior (ms) de la cubeta que contiene el percentil p.
+    """
+    objetivo = p * sum(cubetas)
+    acumulado = 0
+    for limite, cantidad in zip(CUBETAS_MS, cubetas):
+        acumulado += cantidad
+        if acumulado >= objetivo:
+            return min(limite, round(maximo, 2))
+    return round(maximo, 2)
+
+
+histograma = Histograma()
+
+
+# =============================================================================
+# MIDDLEWARE
+# =============================================================================
+class InstrumentacionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = configuracion()
+        if not config.get('HABILITADA', True):
+            return self.get_response(request)
+
+        medicion = Medicion(config.get('CONSULTAS_EXPLAIN', 3))
+        token = _medicion.set(medicion)
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(medicion))
+                response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        total = time.perf_counter() - medicion.inicio
+
+        vista = medicion.vista or 'sin_vista'  # 404 antes de resolver la URL
+        duplicadas = medicion.duplicadas()
+        response['Server-Timing'] = (
+            f'total;dur={total * 1000:.1f}, '
+            f'db;dur={medicion.segundos_sql * 1000:.1f};desc="{medicion.consultas} consultas", '
+            f'ser;dur={medicion.serializacion * 1000:.1f}'
+        )
+        histograma.agregar(vista, response.status_code, total, medicion, duplicadas)
+        metricas.observar('lims_http_duracion_segundos', total, vista=vista)
+        metricas.incrementar('lims_http_peticiones_total', vista=vista, estado=f'{response.status_code // 100}xx')
+        self.registrar(request, response, vista, total, medicion, duplicadas, config)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicion = _medicion.get()
+        if medicion is not None:
+            medicion.vista = nombre_vista(view_func, request)
+
+    def registrar(self, request, response, vista, total, medicion, duplicadas, config):
+        datos = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': vista,
+            'estado': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'consultas': medicion.consultas,
+            'sql_ms': round(medicion.segundos_sql * 1000, 2),
+            'serializacion_ms': round(medicion.serializacion * 1000, 2),
+        }
+        umbral = config.get('UMBRAL_LENTO_MS')
+        if umbral is not None and total * 1000 >= umbral:
+            datos['duplicadas'] = [{'sql': huella, 'veces': veces} for huella, veces in duplicadas]
+            if config.get('EXPLAIN_LENTAS', True):
+                datos['lentas'] = explicar(medicion.lentas)
+            logger.warning('Petición lenta %s %s (%s): %.1f ms', request.method, request.path, vista,
+                           total * 1000, extra=datos)
+        elif config.get('REGISTRAR_PETICIONES', True) and logger.isEnabledFor(logging.INFO):
+            logger.info('%s %s %s %.1f ms', request.method, request.path, response.status_code,
+                        total * 1000, extra=datos)
+
+
+def explicar(lentas):
+    """
+    [{'sql', 'ms', 'plan'}] de las consultas más lentas, de mayor a menor.
+    Solo se ejecuta EXPLAIN (sin ANALYZE) sobre los SELECT.
+    """
+    resultado = []
+    for segundos, _, alias, sql, params in sorted(lentas, reverse=True):
+        entrada = {'sql': sql, 'ms': round(segundos * 1000, 2)}
+        if sql.lstrip().upper().startswith('SELECT'):
+            conexion = connections[alias]
+            try:
+                with conexion.cursor() as cursor:
+                    cursor.execute(f'{conexion.ops.explain_query_prefix()} {sql}', params)
+                    entrada['plan'] = [' '.join(str(columna) for columna in fila) for fila in cursor.fetchall()]
+            except DatabaseError as exc:
+                entrada['plan'] = f'EXPLAIN no disponible: {exc}'
+        resultado.append(entrada)
+    return resultado
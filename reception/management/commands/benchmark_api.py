@@ -0,0 +1,177 @@
+"""
+Comando: python manage.py benchmark_api
+
+Ejecuta los escenarios de reception/benchmark.py (todos los endpoints de
+la API y /metrics) con el cliente de pruebas, con un servidor WSGI o con
+ambos, y escribe un reporte JSON con percentiles de latencia, consultas
+por petición y peticiones por segundo de cada escenario:
+
+    python manage.py generar_datos_sinteticos --muestras 100000
+    python manage.py benchmark_api --salida antes.json
+    (cambios)
+    python manage.py benchmark_api --salida despues.json --comparar antes.json
+
+El reporte tiene claves ordenadas y metadatos (commit, versiones, motor y
+tamaño de las tablas), así que dos reportes se comparan con --comparar o
+con un diff. Con la misma semilla y los mismos datos, las peticiones son
+las mismas en cada ejecución.
+
+Los datos que crean las escrituras se eliminan al terminar (también los de
+ejecuciones interrumpidas). La cache de respuestas se desactiva salvo con
+--con-cache, para medir el trabajo completo de cada petición, y la
+instrumentación no registra cada petición en el log.
+"""
+import json
+import platform
+import random
+import subprocess
+import uuid
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from reception import benchmark
+from reception.models import Cliente, Muestra, Ensayo, HistorialEstado
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def variacion(antes, despues):
+    if antes is None or despues is None:
+        return '      -'
+    if not antes:
+        return '      =' if not despues else '    nuevo'
+    return f'{(despues - antes) / antes * 100:+6.1f}%'
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, consultas y rendimiento de todos los endpoints de la API y genera un reporte JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modo', choices=['cliente', 'wsgi', 'ambos'], default='ambos',
+                            help='Cliente de pruebas, servidor WSGI o ambos (default: ambos)')
+        parser.add_argument('--repeticiones', type=int, default=50,
+                            help='Peticiones medidas por escenario (default: 50)')
+        parser.add_argument('--calentamiento', type=int, default=5,
+                            help='Peticiones previas sin medir por escenario (default: 5)')
+        parser.add_argument('--concurrencia', type=int, default=1,
+                            help='Peticiones simultáneas e hilos del servidor en modo wsgi (default: 1)')
+        parser.add_argument('--escenario', action='append', default=[],
+                            help='Ejecutar solo los escenarios que empiezan así (repetible), p. ej. muestras.')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla aleatoria (default: 42)')
+        parser.add_argument('--salida', help='Archivo del reporte JSON (por defecto solo se muestra el resumen)')
+        parser.add_argument('--comparar', help='Reporte anterior con el que comparar p50, p95 y consultas')
+        parser.add_argument('--con-cache', action='store_true',
+                            help='Mantener la cache de respuestas habilitada')
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1 or options['concurrencia'] < 1 or options['calentamiento'] < 0:
+            raise CommandError('--repeticiones y --concurrencia deben ser mayores que cero y --calentamiento no negativo')
+        escenarios = [
+            escenario for escenario in benchmark.ESCENARIOS
+            if not options['escenario'] or escenario.nombre.startswith(tuple(options['escenario']))
+        ]
+        if not escenarios:
+            raise CommandError('Ningún escenario coincide con --escenario')
+        anterior = None
+        if options['comparar']:
+            try:
+                anterior = json.loads(Path(options['comparar']).read_text())
+            except (OSError, ValueError) as error:
+                raise CommandError(f'No se pudo leer {options["comparar"]}: {error}')
+
+        modos = ['cliente', 'wsgi'] if options['modo'] == 'ambos' else [options['modo']]
+        cache = dict(settings.LIMS_CACHE_RESPUESTAS, HABILITADA=options['con_cache'])
+        # Sin una línea de registro por petición ni EXPLAIN de las lentas
+        instrumentacion = dict(settings.LIMS_INSTRUMENTACION, REGISTRAR_PETICIONES=False, UMBRAL_LENTO_MS=None)
+        reporte = {'metadatos': self.metadatos(options, modos), 'resultados': {}}
+
+        with override_settings(LIMS_CACHE_RESPUESTAS=cache, LIMS_INSTRUMENTACION=instrumentacion):
+            benchmark.limpiar()
+            usuario, base = benchmark.crear_datos(uuid.uuid4().hex[:8])
+            try:
+                for modo in modos:
+                    rng = random.Random(options['semilla'])
+                    muestreo = benchmark.muestreo_lectura(rng)
+                    if modo == 'cliente':
+                        ejecutor = benchmark.EjecutorCliente(usuario)
+                    else:
+                        ejecutor = benchmark.EjecutorWSGI(usuario, options['concurrencia'])
+                    try:
+                        reporte['resultados'][modo] = self.ejecutar(ejecutor, escenarios, base, muestreo, rng, options)
+                    finally:
+                        ejecutor.cerrar()
+            finally:
+                benchmark.limpiar()
+
+        if options['salida']:
+            Path(options['salida']).write_text(json.dumps(reporte, indent=2, sort_keys=True, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f'Reporte escrito en {options["salida"]}'))
+        if anterior is not None:
+            self.mostrar_comparacion(anterior, reporte)
+
+    def ejecutar(self, ejecutor, escenarios, base, muestreo, rng, options):
+        self.stdout.write(f'\n[{ejecutor.nombre}]')
+        self.stdout.write(f'{"escenario":34} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"SQL":>6}  estados')
+        resultados = {}
+        for escenario in escenarios:
+            datos = benchmark.ejecutar_escenario(
+                ejecutor, escenario, base, muestreo, rng,
+                options['repeticiones'], options['calentamiento'],
+                options['concurrencia'] if ejecutor.nombre == 'wsgi' else 1,
+            )
+            resultados[escenario.nombre] = datos
+            consultas = f'{datos["consultas"]["promedio"]:6.1f}' if datos['consultas'] else '     -'
+            linea = (
+                f'{escenario.nombre:34} {datos["ms"]["p50"]:8.2f} {datos["ms"]["p95"]:8.2f} '
+                f'{datos["ms"]["p99"]:8.2f} {datos["peticiones_por_segundo"]:8.1f} {consultas}  '
+                + ' '.join(f'{estado}×{cantidad}' for estado, cantidad in datos['estados'].items())
+            )
+            self.stdout.write(self.style.ERROR(linea) if datos['errores'] else linea)
+        return resultados
+
+    def metadatos(self, options, modos):
+        return {
+            'commit': commit_actual(),
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base_de_datos': connection.vendor,
+            'debug': settings.DEBUG,
+            'filas': {
+                modelo._meta.label: modelo.objects.count()
+                for modelo in (Cliente, Muestra, Ensayo, HistorialEstado)
+            },
+            'parametros': {
+                'modos': modos,
+                'repeticiones': options['repeticiones'],
+                'calentamiento': options['calentamiento'],
+                'concurrencia': options['concurrencia'],
+                'semilla': options['semilla'],
+                'cache_respuestas': options['con_cache'],
+            },
+        }
+
+    def mostrar_comparacion(self, anterior, actual):
+        self.stdout.write(
+            f'\nComparación con {anterior.get("metadatos", {}).get("commit") or "reporte anterior"}'
+        )
+        self.stdout.write(f'{"modo":8} {"escenario":34} {"p50":>9} {"p95":>9} {"SQL":>9}')
+        for modo, nombre, p50_antes, p50, p95_antes, p95, sql_antes, sql in benchmark.comparar(anterior, actual):
+            self.stdout.write(
+                f'{modo:8} {nombre:34} {variacion(p50_antes, p50):>9} '
+                f'{variacion(p95_antes, p95):>9} {variacion(sql_antes, sql):>9}'
+            )
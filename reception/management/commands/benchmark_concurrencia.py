@@ -0,0 +1,153 @@
+"""
+Comando: python manage.py benchmark_concurrencia
+
+Mide cuánto esperan las lecturas mientras otros procesos escriben en SQLite,
+comparando la configuración por defecto (diario rollback, sin PRAGMA) con el
+perfil de settings.LIMS_SQLITE (WAL, busy_timeout, mmap, cache).
+
+Cada perfil usa un archivo temporal propio con una tabla de muestras. Los
+escritores repiten transacciones grandes (como aceptar + agregar_ensayos
+sobre muchas filas) y los lectores consultan las últimas muestras en bucle;
+se informa la latencia de las lecturas y los errores "database is locked".
+La base de datos del proyecto no se toca.
+"""
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from reception.basedatos import aplicar_pragmas, pragmas
+
+# Timeout de sqlite3 que usa Django si no se configura otro (segundos)
+TIMEOUT_PREDETERMINADO = 5
+
+ESQUEMA = """
+CREATE TABLE muestra (
+    id INTEGER PRIMARY KEY,
+    estado TEXT NOT NULL,
+    descripcion TEXT NOT NULL
+);
+CREATE INDEX muestra_estado_idx ON muestra (estado, id);
+"""
+
+
+def conectar(ruta, perfil):
+    conexion = sqlite3.connect(ruta, timeout=TIMEOUT_PREDETERMINADO,
+                               isolation_level=None, check_same_thread=False)
+    if perfil == 'lims':
+        aplicar_pragmas(conexion.cursor())
+    return conexion
+
+
+def preparar(ruta, perfil, filas):
+    conexion = conectar(ruta, perfil)
+    conexion.executescript(ESQUEMA)
+    conexion.execute('BEGIN')
+    conexion.executemany(
+        'INSERT INTO muestra (estado, descripcion) VALUES (?, ?)',
+        (('REGISTRADA', 'x' * 400) for _ in range(filas))
+    )
+    conexion.execute('COMMIT')
+    conexion.close()
+
+
+def escritor(ruta, perfil, fin, filas_por_escritura, resultado):
+    conexion = conectar(ruta, perfil)
+    while time.monotonic() < fin:
+        try:
+            conexion.execute('BEGIN IMMEDIATE')
+            conexion.executemany(
+                'INSERT INTO muestra (estado, descripcion) VALUES (?, ?)',
+                (('ACEPTADA', 'y' * 400) for _ in range(filas_por_escritura))
+            )
+            conexion.execute(
+                "UPDATE muestra SET estado = 'EN_ANALISIS' WHERE id IN "
+                "(SELECT id FROM muestra WHERE estado = 'REGISTRADA' LIMIT 50)"
+            )
+            conexion.execute('COMMIT')
+            resultado['escrituras'] += 1
+        except sqlite3.OperationalError:
+            resultado['errores_escritura'] += 1
+            if conexion.in_transaction:
+                conexion.execute('ROLLBACK')
+    conexion.close()
+
+
+def lector(ruta, perfil, fin, resultado):
+    conexion = conectar(ruta, perfil)
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        try:
+            conexion.execute(
+                "SELECT id, estado FROM muestra WHERE estado = 'REGISTRADA' "
+                "ORDER BY id DESC LIMIT 50"
+            ).fetchall()
+            resultado['latencias'].append(time.perf_counter() - inicio)
+        except sqlite3.OperationalError:
+            resultado['errores_lectura'] += 1
+    conexion.close()
+
+
+def ejecutar(perfil, opciones):
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / f'{perfil}.sqlite3')
+        preparar(ruta, perfil, opciones['filas'])
+
+        resultado = {'latencias': [], 'escrituras': 0, 'errores_escritura': 0, 'errores_lectura': 0}
+        fin = time.monotonic() + opciones['segundos']
+        hilos = [
+            threading.Thread(target=escritor, args=(ruta, perfil, fin, opciones['filas_por_escritura'], resultado))
+            for _ in range(opciones['escritores'])
+        ] + [
+            threading.Thread(target=lector, args=(ruta, perfil, fin, resultado))
+            for _ in range(opciones['lectores'])
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultado
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia de lectura bajo escrituras concurrentes: SQLite por defecto vs perfil LIMS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segundos', type=float, default=5.0,
+                            help='Duración de cada perfil (default: 5)')
+        parser.add_argument('--lectores', type=int, default=4,
+                            help='Hilos que solo leen (default: 4)')
+        parser.add_argument('--escritores', type=int, default=2,
+                            help='Hilos que escriben (default: 2)')
+        parser.add_argument('--filas', type=int, default=20000,
+                            help='Muestras iniciales (default: 20000)')
+        parser.add_argument('--filas-por-escritura', type=int, default=5000,
+                            help='Filas insertadas por transacción de escritura (default: 5000)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"PRAGMA del perfil lims: {pragmas()}")
+        self.stdout.write(
+            f"{'perfil':14} {'lecturas/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8} "
+            f"{'escrituras':>10} {'err lect':>8} {'err escr':>8}"
+        )
+        for perfil in ('predeterminado', 'lims'):
+            r = ejecutar(perfil, options)
+            latencias = r['latencias']
+            self.stdout.write(
+                f"{perfil:14} {len(latencias) / options['segundos']:10.0f} "
+                f"{statistics.median(latencias) * 1000 if latencias else 0:8.2f} "
+                f"{percentil(latencias, 0.99) * 1000:8.2f} "
+                f"{max(latencias, default=0) * 1000:8.2f} "
+                f"{r['escrituras']:10} {r['errores_lectura']:8} {r['errores_escritura']:8}"
+            )
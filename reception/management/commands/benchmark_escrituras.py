@@ -0,0 +1,188 @@
+"""
+Comando: python manage.py benchmark_escrituras
+
+Mide la amplificación de escritura de las acciones que modifican una muestra
+o un ensayo: por petición, cuántas sentencias UPDATE ejecuta, cuántas
+columnas asignan y cuántos bytes de SQL de escritura (UPDATE, INSERT y
+DELETE con sus valores) envía a la base, además de la latencia.
+
+Los objetos de cada petición se crean antes de medirla, con textos largos
+(--texto caracteres) en descripcion_muestra, observaciones_recepcion,
+resultados y observaciones_ensayo: una escritura que reescribe la fila
+completa los vuelve a enviar aunque solo cambie el estado.
+
+    python manage.py benchmark_escrituras --salida antes.json
+    (cambios)
+    python manage.py benchmark_escrituras --salida despues.json --comparar antes.json
+
+Usa los datos propios del benchmark (benchmark.crear_datos), que se eliminan
+al terminar.
+"""
+import json
+import re
+import time
+import uuid
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from reception import benchmark
+from reception.management.commands.benchmark_api import commit_actual, variacion
+from reception.models import Ensayo, Muestra
+
+# Asignaciones "columna" = ... de la cláusula SET
+COLUMNA_SET = re.compile(r'"(\w+)" = ')
+
+Accion = namedtuple('Accion', 'nombre ruta payload preparar')
+
+
+def muestra_con_texto(datos, texto, **campos):
+    pk = benchmark.muestra_desechable(datos)['desechable']
+    Muestra.objects.filter(pk=pk).update(
+        descripcion_muestra=texto, observaciones_recepcion=texto, **campos
+    )
+    return pk
+
+
+def ensayo_con_texto(datos, texto, **campos):
+    pk = benchmark.ensayo_desechable(datos)['desechable']
+    Ensayo.objects.filter(pk=pk).update(resultados=texto, observaciones_ensayo=texto, **campos)
+    return pk
+
+
+ACCIONES = [
+    Accion('aceptar', '/api/muestras/{}/aceptar/', {'aceptada': True},
+           lambda datos, texto: muestra_con_texto(datos, texto)),
+    Accion('actualizar_estado', '/api/muestras/{}/actualizar_estado/', {'estado': 'EN_ANALISIS'},
+           lambda datos, texto: muestra_con_texto(datos, texto, estado='ACEPTADA', muestra_aceptada=True)),
+    Accion('asignar_analista', '/api/ensayos/{}/asignar_analista/', {'analista_id': '{b_usuario}'},
+           lambda datos, texto: ensayo_con_texto(datos, texto)),
+    Accion('registrar_resultados', '/api/ensayos/{}/registrar_resultados/', {'resultados': 'pH: 7.0'},
+           lambda datos, texto: ensayo_con_texto(datos, texto)),
+    # Corrección de un ensayo ya completado (no es un cambio de estado)
+    Accion('corregir_resultados', '/api/ensayos/{}/registrar_resultados/', {'resultados': 'pH: 7.1'},
+           lambda datos, texto: ensayo_con_texto(datos, texto, estado_ensayo='COMPLETADO')),
+]
+
+
+def escrituras(consultas):
+    """
+    (updates, columnas asignadas, bytes de SQL de escritura) de una petición.
+    """
+    updates = columnas = tamano = 0
+    for consulta in consultas:
+        sql = consulta['sql']
+        verbo = sql.split(' ', 1)[0]
+        if verbo not in ('UPDATE', 'INSERT', 'DELETE'):
+            continue
+        tamano += len(sql.encode())
+        if verbo == 'UPDATE':
+            updates += 1
+            columnas += len(COLUMNA_SET.findall(sql.split(' SET ', 1)[1].split(' WHERE ', 1)[0]))
+    return updates, columnas, tamano
+
+
+class Command(BaseCommand):
+    help = 'Mide columnas y bytes escritos por las acciones que modifican muestras y ensayos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=50,
+                            help='Peticiones medidas por acción (default: 50)')
+        parser.add_argument('--texto', type=int, default=2000,
+                            help='Caracteres de los campos de texto largos (default: 2000)')
+        parser.add_argument('--salida', help='Archivo del reporte JSON')
+        parser.add_argument('--comparar', help='Reporte anterior con el que comparar')
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1 or options['texto'] < 0:
+            raise CommandError('--repeticiones debe ser mayor que cero y --texto no negativo')
+        anterior = None
+        if options['comparar']:
+            try:
+                anterior = json.loads(Path(options['comparar']).read_text())
+            except (OSError, ValueError) as error:
+                raise CommandError(f'No se pudo leer {options["comparar"]}: {error}')
+
+        texto = 'x' * options['texto']
+        cache = dict(settings.LIMS_CACHE_RESPUESTAS, HABILITADA=False)
+        instrumentacion = dict(settings.LIMS_INSTRUMENTACION, REGISTRAR_PETICIONES=False, UMBRAL_LENTO_MS=None)
+        reporte = {
+            'metadatos': {
+                'commit': commit_actual(),
+                'base_de_datos': connection.vendor,
+                'repeticiones': options['repeticiones'],
+                'texto': options['texto'],
+            },
+            'resultados': {},
+        }
+
+        self.stdout.write(f'{"acción":22} {"p50 ms":>8} {"SQL":>5} {"UPDATE":>7} {"columnas":>9} {"bytes":>8}')
+        with override_settings(LIMS_CACHE_RESPUESTAS=cache, LIMS_INSTRUMENTACION=instrumentacion):
+            benchmark.limpiar()
+            usuario, datos = benchmark.crear_datos(uuid.uuid4().hex[:8])
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(user=usuario)
+            try:
+                for accion in ACCIONES:
+                    datos_accion = self.medir(client, accion, datos, texto, options['repeticiones'])
+                    reporte['resultados'][accion.nombre] = datos_accion
+                    self.stdout.write(
+                        f'{accion.nombre:22} {datos_accion["ms_p50"]:8.2f} {datos_accion["consultas"]:5.1f} '
+                        f'{datos_accion["updates"]:7.1f} {datos_accion["columnas"]:9.1f} {datos_accion["bytes"]:8.0f}'
+                    )
+            finally:
+                benchmark.limpiar()
+
+        if options['salida']:
+            Path(options['salida']).write_text(json.dumps(reporte, indent=2, sort_keys=True, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f'Reporte escrito en {options["salida"]}'))
+        if anterior is not None:
+            self.mostrar_comparacion(anterior, reporte)
+
+    def medir(self, client, accion, datos, texto, repeticiones):
+        tiempos, consultas, updates, columnas, tamanos = [], [], [], [], []
+        payload = benchmark.formatear(accion.payload, datos)
+        for _ in range(repeticiones):
+            pk = accion.preparar(datos, texto)
+            with CaptureQueriesContext(connection) as contexto:
+                inicio = time.perf_counter()
+                response = client.post(accion.ruta.format(pk), payload, format='json')
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{accion.nombre}: respuesta {response.status_code} {response.content[:200]!r}')
+            escritas = escrituras(contexto.captured_queries)
+            consultas.append(len(contexto.captured_queries))
+            updates.append(escritas[0])
+            columnas.append(escritas[1])
+            tamanos.append(escritas[2])
+
+        def promedio(valores):
+            return round(sum(valores) / len(valores), 2)
+
+        return {
+            'ms_p50': round(benchmark.percentil(sorted(tiempos), 50), 3),
+            'consultas': promedio(consultas),
+            'updates': promedio(updates),
+            'columnas': promedio(columnas),
+            'bytes': promedio(tamanos),
+        }
+
+    def mostrar_comparacion(self, anterior, actual):
+        self.stdout.write(
+            f'\nComparación con {anterior.get("metadatos", {}).get("commit") or "reporte anterior"}'
+        )
+        self.stdout.write(f'{"acción":22} {"p50":>9} {"columnas":>9} {"bytes":>9}')
+        for nombre, datos in actual['resultados'].items():
+            previo = anterior.get('resultados', {}).get(nombre)
+            if previo is None:
+                continue
+            self.stdout.write(
+                f'{nombre:22} {variacion(previo["ms_p50"], datos["ms_p50"]):>9} '
+                f'{variacion(previo["columnas"], datos["columnas"]):>9} '
+                f'{variacion(previo["bytes"], datos["bytes"]):>9}'
+            )
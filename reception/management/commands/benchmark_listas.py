@@ -0,0 +1,73 @@
+"""
+Comando: python manage.py benchmark_listas
+
+Mide peticiones por segundo de los endpoints de lista con el perfil de
+configuración activo. Para comparar desarrollo y producción se ejecuta una
+vez con cada uno:
+
+    LIMS_ENTORNO=dev  python manage.py benchmark_listas
+    LIMS_ENTORNO=prod LIMS_SECRET_KEY=x python manage.py benchmark_listas
+
+Los datos de prueba se crean en una transacción que se revierte al final.
+La cache de respuestas se desactiva (salvo --con-cache) para medir el
+trabajo completo de cada petición.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from reception.management.commands.verificar_consultas import MUESTRA_NUEVA, crear_datos, formatear
+
+ENDPOINTS = [
+    '/api/clientes/',
+    '/api/muestras/',
+    '/api/muestras/?estado=REGISTRADA',
+    '/api/ensayos/',
+    '/api/historial/',
+]
+
+
+class Command(BaseCommand):
+    help = 'Mide peticiones por segundo de los endpoints de lista con la configuración activa.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200,
+                            help='Peticiones por endpoint (default: 200)')
+        parser.add_argument('--muestras', type=int, default=500,
+                            help='Muestras de prueba a registrar (default: 500)')
+        parser.add_argument('--accept', default='application/json',
+                            help='Encabezado Accept; text/html usa la interfaz navegable si está habilitada')
+        parser.add_argument('--con-cache', action='store_true',
+                            help='Mantener la cache de respuestas habilitada')
+
+    def handle(self, *args, **options):
+        renderers = [r.rsplit('.', 1)[-1] for r in settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']]
+        self.stdout.write(f"DEBUG={settings.DEBUG}  renderers={', '.join(renderers)}  "
+                          f"Accept={options['accept']}")
+
+        cache = dict(settings.LIMS_CACHE_RESPUESTAS, HABILITADA=options['con_cache'])
+        with override_settings(LIMS_CACHE_RESPUESTAS=cache), transaction.atomic():
+            ids = crear_datos(50)
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(user=ids.pop('usuario'))
+            for inicio in range(0, options['muestras'], 1000):
+                lote = min(1000, options['muestras'] - inicio)
+                client.post('/api/muestras/registro_masivo/',
+                            {'muestras': [formatear(MUESTRA_NUEVA, ids)] * lote}, format='json')
+
+            for url in ENDPOINTS:
+                client.get(url, HTTP_ACCEPT=options['accept'])  # calentamiento
+                inicio = time.perf_counter()
+                for _ in range(options['peticiones']):
+                    response = client.get(url, HTTP_ACCEPT=options['accept'])
+                segundos = time.perf_counter() - inicio
+                self.stdout.write(
+                    f"{url:40} {options['peticiones'] / segundos:8.1f} req/s  "
+                    f"{segundos / options['peticiones'] * 1000:7.2f} ms/petición  [{response.status_code}]"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,137 @@
+"""
+Comando: python manage.py explicar_consultas
+
+Ejecuta EXPLAIN sobre cada forma de consulta documentada en reception/urls.py
+para confirmar que los índices declarados en los modelos se están usando.
+Las consultas se construyen con el mismo get_queryset() de cada ViewSet, de
+modo que el plan mostrado es exactamente el que ejecuta la API.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from reception.views import (
+    ClienteViewSet, MuestraViewSet, EnsayoViewSet, HistorialEstadoViewSet
+)
+
+# =============================================================================
+# FORMAS DE CONSULTA DOCUMENTADAS
+# =============================================================================
+# (nombre, viewset, acción, parámetros de URL, filtro adicional de detalle)
+FORMAS_CONSULTA = [
+    ('GET /api/clientes/', ClienteViewSet, 'list', {}, None),
+    ('GET /api/clientes/?activo=true', ClienteViewSet, 'list', {'activo': 'true'}, None),
+    ('GET /api/clientes/?tipo_cliente=RECURRENTE', ClienteViewSet, 'list',
+     {'tipo_cliente': 'RECURRENTE'}, None),
+    ('GET /api/clientes/{id}/', ClienteViewSet, 'retrieve', {}, 'pk'),
+
+    ('GET /api/muestras/', MuestraViewSet, 'list', {}, None),
+    ('GET /api/muestras/?estado=REGISTRADA', MuestraViewSet, 'list',
+     {'estado': 'REGISTRADA'}, None),
+    ('GET /api/muestras/?cliente=1', MuestraViewSet, 'list', {'cliente': '1'}, None),
+    ('GET /api/muestras/?tipo_muestra=FARMACEUTICO', MuestraViewSet, 'list',
+     {'tipo_muestra': 'FARMACEUTICO'}, None),
+    ('GET /api/muestras/?aceptada=true', MuestraViewSet, 'list', {'aceptada': 'true'}, None),
+    ('GET /api/muestras/?fecha_desde=2024-01-01&fecha_hasta=2024-12-31', MuestraViewSet, 'list',
+     {'fecha_desde': '2024-01-01', 'fecha_hasta': '2024-12-31'}, None),
+    ('GET /api/muestras/?estado=REGISTRADA&fecha_desde=2024-01-01', MuestraViewSet, 'list',
+     {'estado': 'REGISTRADA', 'fecha_desde': '2024-01-01'}, None),
+    ('GET /api/muestras/{id}/', MuestraViewSet, 'retrieve', {}, 'pk'),
+    ('GET /api/clientes/{id}/muestras/', MuestraViewSet, 'list', {'cliente': '1'}, None),
+
+    ('GET /api/ensayos/', EnsayoViewSet, 'list', {}, None),
+    ('GET /api/ensayos/?estado_ensayo=PENDIENTE', EnsayoViewSet, 'list',
+     {'estado_ensayo': 'PENDIENTE'}, None),
+    ('GET /api/ensayos/?prioridad=URGENTE', EnsayoViewSet, 'list', {'prioridad': 'URGENTE'}, None),
+    ('GET /api/ensayos/?muestra=1', EnsayoViewSet, 'list', {'muestra': '1'}, None),
+    ('GET /api/ensayos/?analista=1', EnsayoViewSet, 'list', {'analista': '1'}, None),
+    ('GET /api/ensayos/{id}/', EnsayoViewSet, 'retrieve', {}, 'pk'),
+    ('GET /api/ensayos/worklist/?analista=1', EnsayoViewSet, 'worklist', {'analista': '1'}, None),
+    ('GET /api/ensayos/worklist/?analista=ninguno', EnsayoViewSet, 'worklist',
+     {'analista': 'ninguno'}, None),
+
+    ('GET /api/historial/', HistorialEstadoViewSet, 'list', {}, None),
+    ('GET /api/historial/?muestra=1', HistorialEstadoViewSet, 'list', {'muestra': '1'}, None),
+    ('GET /api/historial/{id}/', HistorialEstadoViewSet, 'retrieve', {}, 'pk'),
+]
+
+# Fragmentos del plan que indican ordenamiento en memoria o recorrido completo
+ALERTAS_PLAN = {
+    'sqlite': ['USE TEMP B-TREE'],
+    'postgresql': ['Seq Scan', 'Sort'],
+    'mysql': ['type: ALL', 'Using filesort'],
+}
+
+
+def construir_queryset(viewset_class, accion, parametros):
+    """
+    Instancia el ViewSet con una petición simulada y retorna su queryset.
+    """
+    factory = APIRequestFactory()
+    request = Request(factory.get('/', parametros))
+    view = viewset_class()
+    view.action = accion
+    view.request = request
+    view.format_kwarg = None
+    view.kwargs = {}
+    return view.get_queryset()
+
+
+def linea_problematica(linea, vendor):
+    """
+    Indica si una línea del plan revela un recorrido completo u ordenamiento en memoria.
+    En SQLite el recorrido completo aparece como 'SCAN <tabla>' sin 'INDEX'.
+    """
+    if vendor == 'sqlite' and 'SCAN ' in linea and 'INDEX' not in linea:
+        return True
+    return any(alerta in linea for alerta in ALERTAS_PLAN.get(vendor, []))
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta EXPLAIN sobre las consultas documentadas de la API y señala recorridos completos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filtro',
+            default='',
+            help='Solo analiza las formas de consulta cuyo nombre contenga este texto'
+        )
+        parser.add_argument(
+            '--estricto',
+            action='store_true',
+            help='Termina con error si alguna consulta hace recorrido completo u ordena en memoria'
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        problemas = []
+
+        for nombre, viewset_class, accion, parametros, detalle in FORMAS_CONSULTA:
+            if options['filtro'] and options['filtro'] not in nombre:
+                continue
+
+            queryset = construir_queryset(viewset_class, accion, parametros)
+            if detalle:
+                queryset = queryset.filter(**{detalle: 1})
+
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            for linea in plan.splitlines():
+                self.stdout.write(f'  {linea}')
+
+            if any(linea_problematica(linea, vendor) for linea in plan.splitlines()):
+                problemas.append(nombre)
+                self.stdout.write(self.style.WARNING('  ⚠ No usa índice para filtrar u ordenar'))
+            else:
+                self.stdout.write(self.style.SUCCESS('  ✓ Usa índice'))
+
+        self.stdout.write('')
+        if problemas:
+            self.stdout.write(self.style.WARNING(
+                f'{len(problemas)} consulta(s) sin índice adecuado: ' + ', '.join(problemas)
+            ))
+            if options['estricto']:
+                raise CommandError('Hay consultas que no usan índices.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Todas las consultas usan índices.'))
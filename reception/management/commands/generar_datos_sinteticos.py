@@ -0,0 +1,276 @@
+"""
+Comando: python manage.py generar_datos_sinteticos
+
+Genera un volumen configurable de datos sintéticos para pruebas de carga,
+por ejemplo el de un laboratorio con varios años de operación:
+
+    python manage.py generar_datos_sinteticos --clientes 10000 --muestras 1000000 \\
+        --ensayos-por-muestra 5 --historial-por-muestra 10
+
+Con la misma --semilla y los mismos parámetros los datos son idénticos, así
+que dos ejecuciones de benchmark_api sobre bases generadas igual son
+comparables. Las filas se insertan con bulk_create por lotes (una
+transacción por lote), con fechas repartidas en los últimos --dias días y
+estados coherentes entre muestra, ensayos e historial. Cada lote se agrega
+al índice de búsqueda y al final se reconstruye el resumen diario (salvo con
+--sin-indices, para cargar más rápido y reconstruirlos después).
+
+Los clientes sintéticos tienen NIT 'SINT-...' y los usuarios el prefijo
+'sintetico_'; --borrar elimina los de una ejecución anterior.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from reception import busqueda
+from reception.cache import invalidar_modelos
+from reception.models import Cliente, Muestra, Ensayo, HistorialEstado
+
+PREFIJO_NIT = 'SINT-'
+PREFIJO_USUARIO = 'sintetico_'
+
+# Avance de una muestra por su ciclo de vida; el estado final se elige con PESOS_ESTADO
+CICLO = ['REGISTRADA', 'ACEPTADA', 'EN_ANALISIS', 'ANALIZADA', 'COMPLETADA']
+PESOS_ESTADO = {
+    'REGISTRADA': 5, 'ACEPTADA': 10, 'EN_ANALISIS': 20,
+    'ANALIZADA': 10, 'COMPLETADA': 50, 'RECHAZADA': 5,
+}
+PESOS_PRIORIDAD = {'BAJA': 20, 'NORMAL': 60, 'ALTA': 15, 'URGENTE': 5}
+ANALISIS = [
+    ('pH', 'USP <791>'), ('Conductividad', 'SM 2510 B'), ('Coliformes totales', 'SM 9222 B'),
+    ('Metales pesados', 'EPA 200.8'), ('Humedad', 'AOAC 925.10'), ('Viscosidad', 'USP <912>'),
+    ('Recuento de aerobios', 'ISO 4833'), ('Cenizas', 'AOAC 923.03'), ('Densidad', 'ASTM D4052'),
+]
+CIUDADES = ['Bogotá', 'Medellín', 'Cali', 'Barranquilla', 'Bucaramanga', 'Cartagena', 'Pereira']
+
+
+@contextmanager
+def fechas_manuales(*modelos):
+    """
+    Desactiva auto_now/auto_now_add mientras se insertan filas con fechas
+    históricas (bulk_create las sobrescribiría con la hora actual).
+    """
+    campos = [
+        (campo, campo.auto_now, campo.auto_now_add)
+        for modelo in modelos for campo in modelo._meta.concrete_fields
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)
+    ]
+    for campo, _, _ in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in campos:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def elegir(rng, pesos):
+    return rng.choices(list(pesos), weights=list(pesos.values()))[0]
+
+
+class Command(BaseCommand):
+    help = 'Genera clientes, muestras, ensayos e historial sintéticos para pruebas de carga.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=100, help='Clientes (default: 100)')
+        parser.add_argument('--muestras', type=int, default=10000, help='Muestras (default: 10000)')
+        parser.add_argument('--ensayos-por-muestra', type=int, default=5,
+                            help='Promedio de ensayos por muestra (default: 5)')
+        parser.add_argument('--historial-por-muestra', type=int, default=10,
+                            help='Promedio de registros de historial por muestra (default: 10)')
+        parser.add_argument('--analistas', type=int, default=20, help='Analistas (default: 20)')
+        parser.add_argument('--dias', type=int, default=365,
+                            help='Días hacia atrás en que se reparten los registros (default: 365)')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla aleatoria (default: 42)')
+        parser.add_argument('--lote', type=int, default=2000,
+                            help='Muestras por transacción (default: 2000)')
+        parser.add_argument('--borrar', action='store_true',
+                            help='Eliminar antes los datos sintéticos de una ejecución anterior')
+        parser.add_argument('--sin-indices', action='store_true',
+                            help='No actualizar el índice de búsqueda ni el resumen diario')
+
+    def handle(self, *args, **options):
+        if min(options['clientes'], options['muestras'], options['analistas'], options['lote']) < 1:
+            raise CommandError('--clientes, --muestras, --analistas y --lote deben ser mayores que cero')
+        if options['borrar']:
+            self.borrar()
+        elif Cliente.objects.filter(nit__startswith=PREFIJO_NIT).exists():
+            raise CommandError('Ya existen datos sintéticos; use --borrar para reemplazarlos.')
+
+        rng = random.Random(options['semilla'])
+        self.ahora = timezone.now()
+        usuarios = self.crear_usuarios(options['analistas'])
+        self.indexar = not options['sin_indices']
+        clientes = self.crear_clientes(rng, options['clientes'])
+
+        with fechas_manuales(Cliente, Muestra, Ensayo, HistorialEstado):
+            creadas = 0
+            while creadas < options['muestras']:
+                cantidad = min(options['lote'], options['muestras'] - creadas)
+                with transaction.atomic():
+                    self.crear_lote(rng, creadas, cantidad, clientes, usuarios, options)
+                creadas += cantidad
+                self.stdout.write(f'{creadas}/{options["muestras"]} muestras')
+
+        invalidar_modelos(Cliente, Muestra, Ensayo, HistorialEstado, User)
+        if self.indexar:
+            call_command('reconstruir_resumen_diario', stdout=self.stdout)
+        else:
+            self.stdout.write('Índices omitidos: ejecute reconstruir_indice_busqueda y reconstruir_resumen_diario.')
+        self.stdout.write(self.style.SUCCESS('Datos sintéticos generados.'))
+
+    def borrar(self):
+        with transaction.atomic():
+            # Ensayos e historial se eliminan en cascada con las muestras
+            muestras, _ = Muestra.objects.filter(cliente__nit__startswith=PREFIJO_NIT).delete()
+            Cliente.objects.filter(nit__startswith=PREFIJO_NIT).delete()
+            User.objects.filter(username__startswith=PREFIJO_USUARIO).delete()
+        self.stdout.write(f'Datos sintéticos anteriores eliminados ({muestras} fila(s)).')
+
+    def crear_usuarios(self, analistas):
+        User.objects.bulk_create(
+            [User(username=f'{PREFIJO_USUARIO}recepcion')]
+            + [User(username=f'{PREFIJO_USUARIO}analista_{i:03d}') for i in range(analistas)]
+        )
+        usuarios = list(User.objects.filter(username__startswith=PREFIJO_USUARIO).order_by('username'))
+        return {'recepcion': usuarios[-1], 'analistas': usuarios[:-1]}
+
+    def crear_clientes(self, rng, cantidad):
+        clientes = []
+        for i in range(cantidad):
+            alta = self.ahora - timedelta(days=rng.randint(0, 3650))
+            clientes.append(Cliente(
+                nombre_empresa=f'Empresa Sintética {i:06d} S.A.S.',
+                nit=f'{PREFIJO_NIT}{i:08d}',
+                direccion=f'Calle {rng.randint(1, 200)} # {rng.randint(1, 99)}-{rng.randint(1, 99)}',
+                ciudad=rng.choice(CIUDADES),
+                persona_contacto=f'Contacto {i:06d}',
+                email=f'contacto{i:06d}@sintetico.lims',
+                telefono=f'60{rng.randint(10000000, 99999999)}',
+                tipo_cliente=rng.choice(['NUEVO', 'RECURRENTE']),
+                activo=rng.random() > 0.05,
+                fecha_registro=alta,
+                fecha_actualizacion=alta,
+            ))
+        with fechas_manuales(Cliente), transaction.atomic():
+            Cliente.objects.bulk_create(clientes, batch_size=5000)
+            creados = list(Cliente.objects.filter(nit__startswith=PREFIJO_NIT).order_by('nit'))
+            if self.indexar:
+                busqueda.indexar_lote(creados, 'cliente')
+        return creados
+
+    def crear_lote(self, rng, inicio, cantidad, clientes, usuarios, options):
+        """
+        Inserta `cantidad` muestras (la `inicio`-ésima en adelante) con sus
+        ensayos e historial. Las muestras avanzan en el tiempo con el índice,
+        como en la operación real.
+        """
+        total = options['muestras']
+        segundos = options['dias'] * 86400
+        muestras = []
+        for n in range(inicio, inicio + cantidad):
+            registro = self.ahora - timedelta(seconds=segundos * (1 - n / total)) - timedelta(hours=1)
+            estado = elegir(rng, PESOS_ESTADO)
+            aceptada = estado not in ('REGISTRADA', 'RECHAZADA')
+            codigo = f'LIMS-{registro:%Y%m%d}-S{n:08X}'
+            muestras.append(Muestra(
+                codigo_muestra=codigo,
+                sufijo_codigo=Muestra.sufijo_de(codigo),
+                fecha_registro=registro,
+                fecha_recepcion=registro,
+                fecha_actualizacion=registro,
+                estado=estado,
+                usuario_recepcion=usuarios['recepcion'],
+                cliente=rng.choice(clientes),
+                fecha_envio=registro - timedelta(hours=rng.randint(2, 72)),
+                medio_entrega=rng.choice(['CORREO', 'MENSAJERIA', 'PERSONAL', 'OTRO']),
+                condiciones_recepcion=rng.choice(['OPTIMAS', 'OPTIMAS', 'ACEPTABLES', 'NO_CONFORMES']),
+                tipo_muestra=rng.choice(Muestra.TIPO_MUESTRA_CHOICES)[0],
+                matriz=rng.choice(['Líquido', 'Sólido', 'Gel', 'Polvo']),
+                descripcion_muestra=f'Muestra sintética {n}',
+                cantidad_enviada=Decimal(rng.randint(10, 5000)) / 10,
+                lote=f'L{rng.randint(1, 99999):05d}',
+                fecha_muestreo=registro - timedelta(hours=rng.randint(73, 240)),
+                responsable_muestreo='Muestreador sintético',
+                condiciones_almacenamiento=rng.choice(Muestra.ALMACENAMIENTO_CHOICES)[0],
+                riesgo_asociado=rng.choice(Muestra.RIESGO_CHOICES)[0],
+                muestra_aceptada=aceptada,
+                fecha_aceptacion=registro + timedelta(hours=2) if aceptada else None,
+                usuario_aceptacion=usuarios['recepcion'] if aceptada else None,
+            ))
+        Muestra.objects.bulk_create(muestras)
+        if self.indexar:
+            busqueda.indexar_lote(muestras, 'muestra')
+
+        ensayos, historial = [], []
+        for muestra in muestras:
+            for _ in range(self.cantidad_alrededor(rng, options['ensayos_por_muestra'])):
+                ensayos.append(self.ensayo(rng, muestra, usuarios['analistas']))
+            historial.extend(self.historial(rng, muestra, usuarios['recepcion'],
+                                            self.cantidad_alrededor(rng, options['historial_por_muestra'])))
+        Ensayo.objects.bulk_create(ensayos, batch_size=5000)
+        HistorialEstado.objects.bulk_create(historial, batch_size=5000)
+
+    @staticmethod
+    def cantidad_alrededor(rng, promedio):
+        return rng.randint(max(0, promedio - 2), promedio + 2) if promedio else 0
+
+    def ensayo(self, rng, muestra, analistas):
+        nombre, norma = rng.choice(ANALISIS)
+        creado = muestra.fecha_registro
+        if muestra.estado in ('ANALIZADA', 'COMPLETADA'):
+            estado = 'COMPLETADO'
+        elif muestra.estado == 'RECHAZADA':
+            estado = 'CANCELADO'
+        elif muestra.estado == 'EN_ANALISIS':
+            estado = rng.choice(['PENDIENTE', 'EN_PROCESO', 'COMPLETADO'])
+        else:
+            estado = 'PENDIENTE'
+        inicio = creado + timedelta(hours=rng.randint(3, 48)) if estado in ('EN_PROCESO', 'COMPLETADO') else None
+        fin = inicio + timedelta(hours=rng.randint(1, 120)) if estado == 'COMPLETADO' else None
+        return Ensayo(
+            muestra=muestra,
+            nombre_analisis=nombre,
+            norma_metodo=norma,
+            prioridad=elegir(rng, PESOS_PRIORIDAD),
+            fecha_resultados_requerida=(creado + timedelta(days=rng.randint(3, 20))).date(),
+            estado_ensayo=estado,
+            analista_asignado=rng.choice(analistas) if estado != 'PENDIENTE' or rng.random() < 0.5 else None,
+            fecha_inicio=inicio,
+            fecha_finalizacion=fin,
+            resultados='Conforme' if fin else '',
+            fecha_creacion=creado,
+            fecha_actualizacion=fin or creado,
+        )
+
+    def historial(self, rng, muestra, usuario, cantidad):
+        """
+        Recorre el ciclo de estados hasta el estado final de la muestra; los
+        registros que sobran son anotaciones sin cambio de estado.
+        """
+        if muestra.estado == 'RECHAZADA':
+            cadena = ['REGISTRADA', 'RECHAZADA']
+        else:
+            cadena = CICLO[:CICLO.index(muestra.estado) + 1]
+        transiciones = list(zip(cadena, cadena[1:]))
+        transiciones += [(muestra.estado, muestra.estado)] * max(0, cantidad - len(transiciones))
+        fecha = muestra.fecha_registro
+        registros = []
+        for anterior, nuevo in transiciones[:max(cantidad, len(cadena) - 1)]:
+            fecha += timedelta(minutes=rng.randint(5, 2880))
+            registros.append(HistorialEstado(
+                muestra=muestra,
+                estado_anterior=anterior,
+                estado_nuevo=nuevo,
+                usuario=usuario,
+                fecha_cambio=min(fecha, self.ahora),
+                observaciones='' if anterior != nuevo else 'Seguimiento',
+            ))
+        return registros
@@ -0,0 +1,164 @@
+"""
+Comando: python manage.py probar_concurrencia
+
+Lanza peticiones simultáneas (una por hilo, liberadas a la vez) sobre la
+misma muestra o el mismo ensayo y verifica el control de concurrencia de
+reception/concurrencia.py:
+
+- aceptar: una sola respuesta 200 y un solo registro de historial.
+- actualizar_estado a EN_ANALISIS: igual que aceptar.
+- PATCH con la misma revisión: una respuesta 200 y las demás 409.
+- registrar_resultados: el ensayo se cuenta una sola vez en el resumen diario.
+
+Usa sus propios datos (los del benchmark, que se eliminan al terminar) y
+termina con error si algún escenario falla:
+
+    python manage.py probar_concurrencia --hilos 8 --rondas 5
+"""
+import logging
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from reception import benchmark
+from reception.models import Ensayo, HistorialEstado, Muestra, ResumenDiario
+
+
+def simultaneas(usuario, metodo, url, payloads):
+    """
+    Ejecuta una petición por payload, cada una en su hilo y con su conexión,
+    liberadas a la vez. Devuelve los códigos de estado.
+    """
+    barrera = threading.Barrier(len(payloads))
+    estados = [None] * len(payloads)
+
+    def ejecutar(indice, payload):
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(user=usuario)
+        try:
+            barrera.wait()
+            estados[indice] = getattr(client, metodo)(url, payload, format='json').status_code
+        except Exception as error:
+            estados[indice] = type(error).__name__
+        finally:
+            connections.close_all()
+
+    hilos = [threading.Thread(target=ejecutar, args=(i, p)) for i, p in enumerate(payloads)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return estados
+
+
+def finalizados(datos):
+    return ResumenDiario.objects.filter(cliente_id=datos['b_cliente']).aggregate(
+        total=Sum('ensayos_finalizados')
+    )['total'] or 0
+
+
+class Command(BaseCommand):
+    help = 'Verifica que las transiciones simultáneas sobre un mismo objeto se apliquen una sola vez.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8,
+                            help='Peticiones simultáneas por ronda (default: 8)')
+        parser.add_argument('--rondas', type=int, default=3,
+                            help='Repeticiones de cada escenario (default: 3)')
+
+    def handle(self, *args, **options):
+        if options['hilos'] < 2 or options['rondas'] < 1:
+            raise CommandError('--hilos debe ser al menos 2 y --rondas mayor que cero')
+        escenarios = [
+            ('aceptar', self.aceptar),
+            ('actualizar_estado', self.actualizar_estado),
+            ('patch_revision', self.patch_revision),
+            ('registrar_resultados', self.registrar_resultados),
+        ]
+        instrumentacion = dict(settings.LIMS_INSTRUMENTACION, REGISTRAR_PETICIONES=False, UMBRAL_LENTO_MS=None)
+        cache = dict(settings.LIMS_CACHE_RESPUESTAS, HABILITADA=False)
+        fallos = []
+        # Los 400 y 409 esperados no se registran como advertencias
+        registro = logging.getLogger('django.request')
+        nivel = registro.level
+        registro.setLevel(logging.ERROR)
+
+        with override_settings(LIMS_CACHE_RESPUESTAS=cache, LIMS_INSTRUMENTACION=instrumentacion):
+            benchmark.limpiar()
+            usuario, datos = benchmark.crear_datos(uuid.uuid4().hex[:8])
+            try:
+                for nombre, escenario in escenarios:
+                    for ronda in range(options['rondas']):
+                        estados, error = escenario(usuario, datos, options['hilos'])
+                        resumen = ' '.join(f'{e}×{n}' for e, n in sorted(Counter(map(str, estados)).items()))
+                        linea = f'{nombre:22} ronda {ronda + 1}: {resumen}'
+                        if error:
+                            fallos.append(f'{nombre}: {error}')
+                            self.stdout.write(self.style.ERROR(f'{linea}  {error}'))
+                        else:
+                            self.stdout.write(f'{linea}  ok')
+            finally:
+                benchmark.limpiar()
+                registro.setLevel(nivel)
+
+        if fallos:
+            raise CommandError(f'{len(fallos)} ronda(s) con errores de concurrencia')
+        self.stdout.write(self.style.SUCCESS('Sin errores de concurrencia'))
+
+    def aceptar(self, usuario, datos, hilos):
+        muestra = benchmark.muestra_desechable(datos)['desechable']
+        estados = simultaneas(usuario, 'post', f'/api/muestras/{muestra}/aceptar/',
+                              [{'aceptada': True}] * hilos)
+        return estados, self.una_transicion(estados, muestra, 'ACEPTADA')
+
+    def actualizar_estado(self, usuario, datos, hilos):
+        muestra = Muestra.objects.get(pk=benchmark.muestra_desechable(datos)['desechable'])
+        muestra.estado = 'ACEPTADA'
+        muestra.save()
+        estados = simultaneas(usuario, 'post', f'/api/muestras/{muestra.pk}/actualizar_estado/',
+                              [{'estado': 'EN_ANALISIS'}] * hilos)
+        return estados, self.una_transicion(estados, muestra.pk, 'EN_ANALISIS')
+
+    def patch_revision(self, usuario, datos, hilos):
+        muestra = Muestra.objects.get(pk=benchmark.muestra_desechable(datos)['desechable'])
+        payloads = [
+            {'observaciones_recepcion': f'Edición {i}', 'revision': muestra.revision}
+            for i in range(hilos)
+        ]
+        estados = simultaneas(usuario, 'patch', f'/api/muestras/{muestra.pk}/', payloads)
+        conteo = Counter(estados)
+        if conteo[200] != 1 or conteo[409] != hilos - 1:
+            return estados, 'se esperaba una respuesta 200 y las demás 409'
+        muestra.refresh_from_db()
+        if muestra.revision != payloads[0]['revision'] + 1:
+            return estados, f'revisión final {muestra.revision}'
+        return estados, None
+
+    def registrar_resultados(self, usuario, datos, hilos):
+        ensayo = benchmark.ensayo_desechable(datos)['desechable']
+        antes = finalizados(datos)
+        estados = simultaneas(usuario, 'post', f'/api/ensayos/{ensayo}/registrar_resultados/',
+                              [{'resultados': 'pH: 7.0'}] * hilos)
+        if Counter(estados)[200] != hilos:
+            return estados, 'se esperaba 200 en todas (las siguientes son correcciones)'
+        if Ensayo.objects.get(pk=ensayo).estado_ensayo != 'COMPLETADO':
+            return estados, 'el ensayo no quedó COMPLETADO'
+        contados = finalizados(datos) - antes
+        if contados != 1:
+            return estados, f'el ensayo se contó {contados} veces en el resumen diario'
+        return estados, None
+
+    def una_transicion(self, estados, muestra, estado):
+        if Counter(estados)[200] != 1:
+            return 'se esperaba una sola respuesta 200'
+        registros = HistorialEstado.objects.filter(muestra_id=muestra, estado_nuevo=estado).count()
+        if registros != 1:
+            return f'{registros} registros de historial a {estado}'
+        return None
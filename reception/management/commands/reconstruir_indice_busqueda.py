@@ -0,0 +1,32 @@
+"""
+Comando: python manage.py reconstruir_indice_busqueda
+
+Regenera el índice FTS5 de muestras y clientes (solo SQLite). Útil después de
+cargas hechas fuera de la aplicación (SQL directo, restauraciones) o si el
+índice se desincronizó. En PostgreSQL los índices GIN se mantienen solos.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reception import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de texto completo (SQLite FTS5).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo',
+            choices=busqueda.TIPOS,
+            help='Reconstruir solo un tipo de documento (default: todos)'
+        )
+
+    def handle(self, *args, **options):
+        if busqueda.motor() != 'sqlite':
+            self.stdout.write('El motor actual no usa índice FTS5; no hay nada que reconstruir.')
+            return
+
+        for tipo in [options['tipo']] if options['tipo'] else busqueda.TIPOS:
+            with transaction.atomic():
+                total = busqueda.reconstruir_indice(tipo)
+            self.stdout.write(self.style.SUCCESS(f'{tipo}: {total} documento(s) indexado(s)'))
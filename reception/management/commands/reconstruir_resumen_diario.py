@@ -0,0 +1,75 @@
+"""
+Comando: python manage.py reconstruir_resumen_diario
+
+Recalcula la tabla ResumenDiario desde Muestra, HistorialEstado y Ensayo.
+Sirve para la carga inicial (backfill) y para corregir desviaciones del
+mantenimiento incremental (muestras creadas desde el admin, eliminaciones,
+correcciones de resultados).
+
+El rango se procesa en bloques de días; cada bloque se reemplaza en su propia
+transacción, así que el comando puede interrumpirse y repetirse sin riesgo.
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from reception.models import Muestra
+from reception.resumen import reconstruir
+
+
+def fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (use AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de muestras y ensayos por bloques de días.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Primer día a reconstruir (AAAA-MM-DD). Por defecto, el día de la muestra más antigua.'
+        )
+        parser.add_argument(
+            '--hasta',
+            help='Último día a reconstruir (AAAA-MM-DD). Por defecto, hoy.'
+        )
+        parser.add_argument(
+            '--dias-por-bloque',
+            type=int,
+            default=31,
+            help='Días procesados en cada transacción (default: 31)'
+        )
+
+    def handle(self, *args, **options):
+        hasta = fecha(options['hasta']) if options['hasta'] else timezone.localdate()
+        if options['desde']:
+            desde = fecha(options['desde'])
+        else:
+            primera = Muestra.objects.aggregate(primera=Min('fecha_registro'))['primera']
+            if primera is None:
+                self.stdout.write('No hay muestras registradas; nada que reconstruir.')
+                return
+            desde = timezone.localdate(primera)
+
+        if desde > hasta:
+            raise CommandError('--desde debe ser anterior o igual a --hasta')
+        if options['dias_por_bloque'] < 1:
+            raise CommandError('--dias-por-bloque debe ser mayor que cero')
+
+        total = 0
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=options['dias_por_bloque'] - 1), hasta)
+            filas = reconstruir(inicio, fin)
+            total += filas
+            self.stdout.write(f'{inicio} → {fin}: {filas} fila(s)')
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Resumen diario reconstruido del {desde} al {hasta}: {total} fila(s).'
+        ))
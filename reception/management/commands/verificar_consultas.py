@@ -0,0 +1,263 @@
+"""
+Comando: python manage.py verificar_consultas
+
+Verifica el presupuesto de consultas SQL de cada endpoint de la API.
+Crea datos temporales (una muestra con muchos ensayos y registros de historial),
+llama a cada endpoint con el cliente de pruebas de DRF y compara el número de
+consultas ejecutadas con el presupuesto declarado. Todo se ejecuta dentro de una
+transacción que se revierte al final, por lo que la base de datos no cambia.
+
+Las pruebas (ConsultasApiTests y ListasAdminTests en reception/tests.py)
+fijan el número exacto de consultas de los endpoints principales con
+`python manage.py test`; este comando recorre todos contra la base de datos
+configurada y con el volumen de --filas.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from reception.models import Cliente, Muestra, Ensayo, HistorialEstado
+
+# Payload válido para los endpoints de creación de muestras
+MUESTRA_NUEVA = {
+    'cliente': '{cliente}', 'tipo_muestra': 'AGUA', 'matriz': 'Líquido',
+    'descripcion_muestra': 'Nueva', 'cantidad_enviada': '10.00',
+    'fecha_envio': '2024-01-02T00:00:00Z', 'fecha_muestreo': '2024-01-01T00:00:00Z',
+    'responsable_muestreo': 'N/A', 'medio_entrega': 'PERSONAL',
+    'condiciones_almacenamiento': 'AMBIENTE',
+}
+
+# =============================================================================
+# PRESUPUESTOS POR ENDPOINT
+# =============================================================================
+# (método, ruta, payload, presupuesto máximo de consultas)
+# Las rutas usan {cliente}, {muestra}, {ensayo}, {historial}, {analista},
+# {codigo} y {sufijo} (código de la muestra y su sufijo).
+# El método 'get_condicional' repite un GET anterior de la misma ruta con
+# If-None-Match y espera 304.
+# El orden importa: las acciones que cambian estado van al final.
+# Las escrituras incluyen la actualización del resumen diario: una consulta
+# si la fila del día ya existe, dos si hay que crearla. Guardar una muestra
+# suma dos más en SQLite (sincronización del índice FTS5 de búsqueda).
+PRESUPUESTOS = [
+    ('get', '/api/clientes/', None, 2),
+    ('get', '/api/clientes/{cliente}/', None, 2),
+    ('get_condicional', '/api/clientes/{cliente}/', None, 1),
+    ('get', '/api/clientes/{cliente}/muestras/', None, 2),
+
+    ('get', '/api/muestras/', None, 2),
+    ('get', '/api/muestras/?estado=REGISTRADA', None, 2),
+    # Segunda petición idéntica: se sirve desde la cache de respuestas
+    ('get', '/api/muestras/?estado=REGISTRADA', None, 0),
+    ('get_condicional', '/api/muestras/?estado=REGISTRADA', None, 0),
+    # Sin conteo: solo la página (el ETag de la lista no consulta la BD)
+    ('get', '/api/muestras/?paginacion=cursor', None, 1),
+    ('get', '/api/muestras/?conteo=no', None, 1),
+    ('get', '/api/muestras/{muestra}/', None, 4),
+    ('get_condicional', '/api/muestras/{muestra}/', None, 1),
+    ('get', '/api/muestras/{muestra}/ensayos/', None, 2),
+    ('get', '/api/muestras/{muestra}/historial/', None, 2),
+    # Muestra + cliente + ensayos en un solo JOIN
+    ('get', '/api/muestras/escanear/?codigo={codigo}', None, 1),
+    ('get', '/api/muestras/escanear/?codigo={sufijo}', None, 1),
+    # Muestras por bloque + ensayos por bloque
+    ('get', '/api/muestras/exportar/?formato=csv', None, 2),
+    ('get', '/api/muestras/exportar/?formato=ndjson', None, 2),
+    ('post', '/api/muestras/{muestra}/validar_suficiencia/', {'cantidad_requerida': '1.00'}, 1),
+
+    ('get', '/api/ensayos/', None, 2),
+    ('get', '/api/ensayos/?paginacion=cursor', None, 1),
+    ('get', '/api/ensayos/{ensayo}/', None, 2),
+    ('get', '/api/ensayos/worklist/?analista={analista}', None, 1),
+
+    ('get', '/api/historial/', None, 2),
+    ('get', '/api/historial/?paginacion=cursor', None, 1),
+    ('get', '/api/historial/{historial}/', None, 2),
+
+    ('get', '/api/estadisticas/?fecha_desde=2000-01-01', None, 5),
+    ('get', '/api/estadisticas/tendencias/?agrupar=mes', None, 1),
+
+    # Por tipo: consulta al índice + carga de los objetos encontrados
+    ('get', '/api/buscar/?q=verificacion', None, 4),
+    ('get', '/api/buscar/?q=verificacion&tipo=muestra', None, 2),
+
+    # Listas del admin: sesión + usuario, conteo estimado y la página con sus
+    # relaciones en un JOIN; no crece con --filas (los filtros de Cliente
+    # listan los países y ciudades existentes)
+    ('get', '/admin/reception/cliente/', None, 6),
+    ('get', '/admin/reception/muestra/', None, 4),
+    ('get', '/admin/reception/ensayo/', None, 4),
+    ('get', '/admin/reception/ensayo/?analista=ninguno', None, 4),
+    ('get', '/admin/reception/historialestado/', None, 4),
+    ('get', '/admin/reception/resumendiario/', None, 4),
+
+    # Histograma en memoria del proceso
+    ('get', '/api/rendimiento/', None, 0),
+    # Indicadores agregados; la segunda lectura sale de la cache
+    ('get', '/metrics', None, 4),
+    ('get', '/metrics', None, 0),
+
+    ('post', '/api/muestras/', dict(MUESTRA_NUEVA, usuario_recepcion='{analista}'), 7),
+    ('post', '/api/muestras/registro_masivo/', {'muestras': [MUESTRA_NUEVA] * 20}, 6),
+    # Las escrituras sobre una muestra o un ensayo incluyen el bloqueo de
+    # escritura que en SQLite reemplaza a SELECT ... FOR UPDATE (concurrencia.py)
+    ('patch', '/api/muestras/{muestra}/', {'lote': 'LOTE-VERIFICACION'}, 10),
+    ('post', '/api/muestras/{muestra}/agregar_ensayos/', {'ensayos': [
+        {'nombre_analisis': 'pH', 'fecha_resultados_requerida': '2099-01-01'},
+        {'nombre_analisis': 'Viscosidad', 'fecha_resultados_requerida': '2099-01-01'},
+        {'nombre_analisis': 'Densidad', 'fecha_resultados_requerida': '2099-01-01',
+         'analista_asignado': '{analista}'},
+    ]}, 3),
+    ('post', '/api/muestras/{muestra}/aceptar/', {'aceptada': True}, 6),
+    ('post', '/api/muestras/{muestra}/actualizar_estado/', {'estado': 'EN_ANALISIS'}, 6),
+    # Bloqueo, un UPDATE y un bulk_create por lote, sin importar cuántas muestras
+    ('post', '/api/muestras/transicion_masiva/', {'muestras': ['{muestra}'], 'estado': 'RECHAZADA'}, 6),
+    ('post', '/api/ensayos/{ensayo}/asignar_analista/', {'analista_id': '{analista}'}, 4),
+    # Incluye la búsqueda de la muestra para el avance automático a ANALIZADA
+    ('post', '/api/ensayos/{ensayo}/registrar_resultados/', {'resultados': 'pH 7.0'}, 5),
+]
+
+# Sentencias de control de transacción que no cuentan contra el presupuesto
+# (en producción la petición no corre dentro de una transacción externa).
+PREFIJOS_IGNORADOS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def crear_datos(filas):
+    """
+    Crea un cliente, una muestra y `filas` ensayos y registros de historial.
+    """
+    # Superusuario para las listas del admin
+    usuario = User.objects.create_user(username='verificacion_consultas', is_staff=True, is_superuser=True)
+    analista = User.objects.create_user(username='verificacion_analista')
+    cliente = Cliente.objects.create(
+        nombre_empresa='Cliente de verificación',
+        nit='VERIFICACION-0001',
+        direccion='N/A',
+        ciudad='Bogotá',
+        persona_contacto='N/A',
+        email='verificacion@lab.com',
+        telefono='0',
+    )
+    ahora = timezone.now()
+    muestra = Muestra.objects.create(
+        cliente=cliente,
+        usuario_recepcion=usuario,
+        tipo_muestra='AGUA',
+        matriz='Líquido',
+        descripcion_muestra='Muestra de verificación de consultas',
+        cantidad_enviada=Decimal('100.00'),
+        fecha_envio=ahora - timedelta(days=1),
+        fecha_muestreo=ahora - timedelta(days=2),
+        responsable_muestreo='N/A',
+        medio_entrega='PERSONAL',
+        condiciones_almacenamiento='AMBIENTE',
+    )
+    Ensayo.objects.bulk_create([
+        Ensayo(
+            muestra=muestra,
+            nombre_analisis=f'Ensayo {i}',
+            fecha_resultados_requerida=ahora.date() + timedelta(days=7),
+            analista_asignado=analista,
+        )
+        for i in range(filas)
+    ])
+    HistorialEstado.objects.bulk_create([
+        HistorialEstado(
+            muestra=muestra,
+            estado_anterior='REGISTRADA',
+            estado_nuevo='REGISTRADA',
+            usuario=usuario,
+            observaciones=f'Registro {i}',
+        )
+        for i in range(filas)
+    ])
+    return {
+        'usuario': usuario,
+        'cliente': cliente.pk,
+        'muestra': muestra.pk,
+        'codigo': muestra.codigo_muestra,
+        'sufijo': muestra.sufijo_codigo,
+        'ensayo': muestra.ensayos.first().pk,
+        'historial': muestra.historial.first().pk,
+        'analista': analista.pk,
+    }
+
+
+def formatear(valor, ids):
+    """
+    Sustituye los marcadores {muestra}, {ensayo}, etc. en rutas y payloads.
+    """
+    if isinstance(valor, str):
+        return valor.format(**ids)
+    if isinstance(valor, dict):
+        return {clave: formatear(v, ids) for clave, v in valor.items()}
+    if isinstance(valor, list):
+        return [formatear(v, ids) for v in valor]
+    return valor
+
+
+class Command(BaseCommand):
+    help = 'Verifica que cada endpoint de la API respete su presupuesto de consultas SQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--filas',
+            type=int,
+            default=50,
+            help='Número de ensayos y registros de historial de la muestra de prueba (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        fallos = []
+        etags = {}
+
+        with transaction.atomic():
+            ids = crear_datos(options['filas'])
+            client = APIClient(HTTP_HOST='localhost')
+            usuario = ids.pop('usuario')
+            client.force_authenticate(user=usuario)
+            client.force_login(usuario)  # sesión para el admin
+
+            for metodo, ruta, payload, presupuesto in PRESUPUESTOS:
+                url = formatear(ruta, ids)
+                with CaptureQueriesContext(connection) as contexto:
+                    if metodo == 'get_condicional':
+                        response = client.get(url, HTTP_IF_NONE_MATCH=etags.get(url, ''))
+                    else:
+                        response = getattr(client, metodo)(url, formatear(payload, ids), format='json')
+                    if response.streaming:
+                        # Las consultas de una respuesta en streaming ocurren al recorrerla
+                        b''.join(response.streaming_content)
+                if response.has_header('ETag'):
+                    etags[url] = response['ETag']
+                consultas = [
+                    q['sql'] for q in contexto.captured_queries
+                    if not q['sql'].startswith(PREFIJOS_IGNORADOS)
+                ]
+
+                etiqueta = f'{metodo.upper():6} {ruta}'
+                resumen = f'{etiqueta:62} {len(consultas):3} / {presupuesto:3}  [{response.status_code}]'
+                esperado_304 = metodo == 'get_condicional'
+                if (response.status_code >= 400 or len(consultas) > presupuesto
+                        or esperado_304 != (response.status_code == 304)):
+                    fallos.append(etiqueta)
+                    self.stdout.write(self.style.ERROR(resumen))
+                    if options['verbosity'] > 1:
+                        for sql in consultas:
+                            self.stdout.write(f'    {sql}')
+                else:
+                    self.stdout.write(self.style.SUCCESS(resumen))
+
+            transaction.set_rollback(True)
+
+        if fallos:
+            raise CommandError(
+                f'{len(fallos)} endpoint(s) exceden su presupuesto o fallaron: ' + ', '.join(fallos)
+            )
+        self.stdout.write(self.style.SUCCESS('Todos los endpoints respetan su presupuesto de consultas.'))
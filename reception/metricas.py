@@ -0,0 +1,389 @@
+"""
+Métricas en formato de texto de Prometheus (GET /metrics).
+
+Contadores e histogramas:
+- Las vistas los actualizan en los puntos de cambio con contar(), que suma
+  al confirmarse la transacción (un rollback no cuenta).
+- InstrumentacionMiddleware alimenta la latencia por vista con observar().
+- Se guardan en memoria del proceso. Con varios procesos de servidor,
+  definir LIMS_METRICAS_DIR: cada proceso escribe sus valores en un archivo
+  propio del directorio cada INTERVALO_ESCRITURA segundos, desde un hilo de
+  fondo, y /metrics suma los de todos. Los archivos de procesos terminados
+  de la misma máquina se suman a acumulado.json y se eliminan: los
+  contadores no retroceden y el directorio no crece con cada reinicio de
+  workers. Vaciar el directorio los reinicia.
+
+Indicadores (gauges): muestras por estado, ensayos por estado y prioridad,
+ensayos vencidos y transiciones del último minuto. Se calculan con
+consultas agregadas y se guardan en la cache de respuestas (ver cache.py)
+por INTERVALO_INDICADORES segundos. Si la cache es compartida, un solo
+proceso recalcula por intervalo y los demás sirven el último valor.
+"""
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from . import cache as respuestas
+from .models import Muestra, Ensayo, HistorialEstado
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo no se pliegan los archivos
+    fcntl = None
+
+# nombre: (tipo, ayuda)
+METRICAS = {
+    'lims_muestras_registradas_total': ('counter', 'Muestras registradas por tipo de muestra'),
+    'lims_transiciones_total': ('counter', 'Cambios de estado de muestras registrados en el historial'),
+    'lims_ensayos_agregados_total': ('counter', 'Ensayos solicitados por prioridad'),
+    'lims_ensayos_asignados_total': ('counter', 'Asignaciones de analista a ensayos'),
+    'lims_ensayos_completados_total': ('counter', 'Ensayos con resultados registrados por primera vez'),
+    'lims_http_peticiones_total': ('counter', 'Peticiones HTTP por vista y clase de estado'),
+    'lims_cache_respuestas_total': ('counter', 'Listas servidas desde la cache (acierto) o calculadas (fallo)'),
+    'lims_http_duracion_segundos': ('histogram', 'Duración de las peticiones HTTP por vista'),
+    'lims_muestras': ('gauge', 'Muestras por estado'),
+    'lims_ensayos': ('gauge', 'Ensayos por estado y prioridad'),
+    'lims_ensayos_vencidos': ('gauge', 'Ensayos pendientes o en proceso con fecha requerida vencida'),
+    'lims_transiciones_ultimo_minuto': ('gauge', 'Registros de historial de estado del último minuto'),
+}
+
+# Límites superiores (segundos) del histograma de latencia; la última cubeta es +Inf
+CUBETAS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Valores de los procesos terminados, dentro de LIMS_METRICAS_DIR
+ACUMULADO = 'acumulado.json'
+
+
+def configuracion():
+    return getattr(settings, 'LIMS_METRICAS', {})
+
+
+# =============================================================================
+# VALORES DEL PROCESO
+# =============================================================================
+class Registro:
+    """
+    Contadores {(nombre, etiquetas): valor} e histogramas
+    {(nombre, etiquetas): [cubetas..., +Inf, suma]} del proceso.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contadores = {}
+        self.histogramas = {}
+        self.sucio = False
+        self.pid = None
+        self.archivo = None
+
+    def incrementar(self, nombre, valor, etiquetas):
+        clave = (nombre, etiquetas)
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+            self.sucio = True
+        self.asegurar_escritor()
+
+    def observar(self, nombre, valor, etiquetas):
+        clave = (nombre, etiquetas)
+        with self.lock:
+            cubetas = self.histogramas.get(clave)
+            if cubetas is None:
+                cubetas = self.histogramas[clave] = [0] * (len(CUBETAS_SEGUNDOS) + 2)
+            for i, limite in enumerate(CUBETAS_SEGUNDOS):
+                if valor <= limite:
+                    cubetas[i] += 1
+                    break
+            else:
+                cubetas[len(CUBETAS_SEGUNDOS)] += 1
+            cubetas[-1] += valor
+            self.sucio = True
+        self.asegurar_escritor()
+
+    def instantanea(self):
+        with self.lock:
+            return {
+                'contadores': [[n, list(map(list, e)), v] for (n, e), v in self.contadores.items()],
+                'histogramas': [[n, list(map(list, e)), list(c)] for (n, e), c in self.histogramas.items()],
+            }
+
+    # -------------------------------------------------------------------------
+    # Escritura al directorio compartido
+    # -------------------------------------------------------------------------
+    def asegurar_escritor(self):
+        """
+        Arranca el hilo de escritura la primera vez en cada proceso (también
+        en los procesos creados con fork después de configurar Django).
+        """
+        directorio = configuracion().get('DIR')
+        if not directorio or self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            if self.pid is not None:
+                # Proceso hijo: los valores heredados pertenecen al padre
+                self.contadores, self.histogramas = {}, {}
+            self.pid = os.getpid()
+            self.archivo = Path(directorio) / f'{socket.gethostname()}-{self.pid}-{time.time_ns()}.json'
+        Path(directorio).mkdir(parents=True, exist_ok=True)
+        threading.Thread(target=self.escribir_periodicamente, name='lims-metricas', daemon=True).start()
+
+    def escribir_periodicamente(self):
+        intervalo = configuracion().get('INTERVALO_ESCRITURA', 5)
+        while True:
+            time.sleep(intervalo)
+            self.escribir()
+
+    def escribir(self):
+        if not self.sucio or self.archivo is None or self.pid != os.getpid():
+            return
+        self.sucio = False
+        escribir_json(self.archivo, self.instantanea())
+
+
+def escribir_json(archivo, datos):
+    temporal = archivo.with_suffix('.tmp')
+    temporal.write_text(json.dumps(datos))
+    os.replace(temporal, archivo)
+
+
+registro = Registro()
+atexit.register(registro.escribir)
+
+
+def normalizar(etiquetas):
+    return tuple(sorted((clave, str(valor)) for clave, valor in etiquetas.items()))
+
+
+def contar(nombre, valor=1, **etiquetas):
+    """
+    Suma `valor` al contador cuando se confirme la transacción actual
+    (de inmediato fuera de una transacción).
+    """
+    etiquetas = normalizar(etiquetas)
+    transaction.on_commit(lambda: registro.incrementar(nombre, valor, etiquetas))
+
+
+def incrementar(nombre, valor=1, **etiquetas):
+    """
+    Suma `valor` al contador de inmediato (para lo que no depende de una transacción).
+    """
+    registro.incrementar(nombre, valor, normalizar(etiquetas))
+
+
+def observar(nombre, valor, **etiquetas):
+    registro.observar(nombre, valor, normalizar(etiquetas))
+
+
+# =============================================================================
+# DIRECTORIO COMPARTIDO
+# =============================================================================
+def sumar(contadores, histogramas, instantanea):
+    for nombre, etiquetas, valor in instantanea['contadores']:
+        clave = (nombre, tuple(map(tuple, etiquetas)))
+        contadores[clave] = contadores.get(clave, 0) + valor
+    for nombre, etiquetas, cubetas in instantanea['histogramas']:
+        clave = (nombre, tuple(map(tuple, etiquetas)))
+        actual = histogramas.setdefault(clave, [0] * len(cubetas))
+        histogramas[clave] = [a + b for a, b in zip(actual, cubetas)]
+
+
+def proceso_terminado(archivo):
+    """
+    True si el archivo es de un proceso de esta máquina que ya no existe.
+    Un PID reutilizado solo retrasa el plegado hasta que termine el nuevo.
+    """
+    try:
+        maquina, pid, _ = archivo.stem.rsplit('-', 2)
+        pid = int(pid)
+    except ValueError:
+        return False  # acumulado.json u otro archivo ajeno
+    if maquina != socket.gethostname():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # existe, de otro usuario
+    return False
+
+
+def plegar_terminados(directorio):
+    """
+    Suma los archivos de procesos terminados a ACUMULADO y los elimina.
+    Se llama con el directorio bloqueado. ACUMULADO guarda los nombres que
+    ya sumó: si el proceso se interrumpe antes de eliminarlos, la siguiente
+    llamada los elimina sin volver a sumarlos.
+    """
+    terminados = [archivo for archivo in directorio.glob('*.json') if proceso_terminado(archivo)]
+    for temporal in directorio.glob('*.tmp'):
+        if proceso_terminado(temporal):
+            temporal.unlink(missing_ok=True)  # escritura interrumpida
+    if not terminados:
+        return
+    contadores, histogramas = {}, {}
+    try:
+        acumulado = json.loads((directorio / ACUMULADO).read_text())
+    except FileNotFoundError:
+        acumulado = {'contadores': [], 'histogramas': [], 'plegados': []}
+    sumar(contadores, histogramas, acumulado)
+    plegados = set(acumulado['plegados']) & {archivo.name for archivo in terminados}
+    for archivo in terminados:
+        if archivo.name not in plegados:
+            try:
+                sumar(contadores, histogramas, json.loads(archivo.read_text()))
+            except ValueError:
+                pass  # ilegible: se descarta en vez de bloquear /metrics
+            plegados.add(archivo.name)
+    escribir_json(directorio / ACUMULADO, {
+        'contadores': [[n, list(map(list, e)), v] for (n, e), v in contadores.items()],
+        'histogramas': [[n, list(map(list, e)), c] for (n, e), c in histogramas.items()],
+        'plegados': sorted(plegados),
+    })
+    for archivo in terminados:
+        archivo.unlink()
+
+
+def valores_combinados():
+    """
+    Suma los valores de este proceso con los archivos de los demás y el
+    acumulado de los terminados.
+    """
+    contadores, histogramas = {}, {}
+    sumar(contadores, histogramas, registro.instantanea())
+    directorio = configuracion().get('DIR')
+    if not directorio or not Path(directorio).is_dir():
+        return contadores, histogramas
+    directorio = Path(directorio)
+    with open(directorio / '.bloqueo', 'a') as bloqueo:
+        if fcntl is not None:
+            fcntl.flock(bloqueo, fcntl.LOCK_EX)  # se libera al cerrar
+            plegar_terminados(directorio)
+        for archivo in directorio.glob('*.json'):
+            if archivo == registro.archivo:
+                continue  # este proceso ya se sumó con sus valores en memoria
+            try:
+                sumar(contadores, histogramas, json.loads(archivo.read_text()))
+            except (OSError, ValueError):
+                continue  # archivo eliminado o ilegible
+    return contadores, histogramas
+
+
+# =============================================================================
+# INDICADORES (consultas agregadas con cache)
+# =============================================================================
+def calcular_indicadores():
+    hoy = timezone.localdate()
+    muestras = dict(
+        Muestra.objects.order_by().values_list('estado').annotate(total=Count('id'))
+    )
+    ensayos = {
+        (estado, prioridad): total
+        for estado, prioridad, total in Ensayo.objects.order_by()
+        .values_list('estado_ensayo', 'prioridad').annotate(total=Count('id'))
+    }
+    vencidos = Ensayo.objects.filter(
+        estado_ensayo__in=['PENDIENTE', 'EN_PROCESO'], fecha_resultados_requerida__lt=hoy
+    ).count()
+    transiciones = HistorialEstado.objects.filter(
+        fecha_cambio__gte=timezone.now() - timedelta(minutes=1)
+    ).count()
+
+    # Todas las combinaciones, con cero las que no tienen filas
+    indicadores = [
+        ('lims_muestras', [['estado', estado]], muestras.get(estado, 0))
+        for estado, _ in Muestra.ESTADO_CHOICES
+    ]
+    indicadores += [
+        ('lims_ensayos', [['estado_ensayo', estado], ['prioridad', prioridad]], ensayos.get((estado, prioridad), 0))
+        for estado, _ in Ensayo.ESTADO_ENSAYO_CHOICES
+        for prioridad, _ in Ensayo.PRIORIDAD_CHOICES
+    ]
+    indicadores.append(('lims_ensayos_vencidos', [], vencidos))
+    indicadores.append(('lims_transiciones_ultimo_minuto', [], transiciones))
+    return indicadores
+
+
+def indicadores():
+    """
+    Último cálculo de los indicadores. Se recalcula si tiene más de
+    INTERVALO_INDICADORES segundos y ningún otro proceso lo está haciendo.
+    """
+    cache = respuestas.backend()
+    clave = f'{respuestas.PREFIJO}:metricas:indicadores'
+    intervalo = configuracion().get('INTERVALO_INDICADORES', 15)
+    guardado = cache.get(clave)
+    if guardado is not None and time.time() - guardado['calculado'] < intervalo:
+        return guardado['valores']
+    if guardado is not None and not cache.add(f'{clave}:calculando', 1, timeout=intervalo):
+        return guardado['valores']
+    valores = calcular_indicadores()
+    cache.set(clave, {'calculado': time.time(), 'valores': valores}, timeout=None)
+    cache.delete(f'{clave}:calculando')
+    return valores
+
+
+# =============================================================================
+# FORMATO DE TEXTO
+# =============================================================================
+def escapar(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def formatear_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{clave}="{escapar(valor)}"' for clave, valor in pares) + '}'
+
+
+def formatear_numero(valor):
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(valor)
+
+
+def exposicion():
+    contadores, histogramas = valores_combinados()
+    lineas_por_metrica = {nombre: [] for nombre in METRICAS}
+
+    for (nombre, etiquetas), valor in sorted(contadores.items()):
+        lineas_por_metrica[nombre].append(f'{nombre}{formatear_etiquetas(etiquetas)} {formatear_numero(valor)}')
+
+    for (nombre, etiquetas), cubetas in sorted(histogramas.items()):
+        lineas = lineas_por_metrica[nombre]
+        acumulado = 0
+        for limite, cantidad in zip(CUBETAS_SEGUNDOS + ('+Inf',), cubetas[:-1]):
+            acumulado += cantidad
+            lineas.append(f'{nombre}_bucket{formatear_etiquetas(etiquetas, [("le", limite)])} {acumulado}')
+        lineas.append(f'{nombre}_sum{formatear_etiquetas(etiquetas)} {formatear_numero(cubetas[-1])}')
+        lineas.append(f'{nombre}_count{formatear_etiquetas(etiquetas)} {acumulado}')
+
+    for nombre, etiquetas, valor in indicadores():
+        lineas_por_metrica[nombre].append(f'{nombre}{formatear_etiquetas(etiquetas)} {valor}')
+
+    salida = []
+    for nombre, (tipo, ayuda) in METRICAS.items():
+        salida.append(f'# HELP {nombre} {ayuda}')
+        salida.append(f'# TYPE {nombre} {tipo}')
+        salida.extend(lineas_por_metrica[nombre])
+    return '\n'.join(salida) + '\n'
+
+
+@require_GET
+def vista_metricas(request):
+    """
+    GET /metrics: texto para el scraper de Prometheus.
+    """
+    return HttpResponse(exposicion(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,120 @@
+# Generated by Django 5.0 on 2026-10-16 20:35
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_empresa', models.CharField(help_text='Razón social o nombre del cliente', max_length=255, verbose_name='Nombre de la empresa/cliente')),
+                ('nit', models.CharField(help_text='Número de identificación tributaria o documento', max_length=50, unique=True, verbose_name='NIT o identificación')),
+                ('direccion', models.TextField(help_text='Dirección completa del cliente', verbose_name='Dirección')),
+                ('ciudad', models.CharField(max_length=100, verbose_name='Ciudad')),
+                ('pais', models.CharField(default='Colombia', max_length=100, verbose_name='País')),
+                ('persona_contacto', models.CharField(help_text='Nombre del contacto principal', max_length=255, verbose_name='Persona de contacto')),
+                ('cargo_contacto', models.CharField(blank=True, max_length=100, verbose_name='Cargo del contacto')),
+                ('email', models.EmailField(help_text='Canal principal para notificaciones', max_length=254, verbose_name='Correo electrónico')),
+                ('telefono', models.CharField(help_text='Canal alterno para comunicaciones urgentes', max_length=20, verbose_name='Teléfono')),
+                ('tipo_cliente', models.CharField(choices=[('NUEVO', 'Cliente Nuevo'), ('RECURRENTE', 'Cliente Recurrente')], default='NUEVO', max_length=20, verbose_name='Tipo de cliente')),
+                ('activo', models.BooleanField(default=True, help_text='Indica si el cliente está autorizado para enviar muestras', verbose_name='Cliente activo')),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Cliente',
+                'verbose_name_plural': 'Clientes',
+                'ordering': ['nombre_empresa'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Muestra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo_muestra', models.CharField(editable=False, help_text='Generado automáticamente al crear la muestra', max_length=50, unique=True, verbose_name='Código único de muestra')),
+                ('fecha_registro', models.DateTimeField(auto_now_add=True, help_text='Momento exacto de ingreso al sistema', verbose_name='Fecha y hora de registro automático')),
+                ('estado', models.CharField(choices=[('REGISTRADA', 'Registrada'), ('ACEPTADA', 'Aceptada'), ('EN_ANALISIS', 'En Análisis'), ('ANALIZADA', 'Analizada'), ('COMPLETADA', 'Completada'), ('RECHAZADA', 'Rechazada')], default='REGISTRADA', max_length=20, verbose_name='Estado de la muestra')),
+                ('version_plataforma', models.CharField(default='1.0', editable=False, help_text='Control documental del sistema', max_length=20, verbose_name='Versión del formato/plataforma')),
+                ('fecha_envio', models.DateTimeField(help_text='Permite evaluar tiempos de transporte', verbose_name='Fecha de envío de la muestra')),
+                ('fecha_recepcion', models.DateTimeField(auto_now_add=True, help_text='Clave para cálculo de tiempos de respuesta', verbose_name='Fecha y hora de recepción')),
+                ('medio_entrega', models.CharField(choices=[('CORREO', 'Correo/Courier'), ('MENSAJERIA', 'Mensajería'), ('PERSONAL', 'Entrega Personal'), ('OTRO', 'Otro')], help_text='Permite evaluar riesgos asociados al transporte', max_length=20, verbose_name='Medio de entrega')),
+                ('condiciones_recepcion', models.CharField(choices=[('OPTIMAS', 'Óptimas'), ('ACEPTABLES', 'Aceptables'), ('NO_CONFORMES', 'No Conformes')], default='OPTIMAS', help_text='Verificación de integridad de la muestra', max_length=20, verbose_name='Condiciones de recepción')),
+                ('observaciones_recepcion', models.TextField(blank=True, help_text='Anomalías o comentarios relevantes', verbose_name='Observaciones de recepción')),
+                ('tipo_muestra', models.CharField(choices=[('AGUA', 'Agua'), ('ALIMENTO', 'Alimento'), ('COSMETICO', 'Cosmético'), ('FARMACEUTICO', 'Farmacéutico'), ('QUIMICO', 'Químico'), ('AMBIENTAL', 'Ambiental'), ('OTRO', 'Otro')], help_text='Define el tratamiento analítico adecuado', max_length=50, verbose_name='Tipo de muestra')),
+                ('matriz', models.CharField(help_text='Esencial para validar aplicabilidad del método (ej: líquido, sólido, gel)', max_length=100, verbose_name='Matriz')),
+                ('descripcion_muestra', models.TextField(help_text='Contexto adicional para correcta identificación', verbose_name='Descripción de la muestra')),
+                ('cantidad_enviada', models.DecimalField(decimal_places=2, help_text='Permite verificar suficiencia para análisis', max_digits=10, validators=[django.core.validators.MinValueValidator(0.01)], verbose_name='Cantidad enviada')),
+                ('unidad_cantidad', models.CharField(default='mL', help_text='ej: mL, g, kg, unidades', max_length=20, verbose_name='Unidad de medida')),
+                ('lote', models.CharField(blank=True, help_text='Trazabilidad del producto del cliente', max_length=100, verbose_name='Lote/Batch')),
+                ('fecha_muestreo', models.DateTimeField(help_text='Permite evaluar estabilidad y validez de resultados', verbose_name='Fecha de muestreo')),
+                ('responsable_muestreo', models.CharField(help_text='Trazabilidad del origen', max_length=255, verbose_name='Responsable del muestreo')),
+                ('condiciones_almacenamiento', models.CharField(choices=[('AMBIENTE', 'Temperatura ambiente'), ('REFRIGERACION', 'Refrigeración (2-8°C)'), ('CONGELACION', 'Congelación (-20°C)'), ('ULTRACONGELACION', 'Ultracongelación (-80°C)')], help_text='Conserva integridad de la muestra', max_length=30, verbose_name='Condiciones de almacenamiento recomendadas')),
+                ('riesgo_asociado', models.CharField(choices=[('NINGUNO', 'Sin riesgo'), ('BAJO', 'Riesgo bajo'), ('MEDIO', 'Riesgo medio'), ('ALTO', 'Riesgo alto')], default='NINGUNO', help_text='Permite aplicar medidas de bioseguridad', max_length=20, verbose_name='Riesgo asociado')),
+                ('muestra_aceptada', models.BooleanField(default=False, help_text='Formaliza inicio de responsabilidad del laboratorio', verbose_name='Confirmación de aceptación')),
+                ('fecha_aceptacion', models.DateTimeField(blank=True, help_text='Cierra proceso de recepción y activa flujo analítico', null=True, verbose_name='Fecha y hora de aceptación')),
+                ('firma_digital_cliente', models.CharField(blank=True, help_text='Demuestra acuerdo con condiciones del servicio', max_length=500, verbose_name='Firma digital o conformidad del cliente')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='muestras', to='reception.cliente', verbose_name='Cliente')),
+                ('usuario_aceptacion', models.ForeignKey(blank=True, help_text='Asigna responsabilidad técnica', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='muestras_aceptadas', to=settings.AUTH_USER_MODEL, verbose_name='Usuario que acepta la muestra')),
+                ('usuario_recepcion', models.ForeignKey(help_text='Responsable del proceso de recepción', on_delete=django.db.models.deletion.PROTECT, related_name='muestras_recibidas', to=settings.AUTH_USER_MODEL, verbose_name='Usuario que valida la recepción')),
+            ],
+            options={
+                'verbose_name': 'Muestra',
+                'verbose_name_plural': 'Muestras',
+                'ordering': ['-fecha_registro'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HistorialEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(max_length=20, verbose_name='Estado anterior')),
+                ('estado_nuevo', models.CharField(max_length=20, verbose_name='Estado nuevo')),
+                ('fecha_cambio', models.DateTimeField(auto_now_add=True, verbose_name='Fecha y hora del cambio')),
+                ('observaciones', models.TextField(blank=True, verbose_name='Observaciones del cambio')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='Usuario que realizó el cambio')),
+                ('muestra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial', to='reception.muestra', verbose_name='Muestra')),
+            ],
+            options={
+                'verbose_name': 'Historial de Estado',
+                'verbose_name_plural': 'Historial de Estados',
+                'ordering': ['-fecha_cambio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Ensayo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_analisis', models.CharField(help_text='Define alcance técnico del servicio', max_length=255, verbose_name='Análisis solicitado')),
+                ('norma_metodo', models.CharField(blank=True, help_text='Alinea expectativas técnicas entre cliente y laboratorio', max_length=255, verbose_name='Norma o método aplicable')),
+                ('prioridad', models.CharField(choices=[('BAJA', 'Baja'), ('NORMAL', 'Normal'), ('ALTA', 'Alta'), ('URGENTE', 'Urgente')], default='NORMAL', help_text='Gestiona carga de trabajo del laboratorio', max_length=20, verbose_name='Prioridad del análisis')),
+                ('fecha_resultados_requerida', models.DateField(help_text='Permite comprometer plazos de entrega realistas', verbose_name='Fecha requerida de resultados')),
+                ('estado_ensayo', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('COMPLETADO', 'Completado'), ('CANCELADO', 'Cancelado')], default='PENDIENTE', max_length=20, verbose_name='Estado del ensayo')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de inicio del análisis')),
+                ('fecha_finalizacion', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de finalización del análisis')),
+                ('resultados', models.TextField(blank=True, verbose_name='Resultados del ensayo')),
+                ('observaciones_ensayo', models.TextField(blank=True, verbose_name='Observaciones del ensayo')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('analista_asignado', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ensayos_asignados', to=settings.AUTH_USER_MODEL, verbose_name='Analista asignado')),
+                ('muestra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ensayos', to='reception.muestra', verbose_name='Muestra')),
+            ],
+            options={
+                'verbose_name': 'Ensayo',
+                'verbose_name_plural': 'Ensayos',
+                'ordering': ['prioridad', 'fecha_resultados_requerida'],
+            },
+        ),
+    ]
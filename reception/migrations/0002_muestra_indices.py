@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-16 20:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['-fecha_registro'], name='muestra_fecha_reg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['estado', '-fecha_registro'], name='muestra_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['cliente', '-fecha_registro'], name='muestra_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['tipo_muestra', '-fecha_registro'], name='muestra_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['muestra_aceptada', '-fecha_registro'], name='muestra_aceptada_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0 on 2026-10-16 20:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0002_muestra_indices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='muestra',
+            name='muestra_fecha_reg_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='muestra',
+            name='muestra_estado_fecha_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='muestra',
+            name='muestra_cliente_fecha_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='muestra',
+            name='muestra_tipo_fecha_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='muestra',
+            name='muestra_aceptada_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ensayo',
+            index=models.Index(fields=['prioridad', 'fecha_resultados_requerida', 'id'], name='ensayo_prioridad_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialestado',
+            index=models.Index(fields=['-fecha_cambio', '-id'], name='historial_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialestado',
+            index=models.Index(fields=['muestra', '-fecha_cambio', '-id'], name='historial_muestra_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['-fecha_registro', '-id'], name='muestra_fecha_reg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['estado', '-fecha_registro', '-id'], name='muestra_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['cliente', '-fecha_registro', '-id'], name='muestra_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['tipo_muestra', '-fecha_registro', '-id'], name='muestra_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='muestra',
+            index=models.Index(fields=['muestra_aceptada', '-fecha_registro', '-id'], name='muestra_aceptada_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-16 20:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0003_indices_paginacion_cursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ensayo',
+            options={'ordering': ['prioridad_rango', 'fecha_resultados_requerida'], 'verbose_name': 'Ensayo', 'verbose_name_plural': 'Ensayos'},
+        ),
+        migrations.RemoveIndex(
+            model_name='ensayo',
+            name='ensayo_prioridad_fecha_idx',
+        ),
+        migrations.AddField(
+            model_name='ensayo',
+            name='prioridad_rango',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(prioridad='URGENTE', then=models.Value(0)), models.When(prioridad='ALTA', then=models.Value(1)), models.When(prioridad='NORMAL', then=models.Value(2)), models.When(prioridad='BAJA', then=models.Value(3)), default=models.Value(2)), output_field=models.PositiveSmallIntegerField(), verbose_name='Rango de prioridad'),
+        ),
+        migrations.AddIndex(
+            model_name='ensayo',
+            index=models.Index(fields=['prioridad_rango', 'fecha_resultados_requerida', 'id'], name='ensayo_prioridad_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ensayo',
+            index=models.Index(fields=['estado_ensayo', 'analista_asignado', 'prioridad_rango', 'fecha_resultados_requerida', 'id'], name='ensayo_worklist_idx'),
+        ),
+    ]
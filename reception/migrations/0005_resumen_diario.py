@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-16 20:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0004_ensayo_prioridad_rango'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('tipo_muestra', models.CharField(choices=[('AGUA', 'Agua'), ('ALIMENTO', 'Alimento'), ('COSMETICO', 'Cosmético'), ('FARMACEUTICO', 'Farmacéutico'), ('QUIMICO', 'Químico'), ('AMBIENTAL', 'Ambiental'), ('OTRO', 'Otro')], max_length=50, verbose_name='Tipo de muestra')),
+                ('estado', models.CharField(choices=[('REGISTRADA', 'Registrada'), ('ACEPTADA', 'Aceptada'), ('EN_ANALISIS', 'En Análisis'), ('ANALIZADA', 'Analizada'), ('COMPLETADA', 'Completada'), ('RECHAZADA', 'Rechazada')], max_length=20, verbose_name='Estado de la muestra')),
+                ('muestras', models.PositiveIntegerField(default=0, verbose_name='Muestras que alcanzaron el estado')),
+                ('segundos_desde_registro', models.BigIntegerField(default=0, verbose_name='Suma de segundos desde el registro')),
+                ('ensayos_finalizados', models.PositiveIntegerField(default=0, verbose_name='Ensayos finalizados')),
+                ('segundos_respuesta_ensayos', models.BigIntegerField(default=0, verbose_name='Suma de segundos desde la solicitud del ensayo')),
+                ('ensayos_fuera_de_plazo', models.PositiveIntegerField(default=0, verbose_name='Ensayos finalizados después de la fecha requerida')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='reception.cliente', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario',
+                'verbose_name_plural': 'Resúmenes diarios',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(fields=('fecha', 'tipo_muestra', 'cliente', 'estado'), name='resumen_diario_unico'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Índice de búsqueda de texto completo (ver reception/busqueda.py)
+#
+# El SQL se copia aquí en lugar de importarlo de busqueda.py: la migración
+# debe crear siempre el mismo esquema, aunque el módulo cambie después.
+
+from django.db import migrations
+
+# (tabla FTS5, tabla del modelo, columnas) por tipo de documento
+FTS = [
+    ('reception_busqueda_muestra', 'reception_muestra', 'codigo_muestra, lote, descripcion_muestra, matriz'),
+    ('reception_busqueda_cliente', 'reception_cliente', 'nombre_empresa, nit, persona_contacto, ciudad'),
+]
+
+PG_CREAR = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # unaccent() no es IMMUTABLE; el envoltorio permite usarlo en índices
+    "CREATE OR REPLACE FUNCTION lims_unaccent(text) RETURNS text "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT public.unaccent('public.unaccent', $1) $$",
+    "CREATE INDEX IF NOT EXISTS cliente_nombre_trgm_idx ON reception_cliente "
+    "USING gin (lims_unaccent(nombre_empresa) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS muestra_busqueda_idx ON reception_muestra "
+    "USING gin (to_tsvector('simple', lims_unaccent(coalesce(codigo_muestra, '') || ' ' || "
+    "coalesce(lote, '') || ' ' || coalesce(descripcion_muestra, '') || ' ' || coalesce(matriz, ''))))",
+    "CREATE INDEX IF NOT EXISTS cliente_busqueda_idx ON reception_cliente "
+    "USING gin (to_tsvector('simple', lims_unaccent(coalesce(nombre_empresa, '') || ' ' || "
+    "coalesce(nit, '') || ' ' || coalesce(persona_contacto, '') || ' ' || coalesce(ciudad, ''))))",
+]
+
+PG_ELIMINAR = [
+    'DROP INDEX IF EXISTS cliente_nombre_trgm_idx',
+    'DROP INDEX IF EXISTS muestra_busqueda_idx',
+    'DROP INDEX IF EXISTS cliente_busqueda_idx',
+]
+
+
+def crear_indices(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor == 'sqlite':
+        for tabla, tabla_modelo, columnas in FTS:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla} USING fts5("
+                f"{columnas}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+            )
+            # Documentos existentes
+            schema_editor.execute(
+                f"INSERT INTO {tabla} (rowid, {columnas}) SELECT id, {columnas} FROM {tabla_modelo}"
+            )
+    elif conexion.vendor == 'postgresql':
+        for sentencia in PG_CREAR:
+            schema_editor.execute(sentencia)
+
+
+def eliminar_indices(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor == 'sqlite':
+        for tabla, tabla_modelo, columnas in FTS:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {tabla}")
+    elif conexion.vendor == 'postgresql':
+        for sentencia in PG_ELIMINAR:
+            schema_editor.execute(sentencia)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0005_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
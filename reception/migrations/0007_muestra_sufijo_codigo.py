@@ -0,0 +1,26 @@
+# Generated by Django 5.0 on 2026-10-16 20:57
+
+from django.db import migrations, models
+from django.db.models.functions import Right
+
+
+def completar_sufijos(apps, schema_editor):
+    # Los códigos existentes tienen el formato LIMS-YYYYMMDD-XXXXXXXX
+    Muestra = apps.get_model('reception', 'Muestra')
+    Muestra.objects.update(sufijo_codigo=Right('codigo_muestra', 8))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0006_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='muestra',
+            name='sufijo_codigo',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='Sufijo del código de muestra'),
+        ),
+        migrations.RunPython(completar_sufijos, migrations.RunPython.noop),
+    ]
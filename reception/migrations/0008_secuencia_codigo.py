@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-16 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0007_muestra_sufijo_codigo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaCodigo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha')),
+                ('ultimo', models.PositiveBigIntegerField(default=0, verbose_name='Último número reservado')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de códigos',
+                'verbose_name_plural': 'Secuencias de códigos',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-16 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0008_secuencia_codigo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ensayo',
+            name='revision',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Aumenta en cada modificación (control de concurrencia)', verbose_name='Revisión'),
+        ),
+        migrations.AddField(
+            model_name='muestra',
+            name='revision',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Aumenta en cada modificación (control de concurrencia)', verbose_name='Revisión'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Los códigos secuenciales (LIMS-YYYYMMDD-NNNNNN) repiten el consecutivo cada
+# día: su sufijo de escaneo pasa a incluir la fecha (ver Muestra.sufijo_de).
+
+from django.db import migrations, models
+from django.db.models.functions import Concat, Right, Substr
+
+CODIGO_SECUENCIAL = r'^LIMS-[0-9]{8}-[0-9]{6}$'
+
+
+def sufijo_con_fecha(apps, schema_editor):
+    Muestra = apps.get_model('reception', 'Muestra')
+    Muestra.objects.filter(codigo_muestra__regex=CODIGO_SECUENCIAL).update(
+        sufijo_codigo=Concat(Substr('codigo_muestra', 6, 8), Right('codigo_muestra', 6),
+                             output_field=models.CharField())
+    )
+
+
+def sufijo_sin_fecha(apps, schema_editor):
+    Muestra = apps.get_model('reception', 'Muestra')
+    Muestra.objects.filter(codigo_muestra__regex=CODIGO_SECUENCIAL).update(
+        sufijo_codigo=Right('codigo_muestra', 6)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reception', '0009_revision'),
+    ]
+
+    operations = [
+        migrations.RunPython(sufijo_con_fecha, sufijo_sin_fecha),
+    ]
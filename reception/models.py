@@ -1,8 +1,34 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
-from django.utils import timezone
-import uuid
+
+from . import codigos
+
+# =============================================================================
+# CONTROL DE CONCURRENCIA
+# =============================================================================
+class ModeloConRevision(models.Model):
+    """
+    Agrega `revision`, que aumenta en cada escritura del objeto. Las acciones
+    de la API la comparan con la que envía el cliente para detectar que otro
+    usuario modificó el objeto entretanto (ver concurrencia.py).
+    """
+    revision = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name="Revisión",
+        help_text="Aumenta en cada modificación (control de concurrencia)"
+    )
+    
+    class Meta:
+        abstract = True
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.revision += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'revision'}
+        super().save(*args, **kwargs)
 
 # =============================================================================
 # NUMERAL 2: INFORMACIÓN DEL CLIENTE
@@ -91,7 +117,7 @@ class Cliente(models.Model):
 # =============================================================================
 # NUMERALES 1, 3, 4: INFORMACIÓN DE LA MUESTRA
 # =============================================================================
-class Muestra(models.Model):
+class Muestra(ModeloConRevision):
     """
     Modelo principal que representa una muestra recibida en el laboratorio.
     Integra toda la información de recepción, trazabilidad y estado.
@@ -106,6 +132,15 @@ class Muestra(models.Model):
         verbose_name="Código único de muestra",
         help_text="Generado automáticamente al crear la muestra"
     )
+    # Última sección del código (lo que imprime la etiqueta corta): permite
+    # resolver el escaneo de solo el sufijo con un índice en lugar de LIKE.
+    sufijo_codigo = models.CharField(
+        max_length=20,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name="Sufijo del código de muestra"
+    )
     fecha_registro = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Fecha y hora de registro automático",
@@ -310,17 +345,41 @@ class Muestra(models.Model):
         verbose_name = "Muestra"
         verbose_name_plural = "Muestras"
         ordering = ['-fecha_registro']
+        # Índices compuestos alineados con los filtros de MuestraViewSet.get_queryset:
+        # columna de igualdad primero y luego (-fecha_registro, -id), para que el
+        # filtro, el orden por defecto y la paginación por cursor se resuelvan con
+        # un solo recorrido del índice.
+        indexes = [
+            models.Index(fields=['-fecha_registro', '-id'], name='muestra_fecha_reg_idx'),
+            models.Index(fields=['estado', '-fecha_registro', '-id'], name='muestra_estado_fecha_idx'),
+            models.Index(fields=['cliente', '-fecha_registro', '-id'], name='muestra_cliente_fecha_idx'),
+            models.Index(fields=['tipo_muestra', '-fecha_registro', '-id'], name='muestra_tipo_fecha_idx'),
+            models.Index(fields=['muestra_aceptada', '-fecha_registro', '-id'],
+                         name='muestra_aceptada_fecha_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         """
         Sobrescribe el método save para generar automáticamente el código de muestra
+        (con reintento si el código generado ya existe, ver codigos.py)
         """
-        if not self.codigo_muestra:
-            # Genera código único: LIMS-YYYYMMDD-UUID
-            fecha_actual = timezone.now().strftime('%Y%m%d')
-            codigo_uuid = str(uuid.uuid4())[:8].upper()
-            self.codigo_muestra = f"LIMS-{fecha_actual}-{codigo_uuid}"
-        super().save(*args, **kwargs)
+        if self.codigo_muestra:
+            self.sufijo_codigo = self.sufijo_de(self.codigo_muestra)
+            super().save(*args, **kwargs)
+        else:
+            codigos.asignar_y_guardar([self], lambda: super(Muestra, self).save(*args, **kwargs))
+    
+    @staticmethod
+    def sufijo_de(codigo):
+        """
+        Sufijo de un código: LIMS-20240115-8D40E079 → 8D40E079. El consecutivo
+        del generador secuencial se repite cada día, así que su sufijo incluye
+        la fecha: LIMS-20240115-000123 → 20240115000123.
+        """
+        partes = codigo.split('-')
+        if len(partes) == 3 and len(partes[2]) == 6 and partes[2].isdigit():
+            return partes[1] + partes[2]
+        return partes[-1]
     
     def __str__(self):
         return f"{self.codigo_muestra} - {self.cliente.nombre_empresa}"
@@ -328,7 +387,7 @@ class Muestra(models.Model):
 # =============================================================================
 # NUMERAL 5: ENSAYOS SOLICITADOS
 # =============================================================================
-class Ensayo(models.Model):
+class Ensayo(ModeloConRevision):
     """
     Representa los análisis o pruebas solicitadas para una muestra.
     Una muestra puede tener múltiples ensayos.
@@ -363,6 +422,21 @@ class Ensayo(models.Model):
         verbose_name="Prioridad del análisis",
         help_text="Gestiona carga de trabajo del laboratorio"
     )
+    # Rango numérico de la prioridad (URGENTE=0 ... BAJA=3) calculado por la
+    # base de datos, para ordenar por urgencia real y no alfabéticamente.
+    # Al ser una columna generada se mantiene también en bulk_create y update().
+    prioridad_rango = models.GeneratedField(
+        expression=models.Case(
+            models.When(prioridad='URGENTE', then=models.Value(0)),
+            models.When(prioridad='ALTA', then=models.Value(1)),
+            models.When(prioridad='NORMAL', then=models.Value(2)),
+            models.When(prioridad='BAJA', then=models.Value(3)),
+            default=models.Value(2),
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+        verbose_name="Rango de prioridad"
+    )
     fecha_resultados_requerida = models.DateField(
         verbose_name="Fecha requerida de resultados",
         help_text="Permite comprometer plazos de entrega realistas"
@@ -415,7 +489,16 @@ class Ensayo(models.Model):
     class Meta:
         verbose_name = "Ensayo"
         verbose_name_plural = "Ensayos"
-        ordering = ['prioridad', 'fecha_resultados_requerida']
+        ordering = ['prioridad_rango', 'fecha_resultados_requerida']
+        indexes = [
+            models.Index(fields=['prioridad_rango', 'fecha_resultados_requerida', 'id'],
+                         name='ensayo_prioridad_fecha_idx'),
+            # Lista de trabajo del analista: igualdad en estado y analista,
+            # luego el orden de atención, sin ordenar en memoria.
+            models.Index(fields=['estado_ensayo', 'analista_asignado', 'prioridad_rango',
+                                 'fecha_resultados_requerida', 'id'],
+                         name='ensayo_worklist_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre_analisis} - {self.muestra.codigo_muestra}"
@@ -460,6 +543,104 @@ class HistorialEstado(models.Model):
         verbose_name = "Historial de Estado"
         verbose_name_plural = "Historial de Estados"
         ordering = ['-fecha_cambio']
+        # Orden de HistorialEstadoViewSet y de su paginación por cursor
+        indexes = [
+            models.Index(fields=['-fecha_cambio', '-id'], name='historial_fecha_idx'),
+            models.Index(fields=['muestra', '-fecha_cambio', '-id'], name='historial_muestra_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.muestra.codigo_muestra}: {self.estado_anterior} → {self.estado_nuevo}"
+
+# =============================================================================
+# RESUMEN DIARIO (tablas de tendencias)
+# =============================================================================
+class ResumenDiario(models.Model):
+    """
+    Acumulado por día × tipo de muestra × cliente × estado, para graficar
+    volúmenes y tiempos de respuesta sin recorrer las tablas de muestras y ensayos.
+    
+    - Muestras: cuántas alcanzaron `estado` ese día y la suma de segundos
+      transcurridos desde su registro (tiempo promedio = suma / muestras).
+    - Ensayos: finalizados ese día cuando la muestra estaba en `estado`,
+      con la suma de segundos desde su creación y cuántos excedieron la
+      fecha requerida.
+    
+    Se actualiza de forma incremental en los puntos de cambio de estado
+    (ver reception/resumen.py) y se reconstruye con
+    `python manage.py reconstruir_resumen_diario`.
+    """
+    fecha = models.DateField(verbose_name="Fecha")
+    tipo_muestra = models.CharField(
+        max_length=50,
+        choices=Muestra.TIPO_MUESTRA_CHOICES,
+        verbose_name="Tipo de muestra"
+    )
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='resumenes_diarios',
+        verbose_name="Cliente"
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=Muestra.ESTADO_CHOICES,
+        verbose_name="Estado de la muestra"
+    )
+    
+    # Muestras
+    muestras = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Muestras que alcanzaron el estado"
+    )
+    segundos_desde_registro = models.BigIntegerField(
+        default=0,
+        verbose_name="Suma de segundos desde el registro"
+    )
+    
+    # Ensayos
+    ensayos_finalizados = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Ensayos finalizados"
+    )
+    segundos_respuesta_ensayos = models.BigIntegerField(
+        default=0,
+        verbose_name="Suma de segundos desde la solicitud del ensayo"
+    )
+    ensayos_fuera_de_plazo = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Ensayos finalizados después de la fecha requerida"
+    )
+    
+    class Meta:
+        verbose_name = "Resumen diario"
+        verbose_name_plural = "Resúmenes diarios"
+        ordering = ['fecha']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'tipo_muestra', 'cliente', 'estado'],
+                name='resumen_diario_unico'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} {self.tipo_muestra} {self.cliente_id} {self.estado}"
+
+# =============================================================================
+# SECUENCIAS DIARIAS DE CÓDIGOS DE MUESTRA
+# =============================================================================
+class SecuenciaCodigo(models.Model):
+    """
+    Último número asignado por día en el modo de códigos 'secuencial'
+    (ver reception/codigos.py). Los números se reservan por bloques, así
+    que puede haber huecos; nunca repeticiones.
+    """
+    fecha = models.DateField(unique=True, verbose_name="Fecha")
+    ultimo = models.PositiveBigIntegerField(default=0, verbose_name="Último número reservado")
+    
+    class Meta:
+        verbose_name = "Secuencia de códigos"
+        verbose_name_plural = "Secuencias de códigos"
+    
+    def __str__(self):
+        return f"{self.fecha}: {self.ultimo}"
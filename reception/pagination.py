@@ -0,0 +1,269 @@
+"""
+Paginación de la API LIMS.
+
+Se ofrecen dos modos seleccionables por petición:
+- Numerada (por defecto): ?page=N, compatible con PageNumberPagination.
+- Cursor (keyset): ?paginacion=cursor. Cada página se obtiene con un WHERE
+  sobre las columnas de orden del ViewSet (atributo `orden_cursor`), por lo que
+  el costo no crece con la profundidad de la página.
+
+El conteo total se controla con ?conteo=exacto|aproximado|no. El modo numerado
+usa 'exacto' por defecto y el modo cursor 'no'.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Máximo de filas que se cuentan en modo 'aproximado' cuando el motor
+# no ofrece un estimado del planificador (SQLite, MySQL).
+LIMITE_CONTEO_APROXIMADO = 10000
+
+MODOS_CONTEO = ('exacto', 'aproximado', 'no')
+
+
+# =============================================================================
+# CONTEO
+# =============================================================================
+def estimar_conteo(queryset):
+    """
+    Estima el número de filas de un queryset sin recorrerlo completo.
+    En PostgreSQL usa el estimado del planificador; en otros motores cuenta
+    como máximo LIMITE_CONTEO_APROXIMADO filas.
+    Retorna (conteo, es_aproximado).
+    """
+    queryset = queryset.order_by()
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+
+    conteo = queryset[:LIMITE_CONTEO_APROXIMADO].count()
+    return conteo, conteo >= LIMITE_CONTEO_APROXIMADO
+
+
+def contar(queryset, modo):
+    """
+    Retorna (conteo, es_aproximado) según el modo solicitado.
+    Con modo 'no' el conteo es None y no se ejecuta ninguna consulta.
+    """
+    if modo == 'no':
+        return None, False
+    if modo == 'aproximado':
+        return estimar_conteo(queryset)
+    return queryset.count(), False
+
+
+def modo_conteo(request, por_defecto):
+    modo = request.query_params.get('conteo', por_defecto)
+    return modo if modo in MODOS_CONTEO else por_defecto
+
+
+# =============================================================================
+# PAGINACIÓN NUMERADA
+# =============================================================================
+class PaginacionNumerada(PageNumberPagination):
+    """
+    PageNumberPagination que permite omitir o aproximar el COUNT(*).
+    Sin conteo exacto se pide una fila extra para saber si hay página siguiente.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.modo_conteo = modo_conteo(request, 'exacto')
+        if self.modo_conteo == 'exacto':
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        try:
+            self.numero_pagina = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            self.numero_pagina = 0
+        if self.numero_pagina < 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params.get(self.page_query_param),
+                message='Número de página inválido.'
+            ))
+
+        self.request = request
+        inicio = (self.numero_pagina - 1) * page_size
+        filas = list(queryset[inicio:inicio + page_size + 1])
+        self.hay_siguiente = len(filas) > page_size
+        self.conteo, self.conteo_aproximado = contar(queryset, self.modo_conteo)
+        return filas[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.modo_conteo == 'exacto':
+            return super().get_paginated_response(data)
+
+        url = self.request.build_absolute_uri()
+        siguiente = None
+        if self.hay_siguiente:
+            siguiente = replace_query_param(url, self.page_query_param, self.numero_pagina + 1)
+        anterior = None
+        if self.numero_pagina > 1:
+            anterior = replace_query_param(url, self.page_query_param, self.numero_pagina - 1)
+            if self.numero_pagina == 2:
+                anterior = remove_query_param(url, self.page_query_param)
+
+        return Response(OrderedDict([
+            ('count', self.conteo),
+            ('count_aproximado', self.conteo_aproximado),
+            ('next', siguiente),
+            ('previous', anterior),
+            ('results', data),
+        ]))
+
+
+# =============================================================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# =============================================================================
+class PaginacionCursor(BasePagination):
+    """
+    Paginación keyset sobre las columnas de `view.orden_cursor`.
+    El cursor codifica los valores de esas columnas en la última (o primera)
+    fila de la página, y la siguiente página se obtiene con una comparación
+    lexicográfica que el índice compuesto correspondiente resuelve directamente.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    display_page_controls = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.orden = list(view.orden_cursor)
+        valores, hacia_atras = self.decodificar_cursor(request)
+
+        orden = [invertir(campo) for campo in self.orden] if hacia_atras else self.orden
+        queryset_pagina = queryset.order_by(*orden)
+        if valores is not None:
+            queryset_pagina = queryset_pagina.filter(condicion_keyset(orden, valores))
+
+        filas = list(queryset_pagina[:self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        filas = filas[:self.page_size]
+
+        if hacia_atras:
+            filas.reverse()
+            self.hay_anterior = hay_mas
+            self.hay_siguiente = True
+        else:
+            self.hay_anterior = valores is not None
+            self.hay_siguiente = hay_mas
+
+        self.cursor_siguiente = self.valores_fila(filas[-1]) if filas and self.hay_siguiente else None
+        self.cursor_anterior = self.valores_fila(filas[0]) if filas and self.hay_anterior else None
+
+        self.conteo, self.conteo_aproximado = contar(queryset, modo_conteo(request, 'no'))
+        return filas
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.conteo),
+            ('count_aproximado', self.conteo_aproximado),
+            ('next', self.construir_enlace(self.cursor_siguiente, hacia_atras=False)),
+            ('previous', self.construir_enlace(self.cursor_anterior, hacia_atras=True)),
+            ('results', data),
+        ]))
+
+    # -------------------------------------------------------------------------
+    # Codificación del cursor
+    # -------------------------------------------------------------------------
+    def valores_fila(self, fila):
+        valores = []
+        for campo in self.orden:
+            valor = getattr(fila, campo.lstrip('-'))
+            valores.append(valor.isoformat() if hasattr(valor, 'isoformat') else valor)
+        return valores
+
+    def construir_enlace(self, valores, hacia_atras):
+        if valores is None:
+            return None
+        contenido = json.dumps({'v': valores, 'a': hacia_atras}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(contenido.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decodificar_cursor(self, request):
+        """
+        Retorna (valores, hacia_atras). Sin cursor retorna (None, False).
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            contenido = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            valores = contenido['v']
+            if len(valores) != len(self.orden):
+                raise ValueError
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+            raise NotFound('Cursor inválido.')
+        return valores, bool(contenido.get('a'))
+
+
+def invertir(campo):
+    return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+
+def condicion_keyset(orden, valores):
+    """
+    Construye la comparación lexicográfica (a, b, c) > (va, vb, vc) respetando
+    la dirección de cada columna:
+        a >= va AND (a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND c > vc))
+    La cota redundante sobre la primera columna permite al motor convertir la
+    condición en un rango del índice en lugar de filtrar fila por fila.
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+        iguales[nombre] = valor
+
+    primero = orden[0].lstrip('-')
+    cota = 'lte' if orden[0].startswith('-') else 'gte'
+    return Q(**{f'{primero}__{cota}': valores[0]}) & condicion
+
+
+# =============================================================================
+# PAGINACIÓN POR DEFECTO DE LA API
+# =============================================================================
+class PaginacionLIMS(BasePagination):
+    """
+    Selecciona el modo de paginación por petición:
+    - ?paginacion=cursor en ViewSets que declaran `orden_cursor`
+    - paginación numerada en cualquier otro caso
+    """
+    parametro_modo = 'paginacion'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (request.query_params.get(self.parametro_modo) == 'cursor'
+                and getattr(view, 'orden_cursor', None)):
+            self.delegado = PaginacionCursor()
+        else:
+            self.delegado = PaginacionNumerada()
+        return self.delegado.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegado.get_paginated_response(data)
+
+    @property
+    def display_page_controls(self):
+        return getattr(getattr(self, 'delegado', None), 'display_page_controls', False)
+
+    def to_html(self):
+        return self.delegado.to_html()
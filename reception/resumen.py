@@ -0,0 +1,208 @@
+"""
+Mantenimiento del resumen diario (modelo ResumenDiario).
+
+Actualización incremental: las vistas llaman a estas funciones dentro de la
+misma transacción que el cambio de estado, de modo que el resumen y los datos
+de origen se confirman o revierten juntos.
+- registrar_muestras()           → muestras registradas (estado REGISTRADA)
+- registrar_cambios_estado()     → cambios de estado de muestras (ver transiciones.py)
+- registrar_ensayos_finalizados() → ensayos completados (ver transiciones.py)
+Las tres reciben lotes y hacen una actualización por fila del resumen
+afectada, no por objeto.
+
+Reconstrucción: reconstruir() recalcula un rango de días desde las tablas de
+origen (Muestra, HistorialEstado, Ensayo) con las mismas reglas. Se usa desde
+`python manage.py reconstruir_resumen_diario`.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Muestra, Ensayo, HistorialEstado, ResumenDiario
+
+MEDIDAS = [
+    'muestras', 'segundos_desde_registro',
+    'ensayos_finalizados', 'segundos_respuesta_ensayos', 'ensayos_fuera_de_plazo',
+]
+
+
+def segundos(duracion):
+    return int(duracion.total_seconds()) if duracion else 0
+
+
+# =============================================================================
+# ACTUALIZACIÓN INCREMENTAL
+# =============================================================================
+def incrementar(fecha, tipo_muestra, cliente_id, estado, **incrementos):
+    """
+    Suma los incrementos a la fila (fecha, tipo, cliente, estado), creándola
+    si no existe. Si otra transacción la crea al mismo tiempo, la restricción
+    única lo detecta y se repite la actualización.
+    """
+    clave = {
+        'fecha': fecha, 'tipo_muestra': tipo_muestra,
+        'cliente_id': cliente_id, 'estado': estado,
+    }
+    cambios = {campo: F(campo) + valor for campo, valor in incrementos.items()}
+    if ResumenDiario.objects.filter(**clave).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            ResumenDiario.objects.create(**clave, **incrementos)
+    except IntegrityError:
+        ResumenDiario.objects.filter(**clave).update(**cambios)
+
+
+def registrar_muestras(muestras):
+    """
+    Cuenta muestras recién registradas (una o un lote de bulk_create).
+    """
+    grupos = Counter(
+        (timezone.localdate(muestra.fecha_registro), muestra.tipo_muestra, muestra.cliente_id)
+        for muestra in muestras
+    )
+    for (fecha, tipo_muestra, cliente_id), cantidad in grupos.items():
+        incrementar(fecha, tipo_muestra, cliente_id, 'REGISTRADA', muestras=cantidad)
+
+
+def registrar_cambios_estado(cambios):
+    """
+    Cuenta la llegada de cada muestra a historial.estado_nuevo, en la fecha
+    del registro de historial (la misma regla que usa la reconstrucción).
+    cambios: [(muestra, historial)].
+    """
+    grupos = defaultdict(lambda: {'muestras': 0, 'segundos_desde_registro': 0})
+    for muestra, historial in cambios:
+        if historial.estado_anterior == historial.estado_nuevo:
+            continue
+        grupo = grupos[(timezone.localdate(historial.fecha_cambio), muestra.tipo_muestra,
+                        muestra.cliente_id, historial.estado_nuevo)]
+        grupo['muestras'] += 1
+        grupo['segundos_desde_registro'] += segundos(historial.fecha_cambio - muestra.fecha_registro)
+    for (fecha, tipo_muestra, cliente_id, estado), incrementos in grupos.items():
+        incrementar(fecha, tipo_muestra, cliente_id, estado, **incrementos)
+
+
+def registrar_ensayos_finalizados(ensayos):
+    """
+    Cuenta ensayos finalizados bajo el estado actual de su muestra
+    (ensayo.muestra debe estar cargada).
+    """
+    grupos = defaultdict(lambda: {'ensayos_finalizados': 0, 'segundos_respuesta_ensayos': 0,
+                                  'ensayos_fuera_de_plazo': 0})
+    for ensayo in ensayos:
+        fecha = timezone.localdate(ensayo.fecha_finalizacion)
+        muestra = ensayo.muestra
+        grupo = grupos[(fecha, muestra.tipo_muestra, muestra.cliente_id, muestra.estado)]
+        grupo['ensayos_finalizados'] += 1
+        grupo['segundos_respuesta_ensayos'] += segundos(ensayo.fecha_finalizacion - ensayo.fecha_creacion)
+        grupo['ensayos_fuera_de_plazo'] += int(fecha > ensayo.fecha_resultados_requerida)
+    for (fecha, tipo_muestra, cliente_id, estado), incrementos in grupos.items():
+        incrementar(fecha, tipo_muestra, cliente_id, estado, **incrementos)
+
+
+# =============================================================================
+# RECONSTRUCCIÓN
+# =============================================================================
+def inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def duracion(fin, inicio):
+    return ExpressionWrapper(F(fin) - F(inicio), output_field=DurationField())
+
+
+def calcular(desde, hasta):
+    """
+    Calcula las filas del resumen para los días [desde, hasta] desde las
+    tablas de origen. Retorna {(fecha, tipo, cliente_id, estado): {medida: valor}}.
+    """
+    rango = (inicio_del_dia(desde), inicio_del_dia(hasta + timedelta(days=1)))
+    filas = defaultdict(lambda: dict.fromkeys(MEDIDAS, 0))
+
+    # Registros: cada muestra entra en REGISTRADA el día de su registro
+    registros = (
+        Muestra.objects
+        .filter(fecha_registro__gte=rango[0], fecha_registro__lt=rango[1])
+        .annotate(dia=TruncDate('fecha_registro'))
+        .values('dia', 'tipo_muestra', 'cliente_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for fila in registros:
+        clave = (fila['dia'], fila['tipo_muestra'], fila['cliente_id'], 'REGISTRADA')
+        filas[clave]['muestras'] += fila['total']
+
+    # Cambios de estado registrados en el historial
+    cambios = (
+        HistorialEstado.objects
+        .filter(fecha_cambio__gte=rango[0], fecha_cambio__lt=rango[1])
+        .exclude(estado_anterior=F('estado_nuevo'))
+        .annotate(dia=TruncDate('fecha_cambio'))
+        .values('dia', 'muestra__tipo_muestra', 'muestra__cliente_id', 'estado_nuevo')
+        .annotate(
+            total=Count('id'),
+            espera=Sum(duracion('fecha_cambio', 'muestra__fecha_registro')),
+        )
+        .order_by()
+    )
+    for fila in cambios:
+        clave = (fila['dia'], fila['muestra__tipo_muestra'], fila['muestra__cliente_id'],
+                 fila['estado_nuevo'])
+        filas[clave]['muestras'] += fila['total']
+        filas[clave]['segundos_desde_registro'] += segundos(fila['espera'])
+
+    # Ensayos finalizados, bajo el estado que tenía la muestra en ese momento
+    # (último cambio del historial anterior a la finalización)
+    estado_en_ese_momento = Coalesce(
+        Subquery(
+            HistorialEstado.objects
+            .filter(muestra=OuterRef('muestra'), fecha_cambio__lte=OuterRef('fecha_finalizacion'))
+            .order_by('-fecha_cambio', '-id')
+            .values('estado_nuevo')[:1]
+        ),
+        Value('REGISTRADA'),
+    )
+    finalizados = (
+        Ensayo.objects
+        .filter(fecha_finalizacion__gte=rango[0], fecha_finalizacion__lt=rango[1])
+        .annotate(dia=TruncDate('fecha_finalizacion'), estado_muestra=estado_en_ese_momento)
+        .values('dia', 'muestra__tipo_muestra', 'muestra__cliente_id', 'estado_muestra')
+        .annotate(
+            total=Count('id'),
+            respuesta=Sum(duracion('fecha_finalizacion', 'fecha_creacion')),
+            fuera_de_plazo=Count('id', filter=Q(dia__gt=F('fecha_resultados_requerida'))),
+        )
+        .order_by()
+    )
+    for fila in finalizados:
+        clave = (fila['dia'], fila['muestra__tipo_muestra'], fila['muestra__cliente_id'],
+                 fila['estado_muestra'])
+        filas[clave]['ensayos_finalizados'] += fila['total']
+        filas[clave]['segundos_respuesta_ensayos'] += segundos(fila['respuesta'])
+        filas[clave]['ensayos_fuera_de_plazo'] += fila['fuera_de_plazo']
+
+    return filas
+
+
+def reconstruir(desde, hasta):
+    """
+    Reemplaza las filas del resumen de los días [desde, hasta] en una
+    transacción. Retorna el número de filas escritas.
+    """
+    filas = calcular(desde, hasta)
+    with transaction.atomic():
+        ResumenDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+        ResumenDiario.objects.bulk_create(
+            [
+                ResumenDiario(fecha=fecha, tipo_muestra=tipo, cliente_id=cliente_id,
+                              estado=estado, **medidas)
+                for (fecha, tipo, cliente_id, estado), medidas in filas.items()
+            ],
+            batch_size=500,
+        )
+    return len(filas)
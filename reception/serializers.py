@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Cliente, Muestra, Ensayo, HistorialEstado
+from .transiciones import MUESTRA, ENSAYO
 from django.utils import timezone
 
 # =============================================================================
@@ -15,6 +16,31 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'first_name', 'last_name', 'email']
         read_only_fields = fields
 
+# =============================================================================
+# CAMPO PARA RELACIONES PRECARGADAS (operaciones por lote)
+# =============================================================================
+class RelacionPrecargadaField(serializers.PrimaryKeyRelatedField):
+    """
+    Resuelve la relación desde el diccionario {pk: objeto} de
+    context[clave_contexto], precargado con una sola consulta, en lugar de
+    hacer una consulta por fila. Sin ese diccionario se comporta como
+    PrimaryKeyRelatedField.
+    """
+    def __init__(self, clave_contexto, **kwargs):
+        self.clave_contexto = clave_contexto
+        super().__init__(**kwargs)
+    
+    def to_internal_value(self, data):
+        objetos = self.context.get(self.clave_contexto)
+        if objetos is None:
+            return super().to_internal_value(data)
+        try:
+            return objetos[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
 # =============================================================================
 # SERIALIZER PARA CLIENTES
 # =============================================================================
@@ -62,9 +88,20 @@ class EnsayoSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Ensayo
-        fields = '__all__'
+        # prioridad_rango es una columna generada de uso interno (orden);
+        # se excluye para no forzar su recarga tras save()/bulk_create().
+        exclude = ['prioridad_rango']
         read_only_fields = ['fecha_creacion', 'fecha_actualizacion']
     
+    def validate_estado_ensayo(self, value):
+        """
+        Un ensayo nuevo empieza en el estado inicial; los cambios posteriores
+        pasan por la máquina de estados (ver transiciones.py).
+        """
+        if self.instance is None and value != ENSAYO.inicial:
+            raise serializers.ValidationError(f"Un ensayo nuevo debe estar en estado {ENSAYO.inicial}.")
+        return value
+    
     def validate_fecha_resultados_requerida(self, value):
         """
         Valida que la fecha requerida no sea en el pasado.
@@ -85,6 +122,65 @@ class EnsayoSimpleSerializer(serializers.ModelSerializer):
         fields = ['id', 'nombre_analisis', 'norma_metodo', 'prioridad',
                   'estado_ensayo', 'fecha_resultados_requerida']
 
+# Versión para la lista de trabajo del analista
+class EnsayoWorklistSerializer(serializers.ModelSerializer):
+    """
+    Ensayo en la lista de trabajo: incluye el código de la muestra para
+    que el analista ubique el recipiente sin una consulta adicional.
+    """
+    codigo_muestra = serializers.CharField(source='muestra.codigo_muestra', read_only=True)
+    
+    class Meta:
+        model = Ensayo
+        fields = ['id', 'muestra', 'codigo_muestra', 'nombre_analisis', 'norma_metodo',
+                  'prioridad', 'estado_ensayo', 'analista_asignado', 'fecha_resultados_requerida']
+
+# Versiones para agregar varios ensayos a una muestra en un solo INSERT
+class EnsayoLoteListSerializer(serializers.ListSerializer):
+    """
+    Valida todas las filas y las inserta con un solo bulk_create.
+    Con context['parcial'] las filas inválidas se descartan y se reportan en
+    `errores_filas`, en lugar de invalidar el lote completo.
+    """
+    def to_internal_value(self, data):
+        if not self.context.get('parcial'):
+            return super().to_internal_value(data)
+        
+        validas = []
+        self.errores_filas = []
+        for numero, fila in enumerate(data, start=1):
+            try:
+                validas.append(self.child.run_validation(fila))
+            except serializers.ValidationError as exc:
+                self.errores_filas.append({
+                    'fila': numero,
+                    'errores': serializers.as_serializer_error(exc)
+                })
+        if not validas:
+            raise serializers.ValidationError(
+                [fila['errores'] for fila in self.errores_filas]
+            )
+        return validas
+    
+    def create(self, validated_data):
+        return Ensayo.objects.bulk_create([Ensayo(**datos) for datos in validated_data])
+
+class EnsayoLoteSerializer(EnsayoSerializer):
+    """
+    Fila de agregar_ensayos. La muestra la asigna la vista y el analista se
+    resuelve desde context['analistas'].
+    """
+    analista_asignado = RelacionPrecargadaField(
+        clave_contexto='analistas',
+        queryset=User.objects.all(),
+        required=False,
+        allow_null=True
+    )
+    
+    class Meta(EnsayoSerializer.Meta):
+        read_only_fields = EnsayoSerializer.Meta.read_only_fields + ['muestra']
+        list_serializer_class = EnsayoLoteListSerializer
+
 # =============================================================================
 # SERIALIZER PARA HISTORIAL DE ESTADOS
 # =============================================================================
@@ -191,6 +287,15 @@ class MuestraCreateSerializer(serializers.ModelSerializer):
                    'fecha_actualizacion', 'muestra_aceptada', 'fecha_aceptacion',
                    'usuario_aceptacion']
     
+    def validate_estado(self, value):
+        """
+        Toda muestra se registra en el estado inicial; los cambios posteriores
+        pasan por la máquina de estados (ver transiciones.py).
+        """
+        if value != MUESTRA.inicial:
+            raise serializers.ValidationError(f"Una muestra nueva debe estar en estado {MUESTRA.inicial}.")
+        return value
+    
     def validate(self, data):
         """
         Validaciones al crear muestra.
@@ -235,6 +340,35 @@ class MuestraListSerializer(serializers.ModelSerializer):
         fields = ['id', 'codigo_muestra', 'cliente_nombre', 'tipo_muestra',
                   'estado', 'fecha_registro', 'fecha_recepcion', 'muestra_aceptada']
 
+# =============================================================================
+# SERIALIZERS PARA REGISTRO MASIVO DE MUESTRAS
+# =============================================================================
+MAXIMO_REGISTRO_MASIVO = 1000
+
+class MuestraRegistroMasivoSerializer(MuestraCreateSerializer):
+    """
+    Valida una fila del registro masivo.
+    Mismas reglas que MuestraCreateSerializer; el usuario de recepción
+    lo asigna la vista a partir del usuario autenticado.
+    """
+    cliente = RelacionPrecargadaField(clave_contexto='clientes', queryset=Cliente.objects.all())
+    
+    class Meta(MuestraCreateSerializer.Meta):
+        exclude = MuestraCreateSerializer.Meta.exclude + ['usuario_recepcion']
+
+class RegistroMasivoSerializer(serializers.Serializer):
+    """
+    Payload del registro masivo de muestras.
+    Con atomico=true cualquier fila inválida cancela todo el lote.
+    """
+    muestras = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1,
+        max_length=MAXIMO_REGISTRO_MASIVO,
+        help_text="Lista de muestras a registrar"
+    )
+    atomico = serializers.BooleanField(required=False, default=False)
+
 # =============================================================================
 # SERIALIZERS PARA ACCIONES ESPECÍFICAS
 # =============================================================================
@@ -265,6 +399,19 @@ class ActualizarEstadoSerializer(serializers.Serializer):
     estado = serializers.ChoiceField(choices=Muestra.ESTADO_CHOICES)
     observaciones = serializers.CharField(required=False, allow_blank=True)
 
+class TransicionMasivaSerializer(serializers.Serializer):
+    """
+    Payload del cambio de estado por lote (ver transiciones.py).
+    """
+    muestras = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAXIMO_REGISTRO_MASIVO,
+        help_text="Ids de las muestras a cambiar de estado"
+    )
+    estado = serializers.ChoiceField(choices=Muestra.ESTADO_CHOICES)
+    observaciones = serializers.CharField(required=False, allow_blank=True, default='')
+
 class AgregarEnsayoSerializer(serializers.Serializer):
     """
     Serializer para agregar ensayos a una muestra existente.
@@ -275,6 +422,11 @@ class AgregarEnsayoSerializer(serializers.Serializer):
         min_length=1,
         help_text="Lista de ensayos a agregar"
     )
+    atomico = serializers.BooleanField(
+        required=False,
+        default=True,
+        help_text="Si es false, se agregan los ensayos válidos y se reportan los inválidos"
+    )
     
     def validate_ensayos(self, value):
         """
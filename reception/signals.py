@@ -0,0 +1,48 @@
+"""
+Señales de la app de recepción.
+
+- Cada escritura en un modelo incrementa su versión en la cache de respuestas,
+  lo que invalida las listas cacheadas que dependen de él (ver cache.py).
+- Las escrituras de muestras y clientes actualizan el índice de búsqueda
+  FTS5 en la misma transacción (ver busqueda.py).
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+
+from . import busqueda
+from .cache import invalidar_modelos
+from .models import Cliente, Muestra, Ensayo, HistorialEstado
+
+# User se incluye porque las listas de ensayos e historial muestran
+# datos del analista y del usuario que hizo el cambio.
+MODELOS_CACHEADOS = (Cliente, Muestra, Ensayo, HistorialEstado, User)
+
+
+def invalidar_respuestas(sender, **kwargs):
+    invalidar_modelos(sender)
+
+
+for modelo in MODELOS_CACHEADOS:
+    post_save.connect(invalidar_respuestas, sender=modelo,
+                      dispatch_uid=f'cache_post_save_{modelo._meta.label_lower}')
+    post_delete.connect(invalidar_respuestas, sender=modelo,
+                        dispatch_uid=f'cache_post_delete_{modelo._meta.label_lower}')
+
+
+def indexar_documento(sender, instance, update_fields=None, **kwargs):
+    tipo = busqueda.tipo_de(sender)
+    # Un save(update_fields=...) que no toca campos indexados no cambia el documento
+    if update_fields is not None and not set(update_fields) & set(busqueda.INDICES[tipo]['campos']):
+        return
+    busqueda.indexar_lote([instance], tipo)
+
+
+def desindexar_documento(sender, instance, **kwargs):
+    busqueda.desindexar(instance, busqueda.tipo_de(sender))
+
+
+for modelo in (Muestra, Cliente):
+    post_save.connect(indexar_documento, sender=modelo,
+                      dispatch_uid=f'busqueda_post_save_{modelo._meta.label_lower}')
+    post_delete.connect(desindexar_documento, sender=modelo,
+                        dispatch_uid=f'busqueda_post_delete_{modelo._meta.label_lower}')
@@ -0,0 +1,346 @@
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from time import time_ns
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from reception import cache, metricas
+from reception.bitacora import ManejadorEnCola
+from reception.management.commands.probar_concurrencia import simultaneas
+from reception.management.commands.verificar_consultas import MUESTRA_NUEVA, crear_datos, formatear
+from reception.models import Cliente, Ensayo, HistorialEstado, Muestra, ResumenDiario
+
+# Cache de respuestas en memoria y sin EXPLAIN de peticiones lentas: el
+# número de consultas no depende de corridas anteriores ni de la máquina
+CONSULTAS_ESTABLES = override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas'},
+        'respuestas': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-respuestas'},
+    },
+    LIMS_CACHE_RESPUESTAS=dict(settings.LIMS_CACHE_RESPUESTAS, HABILITADA=False),
+    LIMS_INSTRUMENTACION=dict(settings.LIMS_INSTRUMENTACION, UMBRAL_LENTO_MS=None, REGISTRAR_PETICIONES=False),
+)
+
+# Volúmenes con los que se repite cada medición: el número de consultas no
+# debe cambiar entre uno y otro
+VOLUMENES = (1, 25)
+
+
+def crear_volumen(filas):
+    """
+    Los datos de verificar_consultas (una muestra con `filas` ensayos y
+    registros de historial) más `filas` muestras de clientes y analistas
+    distintos, cada una con un ensayo, un registro de historial y una fila
+    del resumen diario.
+    """
+    ids = crear_datos(filas)
+    ahora = timezone.now()
+    for i in range(filas):
+        cliente = Cliente.objects.create(
+            nombre_empresa=f'Cliente {i}', nit=f'PRUEBAS-{i}', direccion='N/A', ciudad=f'Ciudad {i}',
+            persona_contacto='N/A', email=f'cliente{i}@lab.com', telefono='0',
+        )
+        analista = User.objects.create_user(f'analista_{i}')
+        muestra = Muestra.objects.create(
+            cliente=cliente, usuario_recepcion=analista, usuario_aceptacion=analista,
+            tipo_muestra='AGUA', matriz='Líquido', descripcion_muestra=f'Muestra {i}',
+            cantidad_enviada=Decimal('10.00'), fecha_envio=ahora - timedelta(days=1),
+            fecha_muestreo=ahora - timedelta(days=2), responsable_muestreo='N/A',
+            medio_entrega='PERSONAL', condiciones_almacenamiento='AMBIENTE',
+        )
+        Ensayo.objects.create(
+            muestra=muestra, nombre_analisis='pH', analista_asignado=analista,
+            fecha_resultados_requerida=ahora.date() + timedelta(days=7),
+        )
+        HistorialEstado.objects.create(
+            muestra=muestra, estado_anterior='REGISTRADA', estado_nuevo='ACEPTADA', usuario=analista,
+        )
+        ResumenDiario.objects.create(
+            fecha=ahora.date(), tipo_muestra='AGUA', cliente=cliente, estado='REGISTRADA', muestras=1,
+        )
+    return ids
+
+
+class ManejadorEnColaTests(SimpleTestCase):
+    def registrar(self, manejador, *registros):
+        logger = logging.getLogger('reception.pruebas.bitacora')
+        logger.addHandler(manejador)
+        logger.propagate = False
+        try:
+            for registro in registros:
+                registro(logger)
+        finally:
+            logger.removeHandler(manejador)
+            manejador.close()
+
+    def leer(self, archivo):
+        return [json.loads(linea) for linea in Path(archivo).read_text(encoding='utf-8').splitlines()]
+
+    def test_excepcion_en_campo_propio(self):
+        def con_excepcion(logger):
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logger.exception('Fallo al procesar %s', 'LIMS-1', extra={'muestra': 7})
+
+        with tempfile.TemporaryDirectory() as directorio:
+            archivo = os.path.join(directorio, 'lims.log')
+            self.registrar(ManejadorEnCola(archivo), con_excepcion)
+            [linea] = self.leer(archivo)
+
+        self.assertEqual(linea['mensaje'], 'Fallo al procesar LIMS-1')
+        self.assertEqual(linea['muestra'], 7)
+        self.assertIn('ZeroDivisionError', linea['excepcion'])
+        self.assertNotIn('Traceback', linea['mensaje'])
+
+    def test_rotacion_externa_reabre_el_archivo(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            archivo = os.path.join(directorio, 'lims.log')
+            manejador = ManejadorEnCola(archivo, rotacion_externa=True)
+
+            def rotar(logger):
+                manejador.detener()
+                os.rename(archivo, archivo + '.1')
+                manejador.iniciar()
+
+            self.registrar(
+                manejador,
+                lambda logger: logger.warning('antes'),
+                rotar,
+                lambda logger: logger.warning('después'),
+            )
+            self.assertEqual([linea['mensaje'] for linea in self.leer(archivo + '.1')], ['antes'])
+            self.assertEqual([linea['mensaje'] for linea in self.leer(archivo)], ['después'])
+
+
+class MetricasDirectorioTests(SimpleTestCase):
+    def escribir(self, directorio, pid, valor):
+        archivo = Path(directorio) / f'{socket.gethostname()}-{pid}-{time_ns()}.json'
+        archivo.write_text(json.dumps({
+            'contadores': [['lims_transiciones_total', [['origen', 'prueba']], valor]],
+            'histogramas': [],
+        }))
+        return archivo
+
+    def total(self):
+        contadores, _ = metricas.valores_combinados()
+        return contadores[('lims_transiciones_total', (('origen', 'prueba'),))]
+
+    def test_pliega_procesos_terminados(self):
+        terminado = subprocess.Popen([sys.executable, '-c', ''])
+        terminado.wait()
+        with tempfile.TemporaryDirectory() as directorio, \
+                override_settings(LIMS_METRICAS=dict(settings.LIMS_METRICAS, DIR=directorio)):
+            vivo = self.escribir(directorio, os.getppid(), 5)
+            muerto = self.escribir(directorio, terminado.pid, 3)
+            self.assertEqual(self.total(), 8)
+            self.assertTrue(vivo.exists())
+            self.assertFalse(muerto.exists())
+
+            # Un segundo proceso terminado se suma al mismo acumulado
+            self.escribir(directorio, terminado.pid, 2)
+            self.assertEqual(self.total(), 10)
+            self.assertEqual(sorted(archivo.name for archivo in Path(directorio).glob('*.json')),
+                             sorted([vivo.name, metricas.ACUMULADO]))
+
+
+class CuerpoNoObjetoTests(TestCase):
+    """
+    Las acciones que bloquean la fila leen "revision" del cuerpo: una lista
+    o un escalar JSON responden 400, no 500.
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('pruebas'))
+
+    def test_patch_con_lista(self):
+        response = self.client.patch('/api/muestras/1/', [1, 2], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.json())
+
+    def test_accion_con_escalar(self):
+        response = self.client.post('/api/ensayos/1/registrar_resultados/', 7, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@CONSULTAS_ESTABLES
+class ConsultasApiTests(TestCase):
+    """
+    Consultas por endpoint de la API: el detalle, las listas y las acciones
+    cargan sus relaciones con select_related/prefetch_related, así que el
+    número no crece con los ensayos, el historial ni las muestras.
+    """
+    # (método, ruta, payload, consultas); marcadores como en verificar_consultas
+    LECTURAS = [
+        ('get', '/api/muestras/', None, 2),
+        ('get', '/api/muestras/{muestra}/', None, 4),
+        ('get', '/api/muestras/{muestra}/ensayos/', None, 2),
+        ('get', '/api/muestras/{muestra}/historial/', None, 2),
+        ('get', '/api/clientes/{cliente}/muestras/', None, 2),
+        ('post', '/api/muestras/{muestra}/validar_suficiencia/', {'cantidad_requerida': '1.00'}, 1),
+        ('get', '/api/ensayos/', None, 2),
+        ('get', '/api/ensayos/{ensayo}/', None, 2),
+        ('get', '/api/historial/', None, 2),
+        ('get', '/api/historial/{historial}/', None, 2),
+    ]
+    # En orden, porque cambian el estado. Incluyen el SAVEPOINT y el RELEASE
+    # de cada transaction.atomic() (la prueba ya corre en una transacción;
+    # entre paréntesis, las consultas sin ellos), el bloqueo de escritura de
+    # SQLite (concurrencia.py), el resumen diario y la sincronización del
+    # índice de búsqueda al guardar una muestra.
+    ESCRITURAS = [
+        ('patch', '/api/muestras/{muestra}/', {'lote': 'LOTE-PRUEBA'}, 14),  # (10)
+        ('post', '/api/muestras/{muestra}/agregar_ensayos/', {'ensayos': [
+            {'nombre_analisis': 'pH', 'fecha_resultados_requerida': '2099-01-01'},
+            {'nombre_analisis': 'Densidad', 'fecha_resultados_requerida': '2099-01-01',
+             'analista_asignado': '{analista}'},
+        ]}, 5),  # (3)
+        ('post', '/api/muestras/{muestra}/aceptar/', {'aceptada': True}, 12),  # (6)
+        ('post', '/api/muestras/{muestra}/actualizar_estado/', {'estado': 'EN_ANALISIS'}, 12),  # (6)
+        ('post', '/api/ensayos/{ensayo}/asignar_analista/', {'analista_id': '{analista}'}, 6),  # (4)
+        # Con la muestra EN_ANALISIS, más la guardia del paso a ANALIZADA
+        ('post', '/api/ensayos/{ensayo}/registrar_resultados/', {'resultados': 'pH 7.0'}, 14),  # (6)
+        ('post', '/api/muestras/', dict(MUESTRA_NUEVA, usuario_recepcion='{analista}'), 13),  # (7)
+    ]
+
+    def verificar(self, peticiones):
+        for filas in VOLUMENES:
+            with transaction.atomic():
+                ids = crear_volumen(filas)
+                self.client = APIClient()
+                self.client.force_authenticate(ids.pop('usuario'))
+                for metodo, ruta, payload, consultas in peticiones:
+                    with self.subTest(ruta=ruta, filas=filas), self.assertNumQueries(consultas):
+                        response = getattr(self.client, metodo)(
+                            formatear(ruta, ids), formatear(payload, ids), format='json'
+                        )
+                    self.assertLess(response.status_code, 300, (ruta, response.content[:200]))
+                transaction.set_rollback(True)
+
+    def test_lecturas(self):
+        self.verificar(self.LECTURAS)
+
+    def test_escrituras(self):
+        self.verificar(self.ESCRITURAS)
+
+
+@CONSULTAS_ESTABLES
+class ListasAdminTests(TestCase):
+    """
+    Cada página de las listas del admin cuesta lo mismo con pocas o muchas
+    filas: sesión y usuario, conteo estimado y la página con sus relaciones
+    en un JOIN (ver admin.py).
+    """
+    # (ruta, consultas)
+    LISTAS = [
+        # Los filtros de Cliente listan los países y ciudades existentes
+        ('/admin/reception/cliente/', 6),
+        ('/admin/reception/muestra/', 4),
+        ('/admin/reception/ensayo/', 4),
+        ('/admin/reception/ensayo/?analista=ninguno', 4),
+        ('/admin/reception/historialestado/', 4),
+        ('/admin/reception/resumendiario/', 4),
+    ]
+
+    def test_consultas_por_pagina(self):
+        for filas in VOLUMENES:
+            with transaction.atomic():
+                ids = crear_volumen(filas)
+                self.client.force_login(ids['usuario'])
+                for ruta, consultas in self.LISTAS:
+                    with self.subTest(ruta=ruta, filas=filas), self.assertNumQueries(consultas):
+                        response = self.client.get(ruta)
+                    self.assertEqual(response.status_code, 200)
+                transaction.set_rollback(True)
+
+
+@CONSULTAS_ESTABLES
+class CacheListasTests(TestCase):
+    """
+    Los contadores de aciertos y fallos son contadores del proceso
+    (metricas.py): la petición no escribe en la cache para contarse.
+    """
+    def setUp(self):
+        cache.backend().clear()
+        cache.reiniciar_estadisticas(['cliente'])
+
+    @override_settings(LIMS_CACHE_RESPUESTAS=dict(settings.LIMS_CACHE_RESPUESTAS, HABILITADA=True))
+    def test_aciertos_y_fallos(self):
+        escrituras = []
+        respuestas = cache.backend()
+        original = respuestas.set
+        respuestas.set = lambda *args, **kwargs: escrituras.append(args[0]) or original(*args, **kwargs)
+        try:
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/clientes/').status_code, 200)
+        finally:
+            del respuestas.set
+        self.assertEqual(cache.estadisticas(['cliente'])['cliente'],
+                         {'aciertos': 2, 'fallos': 1, 'tasa_aciertos': 0.6667})
+        # Solo la respuesta calculada en el fallo
+        self.assertEqual(len([clave for clave in escrituras if ':respuesta:' in clave]), 1)
+        self.assertEqual(len(escrituras), 1)
+
+        self.assertEqual(self.client.post('/api/cache/reiniciar/').status_code, 403)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.post('/api/cache/reiniciar/').status_code, 200)
+        self.assertEqual(cache.estadisticas(['cliente'])['cliente']['fallos'], 0)
+        self.assertIn('lims_cache_respuestas_total{basename="cliente",resultado="acierto"}',
+                      self.client.get('/metrics').content.decode())
+
+
+class RendimientoTests(TestCase):
+    def test_reiniciar_solo_staff(self):
+        self.client.force_login(User.objects.create_user('pruebas'))
+        self.assertEqual(self.client.post('/api/rendimiento/reiniciar/').status_code, 403)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.post('/api/rendimiento/reiniciar/').status_code, 200)
+
+
+@CONSULTAS_ESTABLES
+class ConcurrenciaTests(TransactionTestCase):
+    """
+    Peticiones simultáneas sobre la misma muestra, cada una en su hilo y con
+    su conexión (ver probar_concurrencia): la transición se aplica una vez.
+    """
+    HILOS = 8
+
+    def setUp(self):
+        ids = crear_datos(1)
+        self.usuario = ids['usuario']
+        self.muestra = Muestra.objects.get(pk=ids['muestra'])
+
+    def test_aceptar_simultaneo(self):
+        estados = simultaneas(self.usuario, 'post', f'/api/muestras/{self.muestra.pk}/aceptar/',
+                              [{'aceptada': True}] * self.HILOS)
+        conteo = Counter(estados)
+        self.assertEqual(conteo[200], 1, estados)
+        self.assertEqual(conteo[400] + conteo[409], self.HILOS - 1, estados)
+        self.assertEqual(
+            HistorialEstado.objects.filter(muestra=self.muestra, estado_nuevo='ACEPTADA').count(), 1
+        )
+
+    def test_revision_obsoleta(self):
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+        ruta = f'/api/muestras/{self.muestra.pk}/'
+        revision = self.muestra.revision
+        response = client.patch(ruta, {'lote': 'A', 'revision': revision}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = client.patch(ruta, {'lote': 'B', 'revision': revision}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Muestra.objects.get(pk=self.muestra.pk).lote, 'A')
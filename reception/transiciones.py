@@ -0,0 +1,324 @@
+"""
+Máquinas de estado de Muestra.estado y Ensayo.estado_ensayo (ISO 17025).
+
+Cada máquina se declara como una lista de Transicion(origen, destino, ...) y
+se compila al importar el módulo en un dict {(origen, destino): Transicion}:
+validar un cambio es una búsqueda O(1), sin recorrer reglas. Cada transición
+puede declarar:
+- guardias: funciones (objetos) → {pk: motivo} que reciben el lote completo,
+  de modo que una guardia que consulta la base lo hace una vez por lote.
+- campos: función (usuario, ahora) → {campo: valor} con las columnas que se
+  escriben junto con el estado (p. ej. los datos de aceptación).
+- efectos: funciones (cambios, usuario, observaciones) que se ejecutan en la
+  misma transacción, con cambios = [(objeto, estado_anterior)]. Un efecto
+  que declaran varias transiciones corre una vez con todos sus cambios.
+La máquina tiene además efectos comunes a todas sus transiciones: en Muestra,
+el HistorialEstado de cada cambio, el resumen diario y las métricas.
+
+Las dos formas de aplicar un cambio comparten validación y efectos:
+- maquina.aplicar(objetos, destino, ...) sobre instancias ya cargadas
+  (endpoints de una muestra o un ensayo, formularios del admin).
+- maquina.transicion_masiva(queryset, destino, ...) lee y bloquea las filas
+  (select_for_update, ver concurrencia.py) y las aplica por lote: un UPDATE por bloque de LOTE
+  filas y un bulk_create del historial por bloque.
+
+Cuando todos los ensayos de una muestra en análisis terminan (completados o
+cancelados, con al menos uno completado), la muestra pasa sola a ANALIZADA;
+la condición se calcula con una consulta agregada por lote de ensayos.
+"""
+from collections import Counter, defaultdict, namedtuple
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import metricas, resumen
+from .cache import invalidar_modelos
+from .concurrencia import bloquear_escritura
+from .models import Muestra, Ensayo, HistorialEstado
+
+# Filas por UPDATE / bulk_create / IN (límite de parámetros de SQLite)
+LOTE = 1000
+
+# Ensayos que ya no bloquean el avance de su muestra
+ENSAYOS_TERMINADOS = ('COMPLETADO', 'CANCELADO')
+
+Transicion = namedtuple('Transicion', 'origen destino guardias campos efectos', defaults=((), None, ()))
+
+
+@dataclass
+class ResultadoTransicion:
+    """
+    aplicadas: ids de los objetos que cambiaron de estado.
+    rechazadas: {id: motivo} de los que no cumplían las reglas.
+    """
+    aplicadas: list = field(default_factory=list)
+    rechazadas: dict = field(default_factory=dict)
+
+
+def bloques(objetos):
+    for inicio in range(0, len(objetos), LOTE):
+        yield objetos[inicio:inicio + LOTE]
+
+
+# =============================================================================
+# MÁQUINA DE ESTADOS
+# =============================================================================
+class MaquinaEstados:
+    """
+    Tabla de transiciones precalculada del campo `campo` de `modelo`.
+    `columnas` (y `relacionadas`, para select_related) son lo que
+    transicion_masiva() lee de cada fila para validar y para los efectos.
+    """
+    def __init__(self, modelo, campo, transiciones, columnas, relacionadas=(), efectos=()):
+        self.modelo = modelo
+        self.campo = campo
+        self.columnas = columnas
+        self.relacionadas = relacionadas
+        self.efectos = efectos
+        self.inicial = modelo._meta.get_field(campo).default
+        self.estados = [valor for valor, etiqueta in modelo._meta.get_field(campo).choices]
+
+        self.tabla = {}
+        for transicion in transiciones:
+            for estado in (transicion.origen, transicion.destino):
+                if estado not in self.estados:
+                    raise ImproperlyConfigured(f'{modelo.__name__}.{campo}: estado desconocido {estado}')
+            self.tabla[(transicion.origen, transicion.destino)] = transicion
+        self.destinos = {estado: frozenset() for estado in self.estados}
+        self.origenes = {estado: frozenset() for estado in self.estados}
+        for origen, destino in self.tabla:
+            self.destinos[origen] |= {destino}
+            self.origenes[destino] |= {origen}
+
+    def motivo_rechazo(self, origen, destino):
+        """
+        Motivo por el que la tabla no permite pasar de `origen` a `destino`,
+        o None (las guardias se evalúan aparte, en validar()).
+        """
+        if origen == destino:
+            return f'Ya está en estado {destino}.'
+        if (origen, destino) not in self.tabla:
+            return f'No se permite pasar de {origen} a {destino}.'
+        return None
+
+    def validar(self, objetos, destino):
+        """
+        Separa `objetos` en ({Transicion: [objeto]}, {pk: motivo}): primero
+        la tabla y luego las guardias de cada transición, por bloques.
+        """
+        grupos = defaultdict(list)
+        rechazadas = {}
+        for objeto in objetos:
+            origen = getattr(objeto, self.campo)
+            motivo = self.motivo_rechazo(origen, destino)
+            if motivo:
+                rechazadas[objeto.pk] = motivo
+            else:
+                grupos[self.tabla[(origen, destino)]].append(objeto)
+
+        for transicion, candidatos in grupos.items():
+            for guardia in transicion.guardias:
+                for bloque in bloques(candidatos):
+                    rechazadas.update(guardia(bloque))
+        validas = {
+            transicion: [objeto for objeto in candidatos if objeto.pk not in rechazadas]
+            for transicion, candidatos in grupos.items()
+        }
+        return {transicion: lista for transicion, lista in validas.items() if lista}, rechazadas
+
+    def aplicar(self, objetos, destino, usuario, observaciones='', **campos):
+        """
+        Pasa a `destino` los `objetos` que lo permiten y reporta los demás.
+        `campos` son columnas adicionales que se escriben en el mismo UPDATE
+        (p. ej. los resultados de un ensayo). Los objetos aplicados quedan
+        actualizados en memoria.
+        """
+        resultado = ResultadoTransicion()
+        with transaction.atomic():
+            validas, resultado.rechazadas = self.validar(objetos, destino)
+            if not validas:
+                return resultado
+
+            ahora = timezone.now()
+            cambios = []
+            # {efecto: cambios}, en el orden en que aparecen
+            efectos = {}
+            for transicion, lista in validas.items():
+                # update() no actualiza los campos auto_now
+                valores = {self.campo: destino, 'fecha_actualizacion': ahora, **campos}
+                if transicion.campos:
+                    valores.update(transicion.campos(usuario, ahora))
+                for bloque in bloques(lista):
+                    self.modelo.objects.filter(pk__in=[objeto.pk for objeto in bloque]).update(
+                        revision=F('revision') + 1, **valores
+                    )
+                grupo = []
+                for objeto in lista:
+                    grupo.append((objeto, transicion.origen))
+                    for nombre, valor in valores.items():
+                        setattr(objeto, nombre, valor)
+                    objeto.revision += 1
+                for efecto in transicion.efectos:
+                    efectos.setdefault(efecto, []).extend(grupo)
+                cambios += grupo
+
+            for efecto, grupo in efectos.items():
+                efecto(grupo, usuario, observaciones)
+            for efecto in self.efectos:
+                efecto(cambios, usuario, observaciones)
+            # queryset.update() no emite post_save
+            invalidar_modelos(self.modelo)
+            resultado.aplicadas = [objeto.pk for objeto, anterior in cambios]
+        return resultado
+
+    def transicion_masiva(self, queryset, destino, usuario, observaciones='', bloquear=True, **campos):
+        """
+        Lee y bloquea las filas de `queryset` y les aplica el cambio. Lectura,
+        cambio y efectos se confirman o revierten juntos. Con bloquear=False
+        quien llama ya tomó el bloqueo de escritura en su transacción.
+        `campos` se escriben en el mismo UPDATE, como en aplicar().
+        """
+        with transaction.atomic():
+            if bloquear:
+                bloquear_escritura(self.modelo)
+            # Sin los JOIN del queryset de origen (p. ej. list_select_related del admin)
+            filas = (
+                queryset.select_related(None).select_related(*self.relacionadas)
+                .select_for_update(of=('self',)).only(*self.columnas).order_by('pk')
+            )
+            return self.aplicar(list(filas), destino, usuario, observaciones, **campos)
+
+
+# =============================================================================
+# MUESTRA
+# =============================================================================
+def sin_aceptar(muestras):
+    return {
+        muestra.pk: 'Esta muestra ya fue aceptada previamente.'
+        for muestra in muestras if muestra.muestra_aceptada
+    }
+
+
+def ensayos_terminados(muestras):
+    """
+    Una consulta agregada por lote: ensayos sin terminar y completados de
+    cada muestra.
+    """
+    conteos = {
+        fila['muestra_id']: fila
+        for fila in Ensayo.objects.filter(muestra_id__in=[muestra.pk for muestra in muestras])
+        .order_by().values('muestra_id')
+        .annotate(
+            pendientes=Count('id', filter=~Q(estado_ensayo__in=ENSAYOS_TERMINADOS)),
+            completados=Count('id', filter=Q(estado_ensayo='COMPLETADO')),
+        )
+    }
+    rechazadas = {}
+    for muestra in muestras:
+        fila = conteos.get(muestra.pk)
+        if not fila or not fila['completados']:
+            rechazadas[muestra.pk] = 'La muestra no tiene ensayos completados.'
+        elif fila['pendientes']:
+            rechazadas[muestra.pk] = f'La muestra tiene {fila["pendientes"]} ensayo(s) sin terminar.'
+    return rechazadas
+
+
+def datos_aceptacion(usuario, ahora):
+    return {'muestra_aceptada': True, 'fecha_aceptacion': ahora, 'usuario_aceptacion': usuario}
+
+
+def auditar_muestras(cambios, usuario, observaciones):
+    """
+    Un HistorialEstado por muestra (bulk_create por bloque), resumen diario
+    por grupo y el contador de transiciones por estado anterior.
+    """
+    historial = []
+    for bloque in bloques(cambios):
+        historial += HistorialEstado.objects.bulk_create([
+            HistorialEstado(
+                muestra=muestra,
+                estado_anterior=anterior,
+                estado_nuevo=muestra.estado,
+                usuario=usuario,
+                observaciones=observaciones,
+            )
+            for muestra, anterior in bloque
+        ])
+    resumen.registrar_cambios_estado(zip([muestra for muestra, anterior in cambios], historial))
+    for (anterior, nuevo), cantidad in Counter((anterior, muestra.estado) for muestra, anterior in cambios).items():
+        metricas.contar('lims_transiciones_total', cantidad, estado_anterior=anterior, estado_nuevo=nuevo)
+    invalidar_modelos(HistorialEstado)
+
+
+MUESTRA = MaquinaEstados(
+    Muestra, 'estado',
+    [
+        Transicion('REGISTRADA', 'ACEPTADA', guardias=(sin_aceptar,), campos=datos_aceptacion),
+        Transicion('REGISTRADA', 'RECHAZADA'),
+        Transicion('ACEPTADA', 'EN_ANALISIS'),
+        Transicion('ACEPTADA', 'RECHAZADA'),
+        Transicion('EN_ANALISIS', 'ANALIZADA', guardias=(ensayos_terminados,)),
+        Transicion('EN_ANALISIS', 'RECHAZADA'),
+        Transicion('ANALIZADA', 'COMPLETADA'),
+        # Repetición de ensayos o ensayos agregados después del análisis
+        Transicion('ANALIZADA', 'EN_ANALISIS'),
+    ],
+    columnas=['id', 'codigo_muestra', 'estado', 'revision', 'muestra_aceptada', 'fecha_registro',
+              'tipo_muestra', 'cliente_id'],
+    efectos=(auditar_muestras,),
+)
+
+
+# =============================================================================
+# ENSAYO
+# =============================================================================
+def fecha_inicio(usuario, ahora):
+    return {'fecha_inicio': ahora}
+
+
+def fecha_finalizacion(usuario, ahora):
+    return {'fecha_finalizacion': ahora}
+
+
+def contar_finalizados(cambios, usuario, observaciones):
+    ensayos = [ensayo for ensayo, anterior in cambios]
+    resumen.registrar_ensayos_finalizados(ensayos)
+    for prioridad, cantidad in Counter(ensayo.prioridad for ensayo in ensayos).items():
+        metricas.contar('lims_ensayos_completados_total', cantidad, prioridad=prioridad)
+
+
+def avanzar_muestras(cambios, usuario, observaciones):
+    """
+    Pasa a ANALIZADA las muestras en análisis cuyos ensayos terminaron: la
+    guardia ensayos_terminados descarta las que aún tienen pendientes.
+    """
+    ids = list({ensayo.muestra_id for ensayo, anterior in cambios})
+    for bloque in bloques(ids):
+        MUESTRA.transicion_masiva(
+            Muestra.objects.filter(pk__in=bloque, estado__in=MUESTRA.origenes['ANALIZADA']),
+            'ANALIZADA', usuario, 'Todos los ensayos terminados',
+            # Efecto de una transición de ensayos: la transacción ya escribió
+            bloquear=False,
+        )
+
+
+ENSAYO = MaquinaEstados(
+    Ensayo, 'estado_ensayo',
+    [
+        Transicion('PENDIENTE', 'EN_PROCESO', campos=fecha_inicio),
+        Transicion('PENDIENTE', 'COMPLETADO', campos=fecha_finalizacion,
+                   efectos=(contar_finalizados, avanzar_muestras)),
+        Transicion('PENDIENTE', 'CANCELADO', efectos=(avanzar_muestras,)),
+        Transicion('EN_PROCESO', 'COMPLETADO', campos=fecha_finalizacion,
+                   efectos=(contar_finalizados, avanzar_muestras)),
+        Transicion('EN_PROCESO', 'CANCELADO', efectos=(avanzar_muestras,)),
+        Transicion('CANCELADO', 'PENDIENTE'),
+    ],
+    # El resumen diario cuenta el ensayo bajo el tipo, cliente y estado de su muestra
+    columnas=['id', 'estado_ensayo', 'revision', 'prioridad', 'fecha_creacion', 'fecha_resultados_requerida',
+              'muestra', 'muestra__tipo_muestra', 'muestra__cliente', 'muestra__estado'],
+    relacionadas=('muestra',),
+)
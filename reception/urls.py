@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ClienteViewSet, MuestraViewSet, EnsayoViewSet, HistorialEstadoViewSet
+from .views import (
+    ClienteViewSet, MuestraViewSet, EnsayoViewSet, HistorialEstadoViewSet,
+    EstadisticasViewSet, BusquedaViewSet, CacheViewSet, RendimientoViewSet
+)
 
 # =============================================================================
 # ROUTER - Genera automáticamente las URLs para los ViewSets
@@ -12,6 +15,10 @@ router.register(r'clientes', ClienteViewSet, basename='cliente')
 router.register(r'muestras', MuestraViewSet, basename='muestra')
 router.register(r'ensayos', EnsayoViewSet, basename='ensayo')
 router.register(r'historial', HistorialEstadoViewSet, basename='historial')
+router.register(r'estadisticas', EstadisticasViewSet, basename='estadisticas')
+router.register(r'buscar', BusquedaViewSet, basename='buscar')
+router.register(r'cache', CacheViewSet, basename='cache')
+router.register(r'rendimiento', RendimientoViewSet, basename='rendimiento')
 
 # =============================================================================
 # URLs GENERADAS AUTOMÁTICAMENTE:
@@ -29,6 +36,10 @@ CLIENTES:
 MUESTRAS:
   GET    /api/muestras/                    → Listar todas las muestras
   POST   /api/muestras/                    → Crear nueva muestra
+  POST   /api/muestras/registro_masivo/    → Registrar un lote de muestras
+  POST   /api/muestras/transicion_masiva/  → Cambio de estado por lote
+  GET    /api/muestras/exportar/           → Exportar muestras y ensayos (CSV/NDJSON)
+  GET    /api/muestras/escanear/?codigo=   → Muestra y ensayos por código de barras
   GET    /api/muestras/{id}/               → Ver una muestra específica
   PUT    /api/muestras/{id}/               → Actualizar muestra completa
   PATCH  /api/muestras/{id}/               → Actualizar muestra parcial
@@ -43,6 +54,7 @@ MUESTRAS:
 ENSAYOS:
   GET    /api/ensayos/                     → Listar todos los ensayos
   POST   /api/ensayos/                     → Crear nuevo ensayo
+  GET    /api/ensayos/worklist/            → Próximos ensayos de un analista
   GET    /api/ensayos/{id}/                → Ver un ensayo específico
   PUT    /api/ensayos/{id}/                → Actualizar ensayo completo
   PATCH  /api/ensayos/{id}/                → Actualizar ensayo parcial
@@ -53,6 +65,21 @@ ENSAYOS:
 HISTORIAL:
   GET    /api/historial/                   → Listar todo el historial
   GET    /api/historial/{id}/              → Ver un registro específico
+
+ESTADÍSTICAS:
+  GET    /api/estadisticas/                → Resumen de muestras y ensayos (tablero)
+  GET    /api/estadisticas/tendencias/     → Series diarias/mensuales (resumen diario)
+
+BÚSQUEDA:
+  GET    /api/buscar/?q=texto              → Muestras y clientes por relevancia
+
+CACHE DE LISTAS:
+  GET    /api/cache/                       → Aciertos y fallos por endpoint
+  POST   /api/cache/reiniciar/             → Reiniciar contadores
+
+RENDIMIENTO POR VISTA:
+  GET    /api/rendimiento/                 → Tiempos, SQL y serialización por vista
+  POST   /api/rendimiento/reiniciar/       → Vaciar el histograma
 """
 
 # =============================================================================
@@ -1,23 +1,104 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from collections import Counter
+from datetime import datetime
 from django.db import transaction
 from django.db import models
-from .models import Cliente, Muestra, Ensayo, HistorialEstado
+from django.db.models import Count, F, Max, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from .models import Cliente, Muestra, Ensayo, HistorialEstado, ResumenDiario
+from .cache import RespuestaCacheadaMixin, invalidar_modelos, estadisticas, reiniciar_estadisticas
+from .concurrencia import BloqueoFilaMixin
+from .condicional import RespuestaCondicionalMixin
+from . import busqueda, codigos, exportacion, metricas, resumen, transiciones
+from .instrumentacion import histograma
 from .serializers import (
     ClienteSerializer, ClienteListSerializer,
     MuestraSerializer, MuestraCreateSerializer, MuestraListSerializer,
     EnsayoSerializer, HistorialEstadoSerializer,
-    AceptarMuestraSerializer, ActualizarEstadoSerializer,
-    AgregarEnsayoSerializer, ValidacionSuficienciaSerializer
+    AceptarMuestraSerializer, ActualizarEstadoSerializer, TransicionMasivaSerializer,
+    AgregarEnsayoSerializer, ValidacionSuficienciaSerializer,
+    RegistroMasivoSerializer, MuestraRegistroMasivoSerializer, EnsayoLoteSerializer,
+    EnsayoSimpleSerializer, EnsayoWorklistSerializer
 )
 
+# Columnas que realmente lee MuestraListSerializer (evita traer los TextField)
+MUESTRA_LIST_CAMPOS = [
+    'id', 'codigo_muestra', 'tipo_muestra', 'estado', 'fecha_registro',
+    'fecha_recepcion', 'muestra_aceptada', 'cliente__nombre_empresa',
+]
+
+# Columnas que lee EnsayoWorklistSerializer (lista de trabajo del analista)
+ENSAYO_WORKLIST_CAMPOS = [
+    'id', 'muestra_id', 'muestra__codigo_muestra', 'nombre_analisis', 'norma_metodo',
+    'prioridad', 'estado_ensayo', 'analista_asignado_id', 'fecha_resultados_requerida',
+]
+
+# Límites de la lista de trabajo (?limite=N)
+WORKLIST_LIMITE_DEFECTO = 20
+WORKLIST_LIMITE_MAXIMO = 100
+
+# Columnas que lee EnsayoSimpleSerializer dentro del detalle de una muestra
+ENSAYO_SIMPLE_CAMPOS = [
+    'id', 'muestra_id', 'nombre_analisis', 'norma_metodo', 'prioridad',
+    'estado_ensayo', 'fecha_resultados_requerida',
+]
+
+
+def filtro_fechas(params, campo):
+    """
+    Traduce ?fecha_desde / ?fecha_hasta a un filtro sobre `campo`.
+    Acepta fechas (2024-01-01, medianoche en la zona horaria local) o fechas
+    con hora en ISO 8601; un valor inválido responde 400 en lugar de fallar
+    en la consulta.
+    """
+    filtro = {}
+    for parametro, operador in (('fecha_desde', 'gte'), ('fecha_hasta', 'lte')):
+        valor = params.get(parametro)
+        if not valor:
+            continue
+        try:
+            momento = parse_datetime(valor)
+            if momento is None and (dia := parse_date(valor)) is not None:
+                momento = datetime.combine(dia, datetime.min.time())
+        except ValueError:
+            momento = None
+        if momento is None:
+            raise ValidationError({'error': f'Fecha inválida en {parametro}: {valor}'})
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+        filtro[f'{campo}__{operador}'] = momento
+    return filtro
+
+
+def guardar_con_transicion(serializer, maquina, usuario):
+    """
+    Guarda un PUT/PATCH. Si cambia el estado, el cambio pasa por la máquina
+    de estados (guardias, historial y efectos, ver transiciones.py); si la
+    transición no está permitida responde 400 sin guardar nada.
+    """
+    destino = serializer.validated_data.pop(maquina.campo, None)
+    with transaction.atomic():
+        objeto = serializer.save()
+        if destino is not None and destino != getattr(objeto, maquina.campo):
+            resultado = maquina.aplicar([objeto], destino, usuario, 'Cambio de estado por edición')
+            if resultado.rechazadas:
+                raise ValidationError({maquina.campo: [resultado.rechazadas[objeto.pk]]})
+    return objeto
+
 # =============================================================================
 # VIEWSET PARA CLIENTES (NUMERAL 2)
 # =============================================================================
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(RespuestaCacheadaMixin, RespuestaCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet completo para gestión de clientes.
     Endpoints generados automáticamente:
@@ -29,6 +110,8 @@ class ClienteViewSet(viewsets.ModelViewSet):
     - DELETE /api/clientes/{id}/ → Eliminar cliente
     """
     queryset = Cliente.objects.all()
+    # Modelos cuyas escrituras invalidan la lista cacheada
+    modelos_cache = (Cliente,)
     
     def get_serializer_class(self):
         """
@@ -46,6 +129,8 @@ class ClienteViewSet(viewsets.ModelViewSet):
         - /api/clientes/?tipo_cliente=RECURRENTE
         """
         queryset = Cliente.objects.all()
+        if self.action == 'list':
+            queryset = queryset.only(*ClienteListSerializer.Meta.fields)
         
         # Filtro por activo
         activo = self.request.query_params.get('activo', None)
@@ -74,19 +159,26 @@ class ClienteViewSet(viewsets.ModelViewSet):
         Retorna todas las muestras de un cliente específico.
         """
         cliente = self.get_object()
-        muestras = cliente.muestras.all()
+        muestras = cliente.muestras.select_related('cliente').only(*MUESTRA_LIST_CAMPOS)
         serializer = MuestraListSerializer(muestras, many=True)
         return Response(serializer.data)
 
 # =============================================================================
 # VIEWSET PARA MUESTRAS (NUMERALES 1, 3, 4, 7)
 # =============================================================================
-class MuestraViewSet(viewsets.ModelViewSet):
+class MuestraViewSet(RespuestaCacheadaMixin, RespuestaCondicionalMixin, BloqueoFilaMixin,
+                     viewsets.ModelViewSet):
     """
     ViewSet completo para gestión de muestras.
     Implementa todos los numerales del PDF.
     """
     queryset = Muestra.objects.all()
+    # Acciones que bloquean la muestra y verifican "revision" (ver concurrencia.py)
+    acciones_bloqueo = BloqueoFilaMixin.acciones_bloqueo + ('aceptar', 'actualizar_estado')
+    # Orden estable para la paginación por cursor (?paginacion=cursor)
+    orden_cursor = ('-fecha_registro', '-id')
+    # La lista incluye cliente_nombre
+    modelos_cache = (Muestra, Cliente)
     
     def get_serializer_class(self):
         """
@@ -108,7 +200,7 @@ class MuestraViewSet(viewsets.ModelViewSet):
         - /api/muestras/?fecha_desde=2024-01-01&fecha_hasta=2024-12-31
         - /api/muestras/?aceptada=true
         """
-        queryset = Muestra.objects.select_related('cliente', 'usuario_recepcion').all()
+        queryset = self.queryset_por_accion()
         
         # Filtro por estado
         estado = self.request.query_params.get('estado', None)
@@ -131,26 +223,255 @@ class MuestraViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(muestra_aceptada=aceptada.lower() == 'true')
         
         # Filtro por rango de fechas
-        fecha_desde = self.request.query_params.get('fecha_desde', None)
-        fecha_hasta = self.request.query_params.get('fecha_hasta', None)
-        if fecha_desde:
-            queryset = queryset.filter(fecha_registro__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_registro__lte=fecha_hasta)
+        queryset = queryset.filter(**filtro_fechas(self.request.query_params, 'fecha_registro'))
         
         # Búsqueda por código
         codigo = self.request.query_params.get('codigo', None)
         if codigo:
             queryset = queryset.filter(codigo_muestra__icontains=codigo)
         
-        return queryset.order_by('-fecha_registro')
+        return queryset.order_by(*self.orden_cursor)
+    
+    def anotaciones_detalle(self):
+        """
+        Validadores del detalle (ETag): además de la muestra, el cliente anidado
+        y la última modificación y cantidad de ensayos y registros de historial.
+        """
+        ensayos = Ensayo.objects.filter(muestra=OuterRef('pk')).order_by().values('muestra')
+        historial = HistorialEstado.objects.filter(muestra=OuterRef('pk')).order_by().values('muestra')
+        return {
+            'cliente_fecha': F('cliente__fecha_actualizacion'),
+            'ensayos_fecha': Subquery(ensayos.annotate(v=Max('fecha_actualizacion')).values('v')),
+            'ensayos_total': Subquery(ensayos.annotate(v=Count('pk')).values('v')),
+            'historial_fecha': Subquery(historial.annotate(v=Max('fecha_cambio')).values('v')),
+            'historial_total': Subquery(historial.annotate(v=Count('pk')).values('v')),
+        }
+    
+    def queryset_por_accion(self):
+        """
+        Da forma al queryset según la acción para que cada endpoint se resuelva
+        en un número fijo de consultas, sin importar cuántos ensayos o registros
+        de historial tenga la muestra.
+        """
+        queryset = Muestra.objects.all()
+        
+        if self.action == 'list':
+            return queryset.select_related('cliente').only(*MUESTRA_LIST_CAMPOS)
+        
+        if self.action in ('retrieve', 'update', 'partial_update'):
+            return queryset.select_related(
+                'cliente', 'usuario_recepcion', 'usuario_aceptacion'
+            ).prefetch_related(
+                Prefetch('ensayos', queryset=Ensayo.objects.only(*ENSAYO_SIMPLE_CAMPOS)),
+                Prefetch('historial', queryset=HistorialEstado.objects.select_related('usuario')),
+            )
+        
+        if self.action in ('aceptar', 'actualizar_estado'):
+            # Solo las columnas que la máquina de estados valida y escribe,
+            # sin los textos largos de la muestra
+            return queryset.only(*transiciones.MUESTRA.columnas)
+        
+        # Las acciones personalizadas solo necesitan la fila de la muestra;
+        # sus relaciones se cargan de forma explícita dentro de cada acción.
+        return queryset
     
     def perform_create(self, serializer):
         """
         Se ejecuta al crear una muestra.
         Asigna automáticamente el usuario que registra.
         """
-        serializer.save(usuario_recepcion=self.request.user)
+        with transaction.atomic():
+            muestra = serializer.save(usuario_recepcion=self.request.user)
+            resumen.registrar_muestras([muestra])
+            metricas.contar('lims_muestras_registradas_total', tipo_muestra=muestra.tipo_muestra)
+    
+    def perform_update(self, serializer):
+        """
+        Un cambio de estado por PUT/PATCH pasa por la máquina de estados.
+        DRF invalida la caché de prefetch después de guardar; se recarga la
+        muestra con el queryset de detalle para que la respuesta no haga N+1.
+        """
+        muestra = guardar_con_transicion(serializer, transiciones.MUESTRA, self.request.user)
+        serializer.instance = self.queryset_por_accion().get(pk=muestra.pk)
+    
+    # -------------------------------------------------------------------------
+    # NUMERAL 1: REGISTRO MASIVO DE MUESTRAS
+    # -------------------------------------------------------------------------
+    @action(detail=False, methods=['post'])
+    def registro_masivo(self, request):
+        """
+        Endpoint: POST /api/muestras/registro_masivo/
+        Registra un lote de muestras (ej: entrega de un courier) en una sola petición.
+        Los clientes se cargan en una consulta, los códigos se generan de una vez
+        y las muestras válidas se insertan con bulk_create en una transacción.
+        Payload:
+        {
+            "atomico": false,
+            "muestras": [
+                {"cliente": 1, "tipo_muestra": "AGUA", ...},
+                {"cliente": 2, "tipo_muestra": "ALIMENTO", ...}
+            ]
+        }
+        Con "atomico": true, cualquier fila inválida cancela todo el lote.
+        """
+        serializer = RegistroMasivoSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        filas = serializer.validated_data['muestras']
+        atomico = serializer.validated_data['atomico']
+        
+        # Precargar todos los clientes referenciados con una sola consulta
+        ids_cliente = set()
+        for fila in filas:
+            try:
+                ids_cliente.add(int(fila.get('cliente')))
+            except (TypeError, ValueError):
+                pass
+        contexto = {
+            'request': request,
+            'clientes': Cliente.objects.in_bulk(ids_cliente),
+        }
+        
+        # Un único serializer valida todas las filas: los campos se construyen
+        # una sola vez, como hace ListSerializer, pero los errores se recogen por fila.
+        fila_serializer = MuestraRegistroMasivoSerializer(context=contexto)
+        validas = []
+        errores = []
+        for numero, fila in enumerate(filas, start=1):
+            try:
+                validas.append((numero, fila_serializer.run_validation(fila)))
+            except ValidationError as exc:
+                errores.append({'fila': numero, 'errores': as_serializer_error(exc)})
+        
+        if errores and (atomico or not validas):
+            return Response({
+                'error': 'Ninguna muestra fue registrada.',
+                'errores': errores
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        muestras = [
+            Muestra(usuario_recepcion=request.user, **datos)
+            for numero, datos in validas
+        ]
+        with transaction.atomic():
+            # Los códigos del lote se reservan de una vez (ver codigos.py)
+            codigos.asignar_y_guardar(muestras, lambda: Muestra.objects.bulk_create(muestras))
+            resumen.registrar_muestras(muestras)
+            for tipo_muestra, cantidad in Counter(muestra.tipo_muestra for muestra in muestras).items():
+                metricas.contar('lims_muestras_registradas_total', cantidad, tipo_muestra=tipo_muestra)
+            # bulk_create no emite post_save: índice de búsqueda y cache a mano
+            busqueda.indexar_lote(muestras, 'muestra')
+            invalidar_modelos(Muestra)
+        
+        return Response({
+            'mensaje': f'{len(muestras)} muestra(s) registrada(s) exitosamente',
+            'muestras': [
+                {'fila': numero, 'id': muestra.id, 'codigo_muestra': muestra.codigo_muestra}
+                for (numero, datos), muestra in zip(validas, muestras)
+            ],
+            'errores': errores
+        }, status=status.HTTP_201_CREATED)
+    
+    # -------------------------------------------------------------------------
+    # EXPORTACIÓN PARA AUDITORÍA
+    # -------------------------------------------------------------------------
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Endpoint: GET /api/muestras/exportar/?formato=csv|ndjson
+        Exporta las muestras con sus ensayos, aplicando los mismos filtros que
+        la lista (estado, cliente, fecha_desde, fecha_hasta, ...).
+        La respuesta se transmite por bloques: la memoria no crece con el
+        número de filas y la descarga empieza de inmediato.
+        Ejemplos:
+        - /api/muestras/exportar/?formato=csv&fecha_desde=2024-01-01&fecha_hasta=2024-12-31
+        - /api/muestras/exportar/?formato=ndjson&cliente=3
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in exportacion.FORMATOS:
+            return Response(
+                {'error': f'Formato inválido. Opciones: {", ".join(exportacion.FORMATOS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        response = StreamingHttpResponse(
+            exportacion.GENERADORES[formato](self.get_queryset()),
+            content_type=exportacion.FORMATOS[formato]
+        )
+        nombre = f'muestras_{timezone.now():%Y%m%d_%H%M%S}.{formato}'
+        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return response
+    
+    # -------------------------------------------------------------------------
+    # ESCANEO DE CÓDIGO DE BARRAS
+    # -------------------------------------------------------------------------
+    @action(detail=False, methods=['get'])
+    def escanear(self, request):
+        """
+        Endpoint: GET /api/muestras/escanear/?codigo=LIMS-20240115-8D40E079
+        Resuelve el código leído por el escáner de recepción: el código completo
+        (índice único de codigo_muestra) o solo su sufijo, p. ej. ?codigo=8D40E079
+        (índice de sufijo_codigo). Retorna la muestra con sus ensayos en una sola
+        consulta, con costo constante sin importar el tamaño de la tabla.
+        Si el sufijo corresponde a varias muestras responde 409 con los códigos.
+        """
+        codigo = request.query_params.get('codigo', '').strip().upper()
+        if not codigo:
+            return Response(
+                {'error': 'Debe proporcionar el parámetro codigo'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if '-' in codigo:
+            filtro = {'codigo_muestra': codigo}
+        else:
+            filtro = {'sufijo_codigo': codigo}
+        
+        # LEFT JOIN con ensayos: una fila por ensayo (o una sola fila con
+        # columnas nulas si la muestra no tiene ensayos)
+        campos_muestra = [campo for campo in MUESTRA_LIST_CAMPOS if campo != 'cliente__nombre_empresa']
+        campos_ensayo = EnsayoSimpleSerializer.Meta.fields
+        filas = (
+            Muestra.objects
+            .filter(**filtro)
+            .order_by('-fecha_registro', 'ensayos__prioridad_rango',
+                      'ensayos__fecha_resultados_requerida', 'ensayos__id')
+            .values_list(
+                *campos_muestra, 'cliente__nombre_empresa',
+                *[f'ensayos__{campo}' for campo in campos_ensayo]
+            )
+        )
+        
+        muestras = {}
+        for fila in filas:
+            datos_muestra = fila[:len(campos_muestra)]
+            muestra = muestras.get(datos_muestra[0])
+            if muestra is None:
+                muestra = Muestra(**dict(zip(campos_muestra, datos_muestra)))
+                muestra.cliente = Cliente(nombre_empresa=fila[len(campos_muestra)])
+                muestra.ensayos_escaneo = []
+                muestras[muestra.id] = muestra
+            datos_ensayo = fila[len(campos_muestra) + 1:]
+            if datos_ensayo[0] is not None:
+                muestra.ensayos_escaneo.append(Ensayo(**dict(zip(campos_ensayo, datos_ensayo))))
+        
+        if not muestras:
+            return Response(
+                {'error': f'No existe una muestra con el código {codigo}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if len(muestras) > 1:
+            return Response({
+                'error': 'El sufijo corresponde a varias muestras; escanee el código completo.',
+                'coincidencias': [muestra.codigo_muestra for muestra in muestras.values()]
+            }, status=status.HTTP_409_CONFLICT)
+        
+        muestra = next(iter(muestras.values()))
+        datos = MuestraListSerializer(muestra).data
+        datos['ensayos'] = EnsayoSimpleSerializer(muestra.ensayos_escaneo, many=True).data
+        return Response(datos)
     
     # -------------------------------------------------------------------------
     # NUMERAL 7: ACEPTACIÓN DE MUESTRA
@@ -163,47 +484,37 @@ class MuestraViewSet(viewsets.ModelViewSet):
         Payload:
         {
             "aceptada": true,
-            "observaciones": "Muestra en condiciones óptimas"
+            "observaciones": "Muestra en condiciones óptimas",
+            "revision": 3
         }
+        "revision" (opcional) es la que el cliente leyó: si la muestra cambió
+        entretanto responde 409.
         """
-        muestra = self.get_object()
         serializer = AceptarMuestraSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if serializer.is_valid():
-            if muestra.muestra_aceptada:
-                return Response(
-                    {'error': 'Esta muestra ya fue aceptada previamente.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Usar transacción para garantizar atomicidad
-            with transaction.atomic():
-                estado_anterior = muestra.estado
-                
-                # Actualizar muestra
-                muestra.muestra_aceptada = True
-                muestra.fecha_aceptacion = timezone.now()
-                muestra.usuario_aceptacion = request.user
-                muestra.estado = 'ACEPTADA'
-                muestra.save()
-                
-                # Crear registro en historial
-                HistorialEstado.objects.create(
-                    muestra=muestra,
-                    estado_anterior=estado_anterior,
-                    estado_nuevo='ACEPTADA',
-                    usuario=request.user,
-                    observaciones=serializer.validated_data.get('observaciones',
-                                                                'Muestra aceptada formalmente')
-                )
-            
-            return Response({
-                'mensaje': 'Muestra aceptada exitosamente',
-                'codigo_muestra': muestra.codigo_muestra,
-                'fecha_aceptacion': muestra.fecha_aceptacion
-            })
+        # Con la muestra bloqueada, dos aceptaciones simultáneas se ejecutan en
+        # orden y la segunda ve la muestra ya aceptada.
+        with transaction.atomic():
+            muestra = self.get_object()
+            # La transición registra los datos de aceptación y el historial
+            resultado = transiciones.MUESTRA.aplicar(
+                [muestra], 'ACEPTADA', request.user,
+                serializer.validated_data.get('observaciones', 'Muestra aceptada formalmente')
+            )
+        if resultado.rechazadas:
+            return Response(
+                {'error': resultado.rechazadas[muestra.pk]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'mensaje': 'Muestra aceptada exitosamente',
+            'codigo_muestra': muestra.codigo_muestra,
+            'fecha_aceptacion': muestra.fecha_aceptacion,
+            'revision': muestra.revision
+        })
     
     # -------------------------------------------------------------------------
     # NUMERAL 7: ACTUALIZACIÓN DE ESTADO CON HISTORIAL
@@ -212,48 +523,85 @@ class MuestraViewSet(viewsets.ModelViewSet):
     def actualizar_estado(self, request, pk=None):
         """
         Endpoint personalizado: POST /api/muestras/{id}/actualizar_estado/
-        Cambia el estado de una muestra y registra en historial.
+        Cambia el estado de una muestra y registra en historial. Solo se
+        permiten las transiciones de transiciones.MUESTRA.
         Payload:
         {
             "estado": "EN_ANALISIS",
-            "observaciones": "Iniciando análisis de pH"
+            "observaciones": "Iniciando análisis de pH",
+            "revision": 4
         }
+        "revision" (opcional): ver aceptar.
         """
-        muestra = self.get_object()
         serializer = ActualizarEstadoSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if serializer.is_valid():
-            with transaction.atomic():
-                estado_anterior = muestra.estado
-                nuevo_estado = serializer.validated_data['estado']
-                
-                # Validar transición de estado
-                if nuevo_estado == 'ACEPTADA' and not muestra.muestra_aceptada:
-                    return Response(
-                        {'error': 'Use el endpoint /aceptar/ para aceptar muestras.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Actualizar estado
-                muestra.estado = nuevo_estado
-                muestra.save()
-                
-                # Registrar en historial
-                HistorialEstado.objects.create(
-                    muestra=muestra,
-                    estado_anterior=estado_anterior,
-                    estado_nuevo=nuevo_estado,
-                    usuario=request.user,
-                    observaciones=serializer.validated_data.get('observaciones', '')
-                )
-            
-            return Response({
-                'mensaje': 'Estado actualizado exitosamente',
-                'estado_anterior': estado_anterior,
-                'estado_nuevo': nuevo_estado
-            })
+        nuevo_estado = serializer.validated_data['estado']
+        if nuevo_estado == 'ACEPTADA':
+            return Response(
+                {'error': 'Use el endpoint /aceptar/ para aceptar muestras.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            muestra = self.get_object()
+            estado_anterior = muestra.estado
+            resultado = transiciones.MUESTRA.aplicar(
+                [muestra], nuevo_estado, request.user,
+                serializer.validated_data.get('observaciones', '')
+            )
+        if resultado.rechazadas:
+            return Response(
+                {'error': resultado.rechazadas[muestra.pk]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'mensaje': 'Estado actualizado exitosamente',
+            'estado_anterior': estado_anterior,
+            'estado_nuevo': nuevo_estado,
+            'revision': muestra.revision
+        })
+    
+    @action(detail=False, methods=['post'])
+    def transicion_masiva(self, request):
+        """
+        Endpoint: POST /api/muestras/transicion_masiva/
+        Aplica el mismo cambio de estado a un lote de muestras, con un registro
+        de historial por muestra (ver transiciones.py).
+        Payload:
+        {
+            "muestras": [12, 13, 14],
+            "estado": "EN_ANALISIS",
+            "observaciones": "Inicio de corrida"
+        }
+        Las muestras que no existen o no admiten el cambio se reportan en
+        "rechazadas"; las demás se actualizan igualmente.
+        """
+        serializer = TransicionMasivaSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        ids = list(dict.fromkeys(serializer.validated_data['muestras']))
+        resultado = transiciones.MUESTRA.transicion_masiva(
+            Muestra.objects.filter(pk__in=ids),
+            serializer.validated_data['estado'],
+            request.user,
+            serializer.validated_data['observaciones'],
+        )
+        aplicadas = set(resultado.aplicadas)
+        rechazadas = [
+            {'id': pk, 'error': resultado.rechazadas.get(pk, 'La muestra no existe.')}
+            for pk in ids if pk not in aplicadas
+        ]
+        
+        return Response({
+            'mensaje': f'{len(aplicadas)} muestra(s) actualizada(s) a {serializer.validated_data["estado"]}',
+            'aplicadas': resultado.aplicadas,
+            'rechazadas': rechazadas
+        }, status=status.HTTP_200_OK if aplicadas else status.HTTP_400_BAD_REQUEST)
     
     # -------------------------------------------------------------------------
     # NUMERAL 5: ENSAYOS
@@ -265,7 +613,7 @@ class MuestraViewSet(viewsets.ModelViewSet):
         Retorna todos los ensayos de una muestra.
         """
         muestra = self.get_object()
-        ensayos = muestra.ensayos.all()
+        ensayos = muestra.ensayos.select_related('analista_asignado')
         serializer = EnsayoSerializer(ensayos, many=True)
         return Response(serializer.data)
     
@@ -288,30 +636,56 @@ class MuestraViewSet(viewsets.ModelViewSet):
                     "prioridad": "NORMAL",
                     "fecha_resultados_requerida": "2024-03-05"
                 }
-            ]
+            ],
+            "atomico": true
         }
+        Con "atomico": false se agregan los ensayos válidos y los inválidos
+        se reportan por número de fila en "errores".
         """
         muestra = self.get_object()
         serializer = AgregarEnsayoSerializer(data=request.data)
         
         if serializer.is_valid():
-            ensayos_creados = []
+            filas = serializer.validated_data['ensayos']
+            atomico = serializer.validated_data['atomico']
+            
+            # Precargar los analistas referenciados con una sola consulta
+            ids_analista = set()
+            for fila in filas:
+                try:
+                    ids_analista.add(int(fila['analista_asignado']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            contexto = {
+                'request': request,
+                'analistas': User.objects.in_bulk(ids_analista),
+                'parcial': not atomico,
+            }
+            
+            # Validar todo el lote y luego insertarlo con un solo bulk_create
+            ensayos_serializer = EnsayoLoteSerializer(data=filas, many=True, context=contexto)
+            if not ensayos_serializer.is_valid():
+                return Response({
+                    'error': 'Ningún ensayo fue agregado.',
+                    'errores': [
+                        {'fila': numero, 'errores': errores}
+                        for numero, errores in enumerate(ensayos_serializer.errors, start=1)
+                        if errores
+                    ]
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
             with transaction.atomic():
-                for ensayo_data in serializer.validated_data['ensayos']:
-                    ensayo_data['muestra'] = muestra.id
-                    ensayo_serializer = EnsayoSerializer(data=ensayo_data)
-                    if ensayo_serializer.is_valid():
-                        ensayo = ensayo_serializer.save()
-                        ensayos_creados.append(ensayo)
-                    else:
-                        return Response(
-                            {'error': f'Error en ensayo: {ensayo_serializer.errors}'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
+                ensayos_serializer.save(muestra=muestra)
+                # bulk_create no emite post_save
+                invalidar_modelos(Ensayo)
+                for prioridad, cantidad in Counter(e.prioridad for e in ensayos_serializer.instance).items():
+                    metricas.contar('lims_ensayos_agregados_total', cantidad, prioridad=prioridad)
             
+            # La respuesta se construye con los objetos en memoria (sin re-consultar)
             return Response({
-                'mensaje': f'{len(ensayos_creados)} ensayo(s) agregado(s) exitosamente',
-                'ensayos': EnsayoSerializer(ensayos_creados, many=True).data
+                'mensaje': f'{len(ensayos_serializer.instance)} ensayo(s) agregado(s) exitosamente',
+                'ensayos': ensayos_serializer.data,
+                'errores': getattr(ensayos_serializer, 'errores_filas', [])
             })
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -363,19 +737,32 @@ class MuestraViewSet(viewsets.ModelViewSet):
         Retorna todo el historial de cambios de estado de una muestra.
         """
         muestra = self.get_object()
-        historial = muestra.historial.all()
+        historial = muestra.historial.select_related('usuario')
         serializer = HistorialEstadoSerializer(historial, many=True)
         return Response(serializer.data)
 
 # =============================================================================
 # VIEWSET PARA ENSAYOS (NUMERAL 5)
 # =============================================================================
-class EnsayoViewSet(viewsets.ModelViewSet):
+class EnsayoViewSet(RespuestaCacheadaMixin, RespuestaCondicionalMixin, BloqueoFilaMixin,
+                    viewsets.ModelViewSet):
     """
     ViewSet para gestión de ensayos individuales.
     """
     queryset = Ensayo.objects.all()
+    # Acciones que bloquean el ensayo y verifican "revision" (ver concurrencia.py)
+    acciones_bloqueo = BloqueoFilaMixin.acciones_bloqueo + ('asignar_analista', 'registrar_resultados')
     serializer_class = EnsayoSerializer
+    # prioridad_rango ordena URGENTE → ALTA → NORMAL → BAJA (no alfabéticamente)
+    orden_cursor = ('prioridad_rango', 'fecha_resultados_requerida', 'id')
+    # La lista incluye analista_asignado_info
+    modelos_cache = (Ensayo, User)
+    
+    def perform_update(self, serializer):
+        """
+        Un cambio de estado por PUT/PATCH pasa por la máquina de estados.
+        """
+        guardar_con_transicion(serializer, transiciones.ENSAYO, self.request.user)
     
     def get_queryset(self):
         """
@@ -385,7 +772,18 @@ class EnsayoViewSet(viewsets.ModelViewSet):
         - /api/ensayos/?prioridad=URGENTE
         - /api/ensayos/?muestra=1
         """
-        queryset = Ensayo.objects.select_related('muestra', 'analista_asignado').all()
+        if self.action == 'worklist':
+            return self.queryset_worklist()
+        if self.action == 'asignar_analista':
+            # Solo lo que la acción verifica y escribe (ver asignar_analista)
+            return Ensayo.objects.only('id', 'revision', 'analista_asignado')
+        
+        # EnsayoSerializer expone 'muestra' como PK (usa muestra_id, sin JOIN);
+        # solo el analista se expande en analista_asignado_info.
+        queryset = Ensayo.objects.select_related('analista_asignado').all()
+        if self.action == 'registrar_resultados':
+            # El resumen diario necesita el tipo, cliente y estado de la muestra
+            queryset = queryset.select_related('muestra')
         
         # Filtro por estado
         estado = self.request.query_params.get('estado_ensayo', None)
@@ -407,7 +805,61 @@ class EnsayoViewSet(viewsets.ModelViewSet):
         if analista:
             queryset = queryset.filter(analista_asignado_id=analista)
         
-        return queryset.order_by('prioridad', 'fecha_resultados_requerida')
+        return queryset.order_by(*self.orden_cursor)
+    
+    def queryset_worklist(self):
+        """
+        Queryset de la lista de trabajo: igualdad en estado_ensayo y analista,
+        ordenado por (prioridad_rango, fecha_resultados_requerida, id), que es
+        exactamente el orden del índice ensayo_worklist_idx.
+        """
+        params = self.request.query_params
+        
+        analista = params.get('analista')
+        if analista == 'ninguno':
+            filtro_analista = {'analista_asignado__isnull': True}
+        elif analista:
+            filtro_analista = {'analista_asignado_id': analista}
+        elif self.request.user.is_authenticated:
+            filtro_analista = {'analista_asignado_id': self.request.user.id}
+        else:
+            raise ValidationError({'error': 'Debe proporcionar el parámetro analista'})
+        
+        estado = params.get('estado_ensayo', 'PENDIENTE')
+        if estado not in dict(Ensayo.ESTADO_ENSAYO_CHOICES):
+            raise ValidationError({'error': f'Estado de ensayo inválido: {estado}'})
+        
+        return (
+            Ensayo.objects
+            .filter(estado_ensayo=estado, **filtro_analista)
+            .select_related('muestra')
+            .only(*ENSAYO_WORKLIST_CAMPOS)
+            .order_by(*self.orden_cursor)
+        )
+    
+    @action(detail=False, methods=['get'])
+    def worklist(self, request):
+        """
+        Endpoint: GET /api/ensayos/worklist/
+        Retorna los próximos N ensayos que debe atender un analista, en orden de
+        prioridad real (URGENTE primero) y luego por fecha requerida.
+        La consulta recorre el índice ensayo_worklist_idx en orden y se detiene
+        al llegar a N filas, sin ordenar en memoria.
+        Ejemplos:
+        - /api/ensayos/worklist/                        → analista autenticado, PENDIENTE
+        - /api/ensayos/worklist/?analista=2&limite=10
+        - /api/ensayos/worklist/?analista=ninguno       → ensayos sin asignar
+        - /api/ensayos/worklist/?estado_ensayo=EN_PROCESO
+        """
+        try:
+            limite = int(request.query_params.get('limite', WORKLIST_LIMITE_DEFECTO))
+        except ValueError:
+            limite = WORKLIST_LIMITE_DEFECTO
+        limite = max(1, min(limite, WORKLIST_LIMITE_MAXIMO))
+        
+        ensayos = self.get_queryset()[:limite]
+        serializer = EnsayoWorklistSerializer(ensayos, many=True)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def asignar_analista(self, request, pk=None):
@@ -416,10 +868,12 @@ class EnsayoViewSet(viewsets.ModelViewSet):
         Asigna un analista a un ensayo.
         Payload:
         {
-            "analista_id": 2
+            "analista_id": 2,
+            "revision": 1
         }
+        "revision" (opcional) es la que el cliente leyó: si el ensayo cambió
+        entretanto responde 409.
         """
-        ensayo = self.get_object()
         analista_id = request.data.get('analista_id')
         
         if not analista_id:
@@ -428,21 +882,26 @@ class EnsayoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            from django.contrib.auth.models import User
-            analista = User.objects.get(id=analista_id)
-            ensayo.analista_asignado = analista
-            ensayo.save()
-            
-            return Response({
-                'mensaje': 'Analista asignado exitosamente',
-                'analista': analista.username
-            })
-        except User.DoesNotExist:
-            return Response(
-                {'error': 'Analista no encontrado'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        with transaction.atomic():
+            ensayo = self.get_object()
+            # Solo el username para la respuesta; la FK se asigna por id sin
+            # cargar el usuario completo
+            username = User.objects.filter(id=analista_id).values_list('username', flat=True).first()
+            if username is None:
+                return Response(
+                    {'error': 'Analista no encontrado'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            ensayo.analista_asignado_id = analista_id
+            # UPDATE de las columnas que cambian, sin reescribir resultados ni observaciones
+            ensayo.save(update_fields=['analista_asignado', 'fecha_actualizacion'])
+        metricas.contar('lims_ensayos_asignados_total')
+        
+        return Response({
+            'mensaje': 'Analista asignado exitosamente',
+            'analista': username,
+            'revision': ensayo.revision
+        })
     
     @action(detail=True, methods=['post'])
     def registrar_resultados(self, request, pk=None):
@@ -452,10 +911,11 @@ class EnsayoViewSet(viewsets.ModelViewSet):
         Payload:
         {
             "resultados": "pH: 7.2, Viscosidad: 1500 cPs",
-            "observaciones": "Ensayo realizado según USP <791>"
+            "observaciones": "Ensayo realizado según USP <791>",
+            "revision": 2
         }
+        "revision" (opcional): ver asignar_analista.
         """
-        ensayo = self.get_object()
         resultados = request.data.get('resultados')
         observaciones = request.data.get('observaciones', '')
         
@@ -465,11 +925,32 @@ class EnsayoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        ensayo.resultados = resultados
-        ensayo.observaciones_ensayo = observaciones
-        ensayo.estado_ensayo = 'COMPLETADO'
-        ensayo.fecha_finalizacion = timezone.now()
-        ensayo.save()
+        # Con el ensayo bloqueado, dos registros simultáneos no lo cuentan dos
+        # veces: el segundo lo encuentra COMPLETADO y es una corrección.
+        with transaction.atomic():
+            ensayo = self.get_object()
+            if ensayo.estado_ensayo == 'COMPLETADO':
+                # Una corrección de resultados no es un cambio de estado ni vuelve a
+                # contar el ensayo en el resumen diario (reconstruir_resumen_diario
+                # ajusta la fecha).
+                ensayo.resultados = resultados
+                ensayo.observaciones_ensayo = observaciones
+                ensayo.fecha_finalizacion = timezone.now()
+                ensayo.save(update_fields=[
+                    'resultados', 'observaciones_ensayo', 'fecha_finalizacion', 'fecha_actualizacion'
+                ])
+            else:
+                # Resumen diario, métricas y avance de la muestra a ANALIZADA
+                # cuando es su último ensayo (ver transiciones.ENSAYO)
+                resultado = transiciones.ENSAYO.aplicar(
+                    [ensayo], 'COMPLETADO', request.user,
+                    resultados=resultados, observaciones_ensayo=observaciones
+                )
+                if resultado.rechazadas:
+                    return Response(
+                        {'error': resultado.rechazadas[ensayo.pk]},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
         
         return Response({
             'mensaje': 'Resultados registrados exitosamente',
@@ -479,13 +960,19 @@ class EnsayoViewSet(viewsets.ModelViewSet):
 # =============================================================================
 # VIEWSET PARA HISTORIAL (Solo lectura)
 # =============================================================================
-class HistorialEstadoViewSet(viewsets.ReadOnlyModelViewSet):
+class HistorialEstadoViewSet(RespuestaCacheadaMixin, RespuestaCondicionalMixin,
+                             viewsets.ReadOnlyModelViewSet):
     """
     ViewSet de solo lectura para historial de estados.
     No permite crear/actualizar/eliminar directamente.
     """
     queryset = HistorialEstado.objects.all()
     serializer_class = HistorialEstadoSerializer
+    orden_cursor = ('-fecha_cambio', '-id')
+    # La lista incluye usuario_info
+    modelos_cache = (HistorialEstado, User)
+    # El historial no se modifica; su fecha de creación sirve como validador
+    campo_fecha_validador = 'fecha_cambio'
     
     def get_queryset(self):
         """
@@ -493,10 +980,285 @@ class HistorialEstadoViewSet(viewsets.ReadOnlyModelViewSet):
         Ejemplo:
         - /api/historial/?muestra=1
         """
-        queryset = HistorialEstado.objects.select_related('muestra', 'usuario').all()
+        # 'muestra' se serializa como PK; solo el usuario se expande en usuario_info
+        queryset = HistorialEstado.objects.select_related('usuario').all()
         
         muestra = self.request.query_params.get('muestra', None)
         if muestra:
             queryset = queryset.filter(muestra_id=muestra)
         
-        return queryset.order_by('-fecha_cambio')
+        return queryset.order_by(*self.orden_cursor)
+
+# =============================================================================
+# ESTADÍSTICAS DEL LABORATORIO (TABLERO)
+# =============================================================================
+class EstadisticasViewSet(RespuestaCacheadaMixin, viewsets.ViewSet):
+    """
+    Resumen para los jefes de laboratorio, calculado en la base de datos.
+    Endpoint: GET /api/estadisticas/?fecha_desde=2024-01-01&fecha_hasta=2024-12-31
+    
+    Las fechas filtran por fecha_registro de la muestra (igual que /api/muestras/).
+    Se resuelve en 5 consultas:
+    1. Total de muestras, por estado y por tipo (conteos condicionales)
+    2. Muestras por cliente
+    3. Muestras por día de registro
+    4. Ensayos pendientes, vencidos y por prioridad (conteos condicionales)
+    5. Ensayos pendientes por analista
+    El resultado se guarda en la cache de respuestas por poco tiempo
+    (LIMS_CACHE_RESPUESTAS['TIMEOUT_ESTADISTICAS']) y se invalida con
+    cualquier cambio en los modelos involucrados.
+    """
+    modelos_cache = (Muestra, Ensayo, Cliente, User)
+    
+    @property
+    def timeout_cache(self):
+        return settings.LIMS_CACHE_RESPUESTAS.get('TIMEOUT_ESTADISTICAS', 30)
+    
+    def list(self, request):
+        filtro = filtro_fechas(request.query_params, 'fecha_registro')
+        muestras = Muestra.objects.filter(**filtro).order_by()
+        filtro_ensayos = {f'muestra__{clave}': valor for clave, valor in filtro.items()}
+        ensayos = Ensayo.objects.filter(**filtro_ensayos).order_by()
+        
+        return Response({
+            'filtros': {
+                'fecha_desde': request.query_params.get('fecha_desde'),
+                'fecha_hasta': request.query_params.get('fecha_hasta'),
+            },
+            'muestras': self.resumen_muestras(muestras),
+            'ensayos': self.resumen_ensayos(ensayos),
+        })
+    
+    def resumen_muestras(self, muestras):
+        conteos = muestras.aggregate(
+            total=Count('id'),
+            **{f'estado_{clave}': Count('id', filter=Q(estado=clave))
+               for clave, _ in Muestra.ESTADO_CHOICES},
+            **{f'tipo_{clave}': Count('id', filter=Q(tipo_muestra=clave))
+               for clave, _ in Muestra.TIPO_MUESTRA_CHOICES},
+        )
+        por_cliente = (
+            muestras
+            .values('cliente_id', 'cliente__nombre_empresa')
+            .annotate(total=Count('id'))
+            .order_by('-total', 'cliente__nombre_empresa')
+        )
+        por_dia = (
+            muestras
+            .annotate(dia=TruncDate('fecha_registro'))
+            .values('dia')
+            .annotate(total=Count('id'))
+            .order_by('dia')
+        )
+        return {
+            'total': conteos['total'],
+            'por_estado': {clave: conteos[f'estado_{clave}'] for clave, _ in Muestra.ESTADO_CHOICES},
+            'por_tipo_muestra': {
+                clave: conteos[f'tipo_{clave}'] for clave, _ in Muestra.TIPO_MUESTRA_CHOICES
+            },
+            'por_cliente': [
+                {'cliente_id': fila['cliente_id'], 'cliente': fila['cliente__nombre_empresa'],
+                 'total': fila['total']}
+                for fila in por_cliente
+            ],
+            'por_dia': [{'fecha': fila['dia'], 'total': fila['total']} for fila in por_dia],
+        }
+    
+    def resumen_ensayos(self, ensayos):
+        pendientes = ensayos.filter(estado_ensayo__in=['PENDIENTE', 'EN_PROCESO'])
+        conteos = pendientes.aggregate(
+            total=Count('id'),
+            vencidos=Count('id', filter=Q(fecha_resultados_requerida__lt=timezone.localdate())),
+            **{f'prioridad_{clave}': Count('id', filter=Q(prioridad=clave))
+               for clave, _ in Ensayo.PRIORIDAD_CHOICES},
+        )
+        por_analista = (
+            pendientes
+            .values('analista_asignado_id', 'analista_asignado__username')
+            .annotate(total=Count('id'))
+            .order_by('-total', 'analista_asignado__username')
+        )
+        return {
+            'pendientes': conteos['total'],
+            'vencidos': conteos['vencidos'],
+            'pendientes_por_prioridad': {
+                clave: conteos[f'prioridad_{clave}'] for clave, _ in Ensayo.PRIORIDAD_CHOICES
+            },
+            'pendientes_por_analista': [
+                {'analista_id': fila['analista_asignado_id'],
+                 'analista': fila['analista_asignado__username'] or 'Sin asignar',
+                 'total': fila['total']}
+                for fila in por_analista
+            ],
+        }
+    
+    @action(detail=False, methods=['get'])
+    def tendencias(self, request):
+        """
+        Endpoint: GET /api/estadisticas/tendencias/
+        Series de volumen y tiempos de respuesta leídas del resumen diario
+        (una fila por día × tipo × cliente × estado), sin recorrer muestras ni ensayos.
+        Ejemplos:
+        - /api/estadisticas/tendencias/?fecha_desde=2024-01-01&fecha_hasta=2024-12-31&agrupar=mes
+        - /api/estadisticas/tendencias/?tipo_muestra=AGUA&cliente=3
+        """
+        params = request.query_params
+        agrupar = params.get('agrupar', 'dia')
+        if agrupar not in ('dia', 'mes'):
+            return Response(
+                {'error': 'agrupar debe ser "dia" o "mes"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        filas = ResumenDiario.objects.filter(**filtro_fechas(params, 'fecha'))
+        if params.get('tipo_muestra'):
+            filas = filas.filter(tipo_muestra=params['tipo_muestra'])
+        if params.get('cliente'):
+            filas = filas.filter(cliente_id=params['cliente'])
+        
+        periodo = TruncMonth('fecha') if agrupar == 'mes' else F('fecha')
+        filas = (
+            filas
+            .annotate(periodo=periodo)
+            .values('periodo', 'estado')
+            .annotate(
+                muestras=Sum('muestras'),
+                segundos_desde_registro=Sum('segundos_desde_registro'),
+                ensayos_finalizados=Sum('ensayos_finalizados'),
+                segundos_respuesta_ensayos=Sum('segundos_respuesta_ensayos'),
+                ensayos_fuera_de_plazo=Sum('ensayos_fuera_de_plazo'),
+            )
+            .order_by('periodo', 'estado')
+        )
+        
+        series = {}
+        for fila in filas:
+            punto = series.setdefault(fila['periodo'], {
+                'periodo': fila['periodo'],
+                'muestras_por_estado': {},
+                'horas_desde_registro_por_estado': {},
+                'ensayos_finalizados': 0,
+                'segundos_respuesta_ensayos': 0,
+                'ensayos_fuera_de_plazo': 0,
+            })
+            if fila['muestras']:
+                punto['muestras_por_estado'][fila['estado']] = fila['muestras']
+                punto['horas_desde_registro_por_estado'][fila['estado']] = round(
+                    fila['segundos_desde_registro'] / fila['muestras'] / 3600, 2
+                )
+            punto['ensayos_finalizados'] += fila['ensayos_finalizados']
+            punto['segundos_respuesta_ensayos'] += fila['segundos_respuesta_ensayos']
+            punto['ensayos_fuera_de_plazo'] += fila['ensayos_fuera_de_plazo']
+        
+        for punto in series.values():
+            segundos = punto.pop('segundos_respuesta_ensayos')
+            finalizados = punto['ensayos_finalizados']
+            punto['horas_respuesta_ensayos'] = (
+                round(segundos / finalizados / 3600, 2) if finalizados else None
+            )
+        
+        return Response({'agrupar': agrupar, 'series': list(series.values())})
+
+# =============================================================================
+# BÚSQUEDA UNIFICADA
+# =============================================================================
+BUSQUEDA_LIMITE_DEFECTO = 20
+BUSQUEDA_LIMITE_MAXIMO = 100
+
+
+class BusquedaViewSet(viewsets.ViewSet):
+    """
+    Búsqueda de texto completo en muestras y clientes, ordenada por relevancia.
+    No distingue mayúsculas ni acentos y cada palabra se busca como prefijo.
+    Ejemplos:
+    - /api/buscar/?q=farmaceutica
+    - /api/buscar/?q=lote 2024&tipo=muestra&limite=10
+    """
+    
+    def list(self, request):
+        texto = request.query_params.get('q', '')
+        if not busqueda.terminos(texto):
+            return Response(
+                {'error': 'Debe proporcionar el parámetro q'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        tipo = request.query_params.get('tipo')
+        if tipo and tipo not in busqueda.TIPOS:
+            return Response(
+                {'error': f'Tipo inválido. Opciones: {", ".join(busqueda.TIPOS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limite = int(request.query_params.get('limite', BUSQUEDA_LIMITE_DEFECTO))
+        except ValueError:
+            limite = BUSQUEDA_LIMITE_DEFECTO
+        limite = max(1, min(limite, BUSQUEDA_LIMITE_MAXIMO))
+        
+        # Una consulta al índice por tipo y otra para cargar los objetos encontrados
+        cargadores = {
+            'muestra': (
+                Muestra.objects.select_related('cliente').only(*MUESTRA_LIST_CAMPOS),
+                MuestraListSerializer,
+            ),
+            'cliente': (
+                Cliente.objects.only(*ClienteListSerializer.Meta.fields),
+                ClienteListSerializer,
+            ),
+        }
+        resultados = []
+        for tipo_actual in [tipo] if tipo else busqueda.TIPOS:
+            encontrados = busqueda.buscar_ids(tipo_actual, texto, limite)
+            if not encontrados:
+                continue
+            queryset, serializer_class = cargadores[tipo_actual]
+            objetos = queryset.in_bulk([pk for pk, _ in encontrados])
+            resultados.extend(
+                {'tipo': tipo_actual, 'puntaje': puntaje,
+                 'objeto': serializer_class(objetos[pk]).data}
+                for pk, puntaje in encontrados if pk in objetos
+            )
+        
+        # Sin índice (puntaje None) se conserva el orden de cada tipo
+        resultados.sort(key=lambda resultado: -(resultado['puntaje'] or 0))
+        return Response({'q': texto, 'resultados': resultados[:limite]})
+
+# =============================================================================
+# ESTADÍSTICAS DE LA CACHE DE RESPUESTAS
+# =============================================================================
+class CacheViewSet(viewsets.ViewSet):
+    """
+    Contadores de aciertos y fallos de la cache de listas.
+    - GET  /api/cache/           → Aciertos, fallos y tasa por endpoint
+    - POST /api/cache/reiniciar/ → Pone los contadores en cero (solo staff)
+    """
+    basenames = ('cliente', 'muestra', 'ensayo', 'historial', 'estadisticas')
+    
+    def list(self, request):
+        return Response(estadisticas(self.basenames))
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def reiniciar(self, request):
+        reiniciar_estadisticas(self.basenames)
+        return Response({'mensaje': 'Contadores de cache reiniciados'})
+
+# =============================================================================
+# RENDIMIENTO POR VISTA
+# =============================================================================
+class RendimientoViewSet(viewsets.ViewSet):
+    """
+    Histograma de tiempos por vista de los últimos minutos (ver instrumentacion.py).
+    - GET  /api/rendimiento/           → Peticiones, percentiles, SQL y serialización por vista
+    - POST /api/rendimiento/reiniciar/ → Vacía el histograma (solo staff)
+    """
+    def list(self, request):
+        return Response({
+            'ventana_minutos': histograma.ventana(),
+            'vistas': histograma.resumen(),
+        })
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def reiniciar(self, request):
+        histograma.reiniciar()
+        return Response({'mensaje': 'Histograma de rendimiento reiniciado'})